@@ -19,6 +19,8 @@
 
 -(NSDictionary *)allPaths;
 -(NSString *)pathLoaderPath:(NSString *)name;
+-(NSDictionary *)reloadStats;
+-(NSDictionary *)pathCacheStats;
 
 
 
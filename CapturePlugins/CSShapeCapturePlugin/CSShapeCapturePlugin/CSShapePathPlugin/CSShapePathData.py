@@ -0,0 +1,282 @@
+"""
+Declarative shapes.
+
+A .shape file in a Paths directory is a JSON object with a name and an SVG path-data string in normalized
+coordinates: (0,0) is the bottom left of the layer and (1,1) the top right (Quartz orientation, y up).
+
+    {"name": "Triangle", "path": "M 0 0 L 1 0 L 0.5 1 Z"}
+
+Supported commands are M L H V C S Q T A Z, absolute and relative. Arc flags must be separated by whitespace or
+commas. The path is parsed once into flat arrays of absolute move/line/quad/cubic/close commands. From those a
+unit-square CGPath is built once, and the shape wrapper scales it to each frame natively.
+"""
+import re
+import math
+import json
+from array import array
+
+
+MOVE, LINE, QUAD, CUBIC, CLOSE = range(5)
+
+#number of coordinates each command consumes
+COMMAND_ARITY = {MOVE: 2, LINE: 2, QUAD: 4, CUBIC: 6, CLOSE: 0}
+
+_PARAM_COUNT = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'T': 2, 'A': 7, 'Z': 0}
+
+_TOKEN_RE = re.compile(r'([MmLlHhVvCcSsQqTtAaZz])|([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|([\s,]+)|(.)')
+
+
+class ShapePathError(ValueError):
+    pass
+
+
+def _tokenize(data):
+    for match in _TOKEN_RE.finditer(data):
+        command, number, space, bad = match.groups()
+        if command:
+            yield command
+        elif number:
+            yield float(number)
+        elif bad:
+            raise ShapePathError("unexpected %r at offset %d" % (bad, match.start()))
+
+
+def _arc_to_cubics(x1, y1, rx, ry, phi_degrees, large_arc, sweep, x2, y2):
+    """
+    Convert an SVG endpoint arc into a list of cubic bezier segments (cx1, cy1, cx2, cy2, x, y)
+    """
+    if (x1, y1) == (x2, y2):
+        return []
+    rx = abs(rx)
+    ry = abs(ry)
+    if rx == 0 or ry == 0:
+        return [(x1, y1, x2, y2, x2, y2)]
+
+    phi = math.radians(phi_degrees % 360.0)
+    cos_phi = math.cos(phi)
+    sin_phi = math.sin(phi)
+    dx = (x1 - x2) / 2.0
+    dy = (y1 - y2) / 2.0
+    x1p = cos_phi * dx + sin_phi * dy
+    y1p = -sin_phi * dx + cos_phi * dy
+
+    radii_check = (x1p * x1p) / (rx * rx) + (y1p * y1p) / (ry * ry)
+    if radii_check > 1:
+        rx *= math.sqrt(radii_check)
+        ry *= math.sqrt(radii_check)
+
+    numerator = rx * rx * ry * ry - rx * rx * y1p * y1p - ry * ry * x1p * x1p
+    denominator = rx * rx * y1p * y1p + ry * ry * x1p * x1p
+    coef = math.sqrt(max(numerator, 0.0) / denominator)
+    if large_arc == sweep:
+        coef = -coef
+    cxp = coef * rx * y1p / ry
+    cyp = -coef * ry * x1p / rx
+    cx = cos_phi * cxp - sin_phi * cyp + (x1 + x2) / 2.0
+    cy = sin_phi * cxp + cos_phi * cyp + (y1 + y2) / 2.0
+
+    def angle(ux, uy, vx, vy):
+        return math.atan2(ux * vy - uy * vx, ux * vx + uy * vy)
+
+    theta1 = angle(1, 0, (x1p - cxp) / rx, (y1p - cyp) / ry)
+    delta = angle((x1p - cxp) / rx, (y1p - cyp) / ry, (-x1p - cxp) / rx, (-y1p - cyp) / ry)
+    if not sweep and delta > 0:
+        delta -= 2 * math.pi
+    elif sweep and delta < 0:
+        delta += 2 * math.pi
+
+    segment_count = int(math.ceil(abs(delta) / (math.pi / 2) - 1e-9)) or 1
+    seg_delta = delta / segment_count
+    k = 4.0 / 3.0 * math.tan(seg_delta / 4.0)
+
+    def point(theta):
+        ex = rx * math.cos(theta)
+        ey = ry * math.sin(theta)
+        return cx + cos_phi * ex - sin_phi * ey, cy + sin_phi * ex + cos_phi * ey
+
+    def derivative(theta):
+        ex = -rx * math.sin(theta)
+        ey = ry * math.cos(theta)
+        return cos_phi * ex - sin_phi * ey, sin_phi * ex + cos_phi * ey
+
+    ret = []
+    theta = theta1
+    start_x, start_y = x1, y1
+    for idx in range(segment_count):
+        next_theta = theta + seg_delta
+        d1 = derivative(theta)
+        d2 = derivative(next_theta)
+        if idx == segment_count - 1:
+            end_x, end_y = x2, y2
+        else:
+            end_x, end_y = point(next_theta)
+        ret.append((start_x + k * d1[0], start_y + k * d1[1], end_x - k * d2[0], end_y - k * d2[1], end_x, end_y))
+        theta = next_theta
+        start_x, start_y = end_x, end_y
+    return ret
+
+
+class ShapePathData(object):
+    """
+    A parsed path: ops holds one command code per segment, coords the absolute coordinates they consume in order
+    """
+
+    def __init__(self, ops=None, coords=None):
+        self.ops = ops if ops is not None else array('B')
+        self.coords = coords if coords is not None else array('d')
+
+    @classmethod
+    def parse(cls, data):
+        ret = cls()
+        ops = ret.ops
+        coords = ret.coords
+        tokens = list(_tokenize(data))
+        pos = 0
+        cur_x = cur_y = 0.0
+        start_x = start_y = 0.0
+        last_control = None
+        last_command = None
+        command = None
+
+        while pos < len(tokens):
+            token = tokens[pos]
+            if isinstance(token, float):
+                if command is None:
+                    raise ShapePathError("path data must start with a command")
+                if command in 'Zz':
+                    raise ShapePathError("Z takes no parameters")
+            else:
+                command = token
+                pos += 1
+            upper = command.upper()
+            relative = command != upper
+            count = _PARAM_COUNT[upper]
+            params = tokens[pos:pos + count]
+            if len(params) != count or any(not isinstance(p, float) for p in params):
+                raise ShapePathError("%s needs %d parameters" % (command, count))
+            pos += count
+
+            if upper == 'Z':
+                ops.append(CLOSE)
+                cur_x, cur_y = start_x, start_y
+                last_control = None
+                last_command = upper
+                command = None
+                continue
+
+            off_x = cur_x if relative else 0.0
+            off_y = cur_y if relative else 0.0
+            control = None
+
+            if upper == 'M':
+                cur_x, cur_y = params[0] + off_x, params[1] + off_y
+                start_x, start_y = cur_x, cur_y
+                ops.append(MOVE)
+                coords.extend((cur_x, cur_y))
+                #extra coordinate pairs after a move are implicit lines
+                command = 'l' if relative else 'L'
+            elif upper in 'LHV':
+                if upper == 'H':
+                    cur_x = params[0] + off_x
+                elif upper == 'V':
+                    cur_y = params[0] + off_y
+                else:
+                    cur_x, cur_y = params[0] + off_x, params[1] + off_y
+                ops.append(LINE)
+                coords.extend((cur_x, cur_y))
+            elif upper in 'CS':
+                if upper == 'C':
+                    c1 = (params[0] + off_x, params[1] + off_y)
+                    rest = params[2:]
+                else:
+                    if last_command in ('C', 'S') and last_control:
+                        c1 = (2 * cur_x - last_control[0], 2 * cur_y - last_control[1])
+                    else:
+                        c1 = (cur_x, cur_y)
+                    rest = params
+                control = (rest[0] + off_x, rest[1] + off_y)
+                cur_x, cur_y = rest[2] + off_x, rest[3] + off_y
+                ops.append(CUBIC)
+                coords.extend((c1[0], c1[1], control[0], control[1], cur_x, cur_y))
+            elif upper in 'QT':
+                if upper == 'Q':
+                    control = (params[0] + off_x, params[1] + off_y)
+                    end = params[2:]
+                else:
+                    if last_command in ('Q', 'T') and last_control:
+                        control = (2 * cur_x - last_control[0], 2 * cur_y - last_control[1])
+                    else:
+                        control = (cur_x, cur_y)
+                    end = params
+                cur_x, cur_y = end[0] + off_x, end[1] + off_y
+                ops.append(QUAD)
+                coords.extend((control[0], control[1], cur_x, cur_y))
+            elif upper == 'A':
+                end_x, end_y = params[5] + off_x, params[6] + off_y
+                for segment in _arc_to_cubics(cur_x, cur_y, params[0], params[1], params[2], params[3] != 0,
+                                              params[4] != 0, end_x, end_y):
+                    ops.append(CUBIC)
+                    coords.extend(segment)
+                cur_x, cur_y = end_x, end_y
+
+            last_control = control
+            last_command = upper
+        return ret
+
+    def __len__(self):
+        return len(self.ops)
+
+    def segments(self):
+        """
+        Iterate (op, coordinate tuple) pairs
+        """
+        pos = 0
+        for op in self.ops:
+            arity = COMMAND_ARITY[op]
+            yield op, tuple(self.coords[pos:pos + arity])
+            pos += arity
+
+    def scaled_coords(self, width, height, x=0.0, y=0.0):
+        """
+        Coordinates mapped from the unit square onto the rect (x, y, width, height)
+        """
+        ret = array('d', self.coords)
+        ret[0::2] = array('d', [c * width + x for c in self.coords[0::2]])
+        ret[1::2] = array('d', [c * height + y for c in self.coords[1::2]])
+        return ret
+
+    def create_cgpath(self):
+        """
+        Build the unit-square CGPath
+        """
+        from Quartz import (CGPathCreateMutable, CGPathMoveToPoint, CGPathAddLineToPoint, CGPathAddQuadCurveToPoint,
+                            CGPathAddCurveToPoint, CGPathCloseSubpath)
+        new_path = CGPathCreateMutable()
+        for op, c in self.segments():
+            if op == MOVE:
+                CGPathMoveToPoint(new_path, None, c[0], c[1])
+            elif op == LINE:
+                CGPathAddLineToPoint(new_path, None, c[0], c[1])
+            elif op == QUAD:
+                CGPathAddQuadCurveToPoint(new_path, None, c[0], c[1], c[2], c[3])
+            elif op == CUBIC:
+                CGPathAddCurveToPoint(new_path, None, c[0], c[1], c[2], c[3], c[4], c[5])
+            else:
+                CGPathCloseSubpath(new_path)
+        return new_path
+
+
+def load_shape_file(path):
+    """
+    Read a .shape file. Returns (name, ShapePathData).
+    """
+    with open(path, 'r') as shape_file:
+        try:
+            shape = json.load(shape_file)
+        except ValueError as e:
+            raise ShapePathError("%s: %s" % (path, e))
+    try:
+        data = shape['path']
+    except (KeyError, TypeError):
+        raise ShapePathError("%s: no path" % path)
+    return shape.get('name', "No Name!"), ShapePathData.parse(data)
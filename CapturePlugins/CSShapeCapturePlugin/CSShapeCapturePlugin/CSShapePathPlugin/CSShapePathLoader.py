@@ -8,6 +8,8 @@ sys.path.append(my_path)
 from pluginbase import PluginBase
 from Foundation import *
 from CSShapePathWrapper import *
+from CSShapePathData import load_shape_file, ShapePathError
+from CSPluginReloader import PluginReloader, PluginWatcher
 
 sys.dont_write_bytecode = True
 
@@ -17,7 +19,52 @@ plugin_base = PluginBase(package='shapeplugins')
 library_dirs = NSSearchPathForDirectoriesInDomains(NSLibraryDirectory, NSAllDomainsMask - NSSystemDomainMask, YES)
 plugin_dirs = map(lambda x: x + "/Application Support/CocoaSplit/Plugins/Paths", library_dirs)
 plugin_dirs.append(NSBundle.bundleForClass_(objc.lookUpClass("CSShapeCapture").class__()).resourcePath() + "/Paths")
-plugin_source = plugin_base.make_plugin_source(searchpath=plugin_dirs)
+cache_dir = NSSearchPathForDirectoriesInDomains(NSCachesDirectory, NSUserDomainMask, YES)[0]
+plugin_source = plugin_base.make_plugin_source(searchpath=plugin_dirs, bytecode_cache=cache_dir + "/CocoaSplit/PathBytecode")
+plugin_reloader = PluginReloader(plugin_source, PluginWatcher(plugin_dirs) if PluginWatcher.available() else None)
+
+#.shape file path -> (mtime, size, name, wrapper)
+declarative_shapes = {}
+
+
+def shape_files():
+    """
+    Module name -> .shape file path, for every name whose first occurrence in plugin_dirs is a .shape file
+    """
+    ret = {}
+    seen = set()
+    for search_dir in plugin_dirs:
+        try:
+            dir_names = sorted(os.listdir(search_dir))
+        except OSError:
+            continue
+        for file_name in dir_names:
+            m_name, ext = os.path.splitext(file_name)
+            if m_name in seen:
+                continue
+            full_path = os.path.join(search_dir, file_name)
+            if ext == '.shape':
+                ret[m_name] = full_path
+            elif ext != '.py' and not os.path.isfile(os.path.join(full_path, '__init__.py')):
+                continue
+            seen.add(m_name)
+    return ret
+
+
+def declarative_shape(path):
+    """
+    (name, wrapper) for a .shape file. The file is only parsed again if it changed; the wrapper scales the parsed
+    unit path to each frame without calling back into Python.
+    """
+    f_stat = os.stat(path)
+    cached = declarative_shapes.get(path)
+    if cached and cached[0] == f_stat.st_mtime and cached[1] == f_stat.st_size:
+        return cached[2], cached[3]
+    shape_name, path_data = load_shape_file(path)
+    new_wrap = CSShapeWrapper.alloc().init()
+    new_wrap.setUnitPath_(path_data.create_cgpath())
+    declarative_shapes[path] = (f_stat.st_mtime, f_stat.st_size, shape_name, new_wrap)
+    return shape_name, new_wrap
 
 
 
@@ -29,6 +76,9 @@ class CSShapePathLoader(NSObject):
     
     @objc.signature('@@:@')
     def pathLoaderPath_(self, pluginName):
+        shape_path = shape_files().get(pluginName)
+        if shape_path:
+            return os.path.realpath(shape_path)
         plugin_module = plugin_source.load_plugin(pluginName)
         plugin_file = plugin_module.__file__
         real_path = os.path.realpath(plugin_file)
@@ -39,18 +89,38 @@ class CSShapePathLoader(NSObject):
     def allPaths(self):
         
         plugins = plugin_source.list_plugins()
+        shapes = shape_files()
         ret = {}
+        for m_name, shape_path in shapes.items():
+            try:
+                plugin_name, new_wrap = declarative_shape(shape_path)
+            except (IOError, OSError, ShapePathError) as e:
+                NSLog("Could not load shape %@: %@", shape_path, str(e))
+                continue
+            ret[m_name] = { 'name':plugin_name, 'module':m_name, 'plugin':new_wrap}
+
         for m_name in plugins:
-            plugin = plugin_source.load_plugin(m_name)
-            reload(plugin)
+            if m_name in shapes:
+                continue
+            plugin = plugin_reloader.get(m_name)
             try:
                 plugin_name = plugin.name
             except AttributeError:
                 plugin_name = "No Name!"
             
-            new_wrap = CSShapePathWrapper.alloc().initWithPlugin_(plugin)
+            new_wrap = CSShapePathWrapper.alloc().initWithPlugin_version_(plugin, plugin_reloader.content_hash(m_name))
             
             ret[m_name] = { 'name':plugin_name, 'module':m_name, 'plugin':new_wrap}
         return ret
 
 
+    @objc.signature('@@:')
+    def reloadStats(self):
+        return plugin_reloader.stats()
+
+
+    @objc.signature('@@:')
+    def pathCacheStats(self):
+        return path_cache.stats()
+
+
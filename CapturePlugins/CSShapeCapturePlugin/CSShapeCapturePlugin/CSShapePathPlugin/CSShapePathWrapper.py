@@ -1,23 +1,92 @@
 import objc
+from collections import OrderedDict
 from Foundation import *
-from Quartz import CGPathCreateMutable
+from Quartz import CGPathCreateMutable, CGPathCreateCopy, CGPathCreateCopyByTransformingPath, CGAffineTransformMake
 
 CSShapeWrapper = objc.lookUpClass('CSShapeWrapper')
 
 
+class CSPathCache(object):
+    """
+    LRU of generated CGPaths keyed by (plugin module, plugin version, frame). Legacy plugins draw in the layer's
+    frame coordinates, so the frame origin is part of the key along with the size; it is normally 0,0.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._paths = OrderedDict()
+
+    def get(self, key):
+        path = self._paths.get(key)
+        if path is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._paths.pop(key)
+        self._paths[key] = path
+        return path
+
+    def store(self, key, path):
+        self._paths.pop(key, None)
+        self._paths[key] = path
+        while len(self._paths) > self.max_entries:
+            self._paths.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._paths.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self._paths),
+                'max_entries': self.max_entries}
+
+
+path_cache = CSPathCache()
+
+
+def scale_unit_path(unit_path, frame):
+    """
+    Map a path drawn in the unit square onto frame
+    """
+    transform = CGAffineTransformMake(frame.size.width, 0, 0, frame.size.height, frame.origin.x, frame.origin.y)
+    return CGPathCreateCopyByTransformingPath(unit_path, transform)
+
+
 class CSShapePathWrapper(CSShapeWrapper):
+    """
+    Wraps a shape plugin. Plugins either define create_cgpath(frame), called once per distinct frame, or
+    create_unit_cgpath(), called once per plugin version; its result is drawn in the unit square and scaled to each
+    frame with an affine transform.
+    """
 
     def initWithPlugin_(self, plugin):
+        return self.initWithPlugin_version_(plugin, None)
+
+    def initWithPlugin_version_(self, plugin, version):
         self = super(CSShapePathWrapper, self).init()
         if self is None: return None
         self.plugin = plugin
+        if version is None:
+            version = id(getattr(plugin, 'create_unit_cgpath', None) or getattr(plugin, 'create_cgpath', None))
+        self.version = version
+        self.unit_path = None
         return self
 
-    def getcgpath_forLayer_(self, frame, layer):
-        new_path = self.plugin.create_cgpath(frame)
-        layer.setPath_(new_path)
-
-
-
-
+    def cgpathForFrame_(self, frame):
+        key = (self.plugin.__name__, self.version, frame.size.width, frame.size.height, frame.origin.x, frame.origin.y)
+        new_path = path_cache.get(key)
+        if new_path is None:
+            if hasattr(self.plugin, 'create_unit_cgpath'):
+                if self.unit_path is None:
+                    self.unit_path = CGPathCreateCopy(self.plugin.create_unit_cgpath())
+                new_path = scale_unit_path(self.unit_path, frame)
+            else:
+                new_path = CGPathCreateCopy(self.plugin.create_cgpath(frame))
+            path_cache.store(key, new_path)
+        return new_path
 
+    def getcgpath_forLayer_(self, frame, layer):
+        layer.setPath_(self.cgpathForFrame_(frame))
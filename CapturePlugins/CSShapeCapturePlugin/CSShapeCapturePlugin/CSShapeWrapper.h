@@ -12,6 +12,8 @@
 @interface CSShapeWrapper : NSObject
 
 @property (nonatomic, strong) __attribute__((NSObject)) CGPathRef newPath;
+//Path in the unit square. If set, it is scaled to the layer's frame instead of asking a plugin for a path
+@property (nonatomic, strong) __attribute__((NSObject)) CGPathRef unitPath;
 
 -(void)getcgpath:(NSRect)withFrame forLayer:(CSShapeLayer *)forLayer;
 
@@ -11,6 +11,15 @@
 @implementation CSShapeWrapper
 -(void)getcgpath:(NSRect)withFrame forLayer:(CSShapeLayer *)forLayer
 {
+    if (self.unitPath)
+    {
+        CGAffineTransform unitTransform = CGAffineTransformMake(withFrame.size.width, 0, 0, withFrame.size.height, withFrame.origin.x, withFrame.origin.y);
+        CGPathRef scaledPath = CGPathCreateCopyByTransformingPath(self.unitPath, &unitTransform);
+        forLayer.path = scaledPath;
+        CGPathRelease(scaledPath);
+        return;
+    }
+    
     forLayer.path = CGPathCreateMutable();
 }
 
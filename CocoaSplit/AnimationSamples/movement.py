@@ -3,6 +3,11 @@ animation_description = "Demonstration of some movement animations"
 
 animation_inputs = ["source1", "source2"]
 
+#This script always does the same thing for the same inputs, parameters and layout, so it lets CocoaSplit cache the
+#result and replay it without running the script again. Leave this out if your script uses random numbers, the time
+#or anything else that can be different between runs.
+animation_cacheable = True
+
 
 def do_animation(inputs, duration):
 
@@ -11,7 +16,7 @@ def do_animation(inputs, duration):
 
 
     #move to bottom left corner
-    source1.moveTo(0,0, 2.5)
+    source1.moveTo((0,0), 2.5)
     
     #wait until previous move is done
     waitAnimation()
@@ -25,7 +30,7 @@ def do_animation(inputs, duration):
     #If you move an input via translate and then save the layout that move won't be reflected in the layout next time you restore it.
     #mixing move and translate calls may result in unpredictable positioning when you restore the layout
 
-    source1.translateTo(100,100, 1.75)
+    source1.translateTo((100,100), 1.75)
 
     #wait until the move is done, then wait another half second
     waitAnimation(0.5)
@@ -37,7 +42,7 @@ def do_animation(inputs, duration):
     if source2:
         #These animations happen simultaneously
         source2.moveCenter(2.5)
-        source1.moveTo(500, 600, 2.5)
+        source1.moveTo((500, 600), 2.5)
         waitAnimation(1.5)
         #we can use loops, too!
         for x in range(0, 5):
@@ -1,5 +1,3 @@
-from Foundation import NSLog
-
 animation_name = "RotateDemo"
 animation_description = "Rotate demo"
 
@@ -9,7 +7,7 @@ animation_params = ["degrees"]
 
 def do_animation(inputs, duration):
 
-    NSLog("RUNNING ANIMATION")
+    log("RUNNING ANIMATION")
     source1 = inputs['source1']
     source2 = inputs['source2']
 
@@ -0,0 +1,324 @@
+"""
+Throughput and allocations of the animation hot paths, run against the headless layer model.
+
+    python Benchmarks/bench_animation.py
+    python Benchmarks/bench_animation.py --case inputs --case waits --rounds 3
+
+Cases (synthetic scripts, nothing is read from AnimationSamples):
+    inputs     - 1, 10, 100 and 1000 inputs, each moving, fading and then rotating after a global waitAnimation()
+    keyframes  - one input animated through long keyframe lists (make_animation_values + simple_animation)
+    waits      - a deep chain of waitAnimation() calls, global and per input
+    labels     - labelled animations with waits on earlier labels
+    plugins    - plugin directories with hundreds of files: cold and warm PluginIndex.refresh() and first imports
+    memory     - footprint of one animation and of one wait marker while their block is alive
+
+For script cases the run is split into script (do_animation building the block), commit (AnimationBlock.commit) and
+complete (the CompletionQueue writing every final value back). Times are the best of --rounds rounds; throughput is
+animations per second of script + commit. Allocations come from a separate round: peak traced memory and allocated
+blocks still alive afterwards with tracemalloc, or the growth in gc tracked objects where tracemalloc is missing.
+The run's superlayer stays referenced from the block thread state until the next run, so its layout counts as retained.
+
+The memory case builds blocks of plain animations or of per-input wait markers and reports traced bytes per item
+(the whole cost: CSAnimation, its layer animation and its share of the block) next to the size of the Python object
+alone, including its __dict__ if it has one.
+
+complete includes the headless presentationLayer(), which evaluates every animation still attached to the layer; on
+long single-layer chains that stand-in cost dominates and isn't representative of Core Animation.
+"""
+import os
+import gc
+import sys
+import time
+import types
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import CSAnimationBlock
+from CSAnimationBlock import waitAnimation
+from CSHeadlessRunner import HeadlessRunner, plugin_base
+from CSPluginIndex import PluginIndex
+from CSPluginReloader import PluginReloader
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+def _inputs_script(count):
+    def do_animation(inputs, duration):
+        sources = [inputs['input%d' % idx] for idx in range(count)]
+        for idx, source in enumerate(sources):
+            source.moveTo((idx % 1280, idx % 720), 1.0)
+            source.opacity(0.5, 0.5)
+        waitAnimation()
+        for source in sources:
+            source.rotate(90, 0.5)
+    return count, do_animation
+
+
+def _keyframes_script(count):
+    def do_animation(inputs, duration):
+        source = inputs['input0']
+        source.moveTo([(idx % 1280, (idx * 7) % 720) for idx in range(count)], 2.0)
+        source.sizeWidth([100 + idx % 200 for idx in range(count)], 2.0)
+        source.opacity([(idx % 10) / 10.0 for idx in range(count)], 2.0)
+    return 1, do_animation
+
+
+def _waits_script(depth):
+    def do_animation(inputs, duration):
+        sources = [inputs['input%d' % idx] for idx in range(4)]
+        for level in range(depth):
+            source = sources[level % 4]
+            source.moveX(1, 0.01)
+            source.waitAnimation()
+            if level % 8 == 7:
+                waitAnimation()
+    return 4, do_animation
+
+
+def _labels_script(count):
+    def do_animation(inputs, duration):
+        sources = [inputs['input%d' % idx] for idx in range(10)]
+        for idx in range(count):
+            source = sources[idx % 10]
+            source.moveX(1, 0.05 + (idx % 5) / 100.0, label='step%d' % idx)
+            if idx >= 10:
+                source.waitAnimation(label='step%d' % (idx - 10))
+            if idx % 50 == 49:
+                waitAnimation(label='step%d' % (idx - 25))
+    return 10, do_animation
+
+
+SCRIPT_CASES = (
+    ('inputs', 'inputs-%d', _inputs_script, (1, 10, 100, 1000)),
+    ('keyframes', 'keyframes-%d', _keyframes_script, (100, 1000, 10000)),
+    ('waits', 'waits-%d', _waits_script, (100, 1000, 5000)),
+    ('labels', 'labels-%d', _labels_script, (100, 1000)),
+)
+
+
+def _memory_script(kind, count):
+    def do_animation(inputs, duration):
+        sources = [inputs['input%d' % idx] for idx in range(10)]
+        for idx in range(count):
+            if kind == 'animation':
+                sources[idx % 10].moveX(1, 0.5)
+            else:
+                sources[idx % 10].waitAnimation()
+    return 10, do_animation
+
+
+def make_animation(name, input_count, do_animation):
+    """
+    A module standing in for a loaded plugin
+    """
+    animation = types.ModuleType(name)
+    animation.animation_name = name
+    animation.animation_inputs = ['input%d' % idx for idx in range(input_count)]
+    animation.do_animation = do_animation
+    return animation
+
+
+def run_once(animation, input_count):
+    """
+    One run on a fresh layout. Returns (animations, script, commit, complete) with times in seconds.
+    """
+    runner = HeadlessRunner(1280, 720)
+    for idx in range(input_count):
+        runner.add_input('input%d' % idx, (idx * 40) % 1280, (idx * 20) % 720, 320, 180)
+    input_arg = runner.make_input_arg(animation)
+    start = timer()
+    block = CSAnimationBlock.run_animation(animation, input_arg, None, runner.rootLayer)
+    built = timer() - start
+    start = timer()
+    runner.backend.run_until_idle()
+    complete = timer() - start
+    animations = len([anim for anim in block.animations if not anim.isWaitMark])
+    return animations, built - block.commit_duration, block.commit_duration, complete
+
+
+def measure_allocations(func):
+    """
+    (peak KB, blocks still allocated) for one call of func, or (None, gc objects still alive) without tracemalloc
+    """
+    gc.collect()
+    if tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            result = func()
+            gc.collect()
+            after = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        retained = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+        del result
+        return peak / 1024.0, retained
+    before = len(gc.get_objects())
+    result = func()
+    gc.collect()
+    retained = len(gc.get_objects()) - before
+    del result
+    return None, retained
+
+
+def bench_script(label, input_count, do_animation, rounds):
+    animation = make_animation(label, input_count, do_animation)
+    best = None
+    for _ in range(rounds):
+        timings = run_once(animation, input_count)
+        if best is None:
+            best = timings
+        else:
+            best = (timings[0],) + tuple(min(a, b) for a, b in zip(best[1:], timings[1:]))
+    peak, retained = measure_allocations(lambda: run_once(animation, input_count))
+    animations, script, commit, complete = best
+    return {'case': label, 'animations': animations, 'script': script, 'commit': commit, 'complete': complete,
+            'throughput': animations / (script + commit) if script + commit else 0.0, 'peak_kb': peak,
+            'retained': retained}
+
+
+def object_size(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def bench_memory(kind, count):
+    """
+    Bytes per item of a block of count animations or wait markers, committed but not completed
+    """
+    input_count, do_animation = _memory_script(kind, count)
+    animation = make_animation('memory-%s' % kind, input_count, do_animation)
+    runner = HeadlessRunner(1280, 720)
+    for idx in range(input_count):
+        runner.add_input('input%d' % idx, idx * 40, idx * 20, 320, 180)
+    input_arg = runner.make_input_arg(animation)
+    per_item = None
+    gc.collect()
+    if tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            block = CSAnimationBlock.run_animation(animation, input_arg, None, runner.rootLayer)
+            gc.collect()
+            per_item = (tracemalloc.get_traced_memory()[0] - before) / float(count)
+        finally:
+            tracemalloc.stop()
+    else:
+        block = CSAnimationBlock.run_animation(animation, input_arg, None, runner.rootLayer)
+    items = [anim for anim in block.animations if anim.isWaitMark == (kind != 'animation')]
+    return {'case': 'memory-%s' % kind, 'items': len(items), 'bytes': per_item, 'object': object_size(items[0])}
+
+
+def _write_plugins(directory, count):
+    for idx in range(count):
+        with open(os.path.join(directory, 'benchanim%d.py' % idx), 'w') as mod_file:
+            mod_file.write("animation_name = 'Bench %d'\nanimation_description = 'benchmark plugin'\n"
+                           "animation_inputs = ['source1', 'source2']\nanimation_params = {'amount': 1.0}\n\n"
+                           "def do_animation(inputs, duration):\n    inputs['source1'].moveX(1, duration)\n" % idx)
+
+
+def bench_plugins(count, rounds):
+    work_dir = tempfile.mkdtemp(prefix='bench_animation')
+    try:
+        plugin_dir = os.path.join(work_dir, 'plugins')
+        os.mkdir(plugin_dir)
+        _write_plugins(plugin_dir, count)
+        index_path = os.path.join(work_dir, 'index.json')
+        best = None
+        for round_idx in range(rounds):
+            if os.path.exists(index_path):
+                os.remove(index_path)
+            start = timer()
+            PluginIndex([plugin_dir], index_path).refresh()
+            cold = timer() - start
+            start = timer()
+            PluginIndex([plugin_dir], index_path).refresh()
+            warm = timer() - start
+
+            source = plugin_base.make_plugin_source(searchpath=[plugin_dir])
+            reloader = PluginReloader(source)
+            start = timer()
+            for idx in range(count):
+                reloader.get('benchanim%d' % idx)
+            first = timer() - start
+            start = timer()
+            for idx in range(count):
+                reloader.get('benchanim%d' % idx)
+            cached = timer() - start
+            source.cleanup()
+            timings = (cold, warm, first, cached)
+            best = timings if best is None else tuple(min(a, b) for a, b in zip(best, timings))
+
+        def cold_index():
+            os.remove(index_path)
+            return PluginIndex([plugin_dir], index_path).refresh()
+        peak, retained = measure_allocations(cold_index)
+    finally:
+        shutil.rmtree(work_dir)
+    cold, warm, first, cached = best
+    return {'case': 'plugins-%d' % count, 'files': count, 'index_cold': cold, 'index_warm': warm,
+            'import_first': first, 'import_cached': cached, 'peak_kb': peak, 'retained': retained}
+
+
+def _format_kb(peak):
+    return '%12s' % '-' if peak is None else '%12.1f' % peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the animation hot paths against the headless backend")
+    parser.add_argument('--case', action='append', choices=[c[0] for c in SCRIPT_CASES] + ['plugins', 'memory'],
+                        help="only run these cases (default: all)")
+    parser.add_argument('--plugins', type=int, action='append', help="plugin directory sizes (default: 100, 500)")
+    parser.add_argument('--rounds', type=int, default=5, help="best of this many rounds is reported")
+    args = parser.parse_args(argv)
+    sys.dont_write_bytecode = True
+    cases = args.case or [c[0] for c in SCRIPT_CASES] + ['plugins', 'memory']
+
+    if [case for case in SCRIPT_CASES if case[0] in cases]:
+        print("%-16s %8s %11s %11s %11s %12s %12s %10s" % ('', 'anims', 'script ms', 'commit ms', 'complete ms',
+                                                          'anims/s', 'peak KB', 'retained'))
+    for case, label_fmt, make_script, sizes in SCRIPT_CASES:
+        if case not in cases:
+            continue
+        for size in sizes:
+            input_count, do_animation = make_script(size)
+            res = bench_script(label_fmt % size, input_count, do_animation, args.rounds)
+            print("%-16s %8d %11.2f %11.2f %11.2f %12.0f %s %10d" % (
+                res['case'], res['animations'], res['script'] * 1e3, res['commit'] * 1e3, res['complete'] * 1e3,
+                res['throughput'], _format_kb(res['peak_kb']), res['retained']))
+
+    if 'plugins' in cases:
+        print('')
+        print("%-16s %8s %11s %11s %11s %12s %12s %10s" % ('', 'files', 'cold ms', 'warm ms', 'import ms',
+                                                          'cached ms', 'peak KB', 'retained'))
+        for count in args.plugins or (100, 500):
+            res = bench_plugins(count, args.rounds)
+            print("%-16s %8d %11.2f %11.2f %11.2f %12.2f %s %10d" % (
+                res['case'], res['files'], res['index_cold'] * 1e3, res['index_warm'] * 1e3,
+                res['import_first'] * 1e3, res['import_cached'] * 1e3, _format_kb(res['peak_kb']),
+                res['retained']))
+
+    if 'memory' in cases:
+        print('')
+        print("%-16s %8s %11s %11s" % ('', 'items', 'bytes/item', 'object'))
+        for kind in ('animation', 'wait'):
+            res = bench_memory(kind, 10000)
+            print("%-16s %8d %s %11d" % (res['case'], res['items'],
+                                         '%11s' % '-' if res['bytes'] is None else '%11.0f' % res['bytes'],
+                                         res['object']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Import overhead of pluginbase: the sys.meta_path finder it uses now vs the builtins.__import__ replacement it used
+before (reproduced here as LegacyImportHook).
+
+    python Benchmarks/bench_plugin_import.py --imports 200000 --plugins 200
+
+Three things are timed with each approach installed:
+    cached    - `import os` on an already imported module, the common case for every import statement
+    uncached  - first import of fresh modules that have nothing to do with plugins
+    plugins   - loading every plugin of a freshly created plugin source
+
+Each number is the best of --rounds rounds, per import.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pluginbase
+from pluginbase import PluginBase
+
+try:
+    import __builtin__ as builtins
+except ImportError:
+    import builtins
+
+
+class LegacyImportHook(object):
+    """
+    The old pluginbase hook: every import statement in the process goes through plugin_import
+    """
+
+    def __init__(self):
+        self.system_import = None
+
+    def plugin_import(self, name, globals=None, locals=None, fromlist=None, level=0):
+        import_name = name
+        ref_globals = globals
+        if ref_globals is None:
+            ref_globals = sys._getframe(1).f_globals
+        space = pluginbase._discover_space(name, ref_globals)
+        if space is not None:
+            actual_name = space._rewrite_module_path(name)
+            if actual_name is not None:
+                import_name = actual_name
+        return self.system_import(import_name, globals, locals, fromlist, level)
+
+    def install(self):
+        self.system_import = builtins.__import__
+        builtins.__import__ = self.plugin_import
+        sys.meta_path.remove(pluginbase.import_hook)
+
+    def uninstall(self):
+        builtins.__import__ = self.system_import
+        sys.meta_path.insert(0, pluginbase.import_hook)
+
+
+def _write_modules(directory, prefix, count, body):
+    for idx in range(count):
+        with open(os.path.join(directory, '%s%d.py' % (prefix, idx)), 'w') as mod_file:
+            mod_file.write(body)
+
+
+def time_cached(count):
+    code = compile("for _ in range(%d):\n    import os\n" % count, '<cached>', 'exec')
+    start = time.time()
+    exec(code, {})
+    return time.time() - start
+
+
+def time_uncached(directory, prefix, count):
+    sys.path.insert(0, directory)
+    try:
+        start = time.time()
+        for idx in range(count):
+            __import__('%s%d' % (prefix, idx))
+        return time.time() - start
+    finally:
+        sys.path.remove(directory)
+
+
+def time_plugins(base, directory, count):
+    start = time.time()
+    source = base.make_plugin_source(searchpath=[directory])
+    for idx in range(count):
+        source.load_plugin('plugin%d' % idx)
+    elapsed = time.time() - start
+    source.cleanup()
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare pluginbase import hook overhead")
+    parser.add_argument('--imports', type=int, default=200000, help="cached import statements to time")
+    parser.add_argument('--modules', type=int, default=300, help="fresh non-plugin modules to import")
+    parser.add_argument('--plugins', type=int, default=200, help="plugins to load")
+    parser.add_argument('--rounds', type=int, default=5, help="best of this many rounds is reported")
+    args = parser.parse_args(argv)
+    sys.dont_write_bytecode = True
+
+    work_dir = tempfile.mkdtemp(prefix='bench_plugin_import')
+    try:
+        plugin_dir = os.path.join(work_dir, 'plugins')
+        os.mkdir(plugin_dir)
+        _write_modules(plugin_dir, 'plugin', args.plugins,
+                       "import math\nimport os\nanimation_name = 'bench'\n\ndef do_animation(inputs, duration):\n    pass\n")
+        _write_modules(plugin_dir, 'shared', 1, "value = 1\n")
+        with open(os.path.join(plugin_dir, 'plugin0.py'), 'a') as mod_file:
+            mod_file.write("from benchplugins import shared0\n")
+        base = PluginBase(package='benchplugins')
+
+        legacy = LegacyImportHook()
+        approaches = (('meta_path finder', None), ('legacy __import__', legacy))
+        best = {}
+        #alternate the approaches so warm up and file system caching don't favor either one
+        for round_idx in range(args.rounds):
+            for label, hook in approaches:
+                if hook is not None:
+                    hook.install()
+                try:
+                    prefix = 'benchmod_%d_%s_' % (round_idx, label.split()[0])
+                    module_dir = os.path.join(work_dir, prefix)
+                    os.mkdir(module_dir)
+                    _write_modules(module_dir, prefix, args.modules, "x = 1\n")
+                    timings = (time_cached(args.imports), time_uncached(module_dir, prefix, args.modules),
+                               time_plugins(base, plugin_dir, args.plugins))
+                finally:
+                    if hook is not None:
+                        hook.uninstall()
+                if label in best:
+                    timings = tuple(min(a, b) for a, b in zip(best[label], timings))
+                best[label] = timings
+        results = [(label,) + best[label] for label, _ in approaches]
+    finally:
+        shutil.rmtree(work_dir)
+
+    print("%-20s %14s %14s %14s" % ('', 'cached (us)', 'uncached (us)', 'plugin (us)'))
+    for label, cached, uncached, plugins in results:
+        print("%-20s %14.3f %14.1f %14.1f" % (label, cached * 1e6 / args.imports, uncached * 1e6 / args.modules,
+                                              plugins * 1e6 / args.plugins))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,20 @@
-from uuid import uuid4
-from Quartz import CATransaction,CAMediaTimingFunction
-from Foundation import NSLog
+import itertools
+from CSAnimationBackend import get_backend
 
 
+#layer animation keys only have to be unique per layer, a process wide counter is enough
+_animation_keys = itertools.count()
+
+
+class CSAnimation(object):
+    #slotted, big generated scripts create tens of thousands of these
+    __slots__ = ('target', 'keyPath', 'animation', 'isWaitMark', 'isWaitOnly', 'ignore_wait', 'extra_model',
+                 'duration', 'cs_input', 'label', 'end_time', 'begin_time', 'completion_handler',
+                 'internal_completion_handler', 'toValue', 'model_keypaths', 'uukey', 'profile_plugin', 'anchor',
+                 'offset')
+
+    isClipMark = False
 
-class CSAnimation:
     def __init__(self, target, keyPath, animation, **kwargs):
         self.target = target
         self.keyPath = keyPath
@@ -19,9 +29,17 @@ class CSAnimation:
         self.end_time = 0
         self.begin_time = 0
         self.completion_handler = None
+        #None writes the presentation value back with set_model_value()
         self.internal_completion_handler = None
         self.toValue = None
-        
+        self.model_keypaths = ()
+        self.uukey = None
+        #plugin name the CompletionQueue reports write-back time under, set while profiling
+        self.profile_plugin = None
+        #a CSClipMark and the begin time relative to it, for animations placed by a resolved nested block or clip
+        self.anchor = None
+        self.offset = 0.0
+
         if animation:
             animation.setRemovedOnCompletion_(False)
             animation.setFillMode_("forwards")
@@ -47,14 +65,31 @@ class CSAnimation:
         
         if 'label' in kwargs:
             self.label = kwargs['label']
-                
-        self.internal_completion_handler = self.set_model_value
         
 
 
     def completed(self):
+        """
+        Finish this animation on its own. Normally completions go through the backend's CompletionQueue instead,
+        which batches the model writes of everything that finished in the same frame.
+        """
+        backend = get_backend()
+        backend.begin_transaction()
+        backend.set_disable_actions(True)
+        self.complete_model()
+        backend.commit_transaction()
+        self.complete_handler()
+
+    def complete_model(self):
+        """
+        Write the final value back to the layer. Expects to be called inside a transaction with actions disabled.
+        """
         if self.internal_completion_handler:
             self.internal_completion_handler(self)
+        else:
+            self.set_model_value()
+
+    def complete_handler(self):
         if self.completion_handler:
             self.completion_handler(self)
 
@@ -64,7 +99,7 @@ class CSAnimation:
         
         if self.target and not self.isWaitMark:
             self.animation.setBeginTime_(begin_time)
-            self.uukey = "{0}-{1}".format(self.keyPath, uuid4())
+            self.uukey = "%s-%d" % (self.keyPath, next(_animation_keys))
             self.target.addAnimation_forKey_(self.animation, self.uukey)
         if not self.ignore_wait:
             self.end_time = begin_time + self.duration
@@ -74,12 +109,13 @@ class CSAnimation:
     def apply_immediate(self):
         if self.target:
             p_value = self.toValue
-            CATransaction.begin()
-            #CATransaction.setDisableActions_(True)
+            backend = get_backend()
+            backend.begin_transaction()
+            #backend.set_disable_actions(True)
             self.target.setValue_forKeyPath_(p_value, self.animation.keyPath())
             if self.extra_model:
                 self.extra_model.setValue_forKeyPath_(p_value, self.animation.keyPath())
-            CATransaction.commit()
+            backend.commit_transaction()
 
 
     def set_model_value(self, realme=None):
@@ -89,13 +125,10 @@ class CSAnimation:
             if not p_layer:
                 return
             p_value = p_layer.valueForKeyPath_(self.animation.keyPath())
-            CATransaction.begin()
-            CATransaction.setDisableActions_(True)
             self.target.setValue_forKeyPath_(p_value, self.animation.keyPath())
             if self.extra_model:
                 self.extra_model.setValue_forKeyPath_(p_value, self.animation.keyPath())
             self.target.removeAnimationForKey_(self.uukey)
-            CATransaction.commit()
 
     def repeatduration(self, duration):
         if self.animation:
@@ -104,7 +137,7 @@ class CSAnimation:
 
     def timingFunction(self, fname):
         if self.animation:
-            tfunc = CAMediaTimingFunction.functionWithName_(fname)
+            tfunc = get_backend().timing_function(fname)
             if tfunc:
                 self.animation.setTimingFunction_(tfunc)
 
@@ -124,7 +157,58 @@ class CSAnimation:
         return self
 
 
+class CSWaitMark(object):
+    """
+    A wait() or waitAnimation() in a block. Reads like a CSAnimation without a layer animation, but only stores what
+    scheduling needs.
+    """
+    __slots__ = ('duration', 'cs_input', 'label', 'isWaitOnly', 'begin_time', 'end_time', 'profile_plugin')
+
+    isWaitMark = True
+    isClipMark = False
+    anchor = None
+    target = None
+    animation = None
+    keyPath = "__CS_WAIT_MARK"
+    ignore_wait = False
+    extra_model = None
+    completion_handler = None
+    toValue = None
+    model_keypaths = ()
+
+    def __init__(self, duration=0.0, cs_input=None, label=None, isWaitOnly=False):
+        self.duration = duration
+        self.cs_input = cs_input
+        self.label = label
+        self.isWaitOnly = isWaitOnly
+        self.begin_time = 0
+        self.end_time = 0
+        self.profile_plugin = None
+
+    def apply(self, begin_time):
+        self.begin_time = begin_time
+        self.end_time = begin_time + self.duration
+        return self.duration
+
+
+class CSClipMark(CSWaitMark):
+    """
+    Where a resolved sub-timeline (a nested block or a played clip) begins: after everything its inputs would wait
+    on at that point of the block. The sub-timeline's animations follow it with their anchor set to it. It doesn't wait
+    on or move anything itself.
+    """
+    __slots__ = ('inputs',)
+
+    isClipMark = True
+    keyPath = "__CS_CLIP_MARK"
+
+    def __init__(self, inputs=()):
+        super(CSClipMark, self).__init__()
+        self.inputs = inputs
+
+
 class CSAnimationGroup(CSAnimation):
+    __slots__ = ('animations',)
 
     def addAnimation(self, animation):
         if not hasattr(self, 'animations'):
@@ -134,7 +218,7 @@ class CSAnimationGroup(CSAnimation):
         self.animation.setAnimations_(self.animations)
 
 
-    def set_model_value(self):
+    def set_model_value(self, realme=None):
         if self.target:
             p_layer = self.target.presentationLayer()
             real_animations = self.animation.animations()
@@ -0,0 +1,154 @@
+"""
+Animation backend selection
+
+CSAnimationInput, CSAnimation and AnimationBlock never talk to Core Animation directly; every animation object,
+transaction and timestamp comes from the active backend. The default is the Quartz backend (CSQuartzBackend).
+CSHeadlessBackend provides a pure-Python layer model with an injectable clock so scripts can be run without a
+window server.
+"""
+from contextlib import contextmanager
+
+
+class AnimationBackend(object):
+    """
+    Interface implemented by every backend. Layers and animations handed out by a backend only need to respond to
+    the subset of the CALayer/CAAnimation selectors the runner uses.
+    """
+
+    def current_time(self):
+        """
+        Current media time in seconds, equivalent to CACurrentMediaTime()
+        """
+        raise NotImplementedError
+
+    def begin_transaction(self):
+        raise NotImplementedError
+
+    def commit_transaction(self):
+        raise NotImplementedError
+
+    def set_disable_actions(self, yesno):
+        raise NotImplementedError
+
+    def basic_animation(self, keyPath):
+        raise NotImplementedError
+
+    def keyframe_animation(self, keyPath):
+        raise NotImplementedError
+
+    def timing_function(self, name):
+        """
+        Return a timing function object for one of the named kCAMediaTimingFunction constants, or None
+        """
+        raise NotImplementedError
+
+    def timing_function_with_points(self, x1, y1, x2, y2):
+        """
+        Return a cubic bezier timing function object with control points (x1, y1) and (x2, y2)
+        """
+        raise NotImplementedError
+
+    def animation_delegate(self):
+        """
+        Return the shared animation delegate. When an animation stops it queues the CSAnimation stored under the
+        animation's __CS_COMPLETION__ key on completion_queue().
+        """
+        raise NotImplementedError
+
+    def completion_queue(self):
+        """
+        The CompletionQueue the delegate feeds, created on first use
+        """
+        queue = getattr(self, '_completion_queue', None)
+        if queue is None:
+            from CSCompletionQueue import CompletionQueue
+            queue = CompletionQueue(self)
+            self._completion_queue = queue
+        return queue
+
+    def call_soon(self, func):
+        """
+        Call func on the main thread after everything delivered in the current run loop pass (i.e. once this
+        display frame's animation callbacks are done)
+        """
+        raise NotImplementedError
+
+    def call_later(self, delay, func):
+        """
+        Call func on the main thread once delay seconds have passed, e.g. one display frame later
+        """
+        raise NotImplementedError
+
+    @contextmanager
+    def worker_context(self):
+        """
+        Context a script running on a worker thread is wrapped in (an autorelease pool for Quartz)
+        """
+        yield
+
+    def make_point(self, x, y):
+        raise NotImplementedError
+
+    def make_size(self, width, height):
+        raise NotImplementedError
+
+    def point_value(self, point):
+        """
+        Box a point so it can be used as an animation value (NSValue.valueWithPoint_)
+        """
+        raise NotImplementedError
+
+    def size_value(self, size):
+        """
+        Box a size so it can be used as an animation value (NSValue.valueWithSize_)
+        """
+        raise NotImplementedError
+
+    def point_values(self, xs, ys):
+        """
+        Box the points (xs[i], ys[i]) all at once, the list point_value() would give for each of them
+        """
+        make_point = self.make_point
+        point_value = self.point_value
+        return [point_value(make_point(x, y)) for x, y in zip(xs, ys)]
+
+    def size_values(self, widths, heights):
+        """
+        Box the sizes (widths[i], heights[i]) all at once, the list size_value() would give for each of them
+        """
+        make_size = self.make_size
+        size_value = self.size_value
+        return [size_value(make_size(width, height)) for width, height in zip(widths, heights)]
+
+    def is_path(self, value):
+        """
+        True if value is a path that should be used as a keyframe animation's values
+        """
+        return False
+
+    def log(self, message):
+        raise NotImplementedError
+
+
+_backend = None
+
+
+def get_backend():
+    """
+    Return the active backend, creating the Quartz backend the first time if nothing else was installed.
+    """
+    global _backend
+    if _backend is None:
+        from CSQuartzBackend import QuartzBackend
+        _backend = QuartzBackend()
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Install backend as the active backend and return the previously installed one (which may be None)
+    """
+    global _backend
+    old_backend = _backend
+    _backend = backend
+    return old_backend
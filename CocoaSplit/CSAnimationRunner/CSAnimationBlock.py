@@ -1,43 +1,67 @@
-import objc
-import PyObjCTools.AppHelper
-from Foundation import NSObject,NSLog
-from Quartz import CACurrentMediaTime,CATransaction
 from CSAnimation import *
+from CSAnimationBackend import get_backend
+from CSAnimationProfiler import clock
+from CSAnimationSchedule import Schedule
 from threading import local
 
 threadData = local()
 
+import CSAnimationClip
 
 
-class CSAnimationDelegate(NSObject):
-
-    @objc.signature('v@:@c')
-    def animationDidStop_finished_(self, animation, finished):
-        cs_anim = animation.valueForKeyPath_("__CS_COMPLETION__")
-        cs_anim.completed()
-
 
 class AnimationBlock:
-    def __init__(self, duration = 0.0):
-        CATransaction.begin()
+    def __init__(self, duration = 0.0, run=None, stream=False, parent=None):
+        #a block built by an asynchronous run (CSAnimationRun) is committed later on the main thread, which is
+        #where its transaction is opened too
+        self.run = run
+        #a nested block is composed into its parent when it's committed and never opens a transaction
+        self.parent = parent
+        #with stream set, everything added before a global wait()/waitAnimation() is handed to the layers right
+        #there instead of when the script is done
+        self.stream = stream
+        #a CSFrameBudget.FrameBudget spreads adding the animations to their layers over several display frames
+        self.frame_budget = None
+        self.applied = 0
+        self.segments = 0
+        self.held_calls = []
+        #(CSAnimationInput, keyPath): model value before the block first wrote it, while recording a clip. Nested
+        #blocks note theirs in the same dict.
+        self.start_values = parent.start_values if parent is not None else None
+        if run is None and parent is None:
+            get_backend().begin_transaction()
+        self.deferred_calls = []
         self.animations = []
         self.duration = duration
         self.max_animation_time = 0.0
         self.beginTime =  0.0
+        self.cacheable = True
+        self.commit_duration = 0.0
+        self.schedule = None
         if not self.duration:
             self.duration = 0.25
 
 
 
+    def defer(self, func, *args):
+        """
+        Call func(*args) now, or at the start of commit() if the block is being built on a worker thread
+        """
+        if self.run is None:
+            return func(*args)
+        self.run.check_cancelled()
+        self.deferred_calls.append((func, args))
+
     def add_waitmarker(self, duration=0, target=None, **kwargs):
-        new_mark = CSAnimation(None, "__CS_WAIT_MARK", None, **kwargs)
-        new_mark.isWaitMark = True
-        new_mark.duration = duration
-        new_mark.cs_input = target
+        if self.run is not None:
+            self.run.check_cancelled()
+        new_mark = CSWaitMark(duration, target, kwargs.get('label'))
         self.animations.append(new_mark)
         return new_mark
 
     def add_animation(self, animation, target, keyPath):
+        if self.run is not None:
+            self.run.check_cancelled()
         if animation.duration == 0:
             #hax
             animation.duration = 0.001
@@ -46,70 +70,141 @@ class AnimationBlock:
 
         return animation
 
+    def note_start_value(self, cs_input, keyPath):
+        """
+        Remember cs_input's model value of keyPath before anything in this block changes it, if recording a clip
+        """
+        if self.start_values is not None and (cs_input, keyPath) not in self.start_values:
+            self.start_values[(cs_input, keyPath)] = cs_input.model_value(keyPath)
+
+    def add_resolved(self, animations, offsets, inputs):
+        """
+        Add animations whose begin times are already resolved relative to each other (offsets, in seconds). They
+        begin after everything inputs would wait on at this point, see CSAnimationSchedule. Returns the CSClipMark
+        they are anchored to.
+        """
+        if self.run is not None:
+            self.run.check_cancelled()
+        mark = CSClipMark(tuple(inputs))
+        self.animations.append(mark)
+        for anim, offset in zip(animations, offsets):
+            anim.anchor = mark
+            anim.offset = offset
+            self.animations.append(anim)
+        return mark
+
+    def add_block(self, block):
+        """
+        Compose a committed nested block into this one. Its waits were resolved against its own animations only,
+        the resulting sub-timeline begins where an animation of all the inputs it animates would.
+        """
+        schedule = block.build_schedule(0.0)
+        animations = []
+        offsets = []
+        inputs = []
+        for anim, begin in zip(block.animations, schedule.begins):
+            if anim.isWaitMark:
+                continue
+            if anim.cs_input is not None and anim.cs_input not in inputs:
+                inputs.append(anim.cs_input)
+            animations.append(anim)
+            offsets.append(begin)
+        if block.deferred_calls:
+            self.deferred_calls.extend(block.deferred_calls)
+            block.deferred_calls = []
+        self.cacheable = self.cacheable and block.cacheable
+        if animations:
+            self.add_resolved(animations, offsets, inputs)
+
     def wait(self, duration=0, target=None, **kwargs):
+        if self.stream and target is None:
+            self.flush_segment()
         waitmark = self.add_waitmarker(duration, target, **kwargs)
         waitmark.isWaitOnly = True
 
     def waitAnimation(self, duration=0, target=None, **kwargs):
+        if self.stream and target is None:
+            self.flush_segment()
         return self.add_waitmarker(duration, target, **kwargs)
 
+    def flush_segment(self):
+        """
+        Hand everything added since the last segment to the layers now. A synchronous block commits its transaction
+        so the segment starts right away, an asynchronous one sends it to the main thread. The block's begin time is
+        fixed by the first segment, so every animation begins when it would have if the block was committed at once.
+        """
+        if self.run is not None:
+            calls = self.deferred_calls
+            self.deferred_calls = []
+            self.run.stream_segment(self, len(self.animations), calls)
+            return
+        if self.apply_through(len(self.animations)):
+            backend = get_backend()
+            backend.commit_transaction()
+            backend.begin_transaction()
+
+    def build_schedule(self, base=0.0):
+        """
+        Resolve when everything in the block would begin and end if it were committed at base, without applying
+        anything. Returns the resolved CSAnimationSchedule.Schedule.
+        """
+        schedule = Schedule(self.animations)
+        schedule.resolve(base)
+        return schedule
+
+    def apply_through(self, end, calls=(), final=False):
+        """
+        Resolve and apply animations up to index end, after calls (deferred layer writes) ran. Expects an open
+        transaction. Unless final, nothing is applied while a labelled wait refers to a label that hasn't been added
+        yet; returns False and keeps the calls for the next segment.
+        """
+        backend = get_backend()
+        schedule = self.schedule
+        if schedule is None:
+            schedule = self.schedule = Schedule()
+        schedule.extend(self.animations[len(schedule.animations):end])
+        self.held_calls.extend(calls)
+        if schedule.open_refs() and not final:
+            return False
+        for func, args in self.held_calls:
+            func(*args)
+        self.held_calls = []
+
+        if schedule.base is None:
+            add_time = backend.current_time()
+            self.beginTime = self.baseLayer.convertTime_fromLayer_(add_time, None)
+        begins = schedule.resolve(self.beginTime)
+        if self.frame_budget is not None:
+            self.frame_budget.apply(self, [(begins[idx], self.animations[idx]) for idx in range(self.applied, end)])
+        else:
+            for idx in range(self.applied, end):
+                self.apply_animation(self.animations[idx], begins[idx], backend)
+        if end > self.applied:
+            self.segments += 1
+        self.applied = end
+        return True
+
+    def apply_animation(self, anim, begin, backend=None):
+        """
+        Add one resolved animation to its layer, with the completion delegate set up
+        """
+        if not anim.ignore_wait and anim.animation:
+            if backend is None:
+                backend = get_backend()
+            anim.animation.setValue_forKeyPath_(anim, "__CS_COMPLETION__")
+            anim.animation.setDelegate_(backend.animation_delegate())
+        anim.apply(begin)
+
     def commit(self):
-        add_time = CACurrentMediaTime()
-
-        target_map = {}
-        anim_map = {}
-        slayer_time = self.baseLayer.convertTime_fromLayer_(add_time, None)
-
-        total_time = 0.0
-        c_begin = slayer_time
-        latest_end_time = c_begin
-        for anim in self.animations:
-            if anim.label and not anim.isWaitMark:
-                anim_map[anim.label] = anim
-
-            if anim.cs_input:
-                if not anim.cs_input in target_map:
-                    target_map[anim.cs_input] = {'c_begin': c_begin, 'latest_end_time':0}
-            use_begin = slayer_time
-            if anim.isWaitMark:
-                tmp_begin = c_begin
-                use_end = latest_end_time
-                if anim.cs_input:
-                    tmp_begin = target_map[anim.cs_input]['c_begin']
-                    use_end = target_map[anim.cs_input]['latest_end_time']
-                if anim.label and anim.label in anim_map:
-                    label_anim = anim_map[anim.label]
-                    use_end = label_anim.end_time
-
-                if anim.isWaitOnly:
-                    tmp_begin += anim.duration
-                else:
-                    tmp_begin = use_end
-                    tmp_begin += anim.duration
-                if anim.cs_input:
-                    target_map[anim.cs_input]['c_begin'] = tmp_begin
-                else:
-                    c_begin = tmp_begin
-
-            if not anim.ignore_wait and anim.animation:
-                anim.animation.setValue_forKeyPath_(anim, "__CS_COMPLETION__")
-                anim.animation.setDelegate_(CSAnimationDelegate.alloc().init())
-            real_begin = c_begin
-            if anim.cs_input:
-                t_begin = target_map[anim.cs_input]['c_begin']
-                if real_begin > t_begin:
-                    target_map[anim.cs_input]['c_begin'] = real_begin
-                else:
-                    real_begin = t_begin
-            
-            a_duration = anim.apply(real_begin)
-            if not anim.ignore_wait:
-                latest_end_time = max(latest_end_time, real_begin+anim.duration)
-                if anim.cs_input:
-                    t_latest = target_map[anim.cs_input]['latest_end_time']
-                    n_latest = real_begin+anim.duration
-                    target_map[anim.cs_input]['latest_end_time'] = max(t_latest, n_latest)
-        CATransaction.commit()
+        commit_start = clock()
+        backend = get_backend()
+        if self.run is not None:
+            backend.begin_transaction()
+        calls = self.deferred_calls
+        self.deferred_calls = []
+        self.apply_through(len(self.animations), calls, final=True)
+        backend.commit_transaction()
+        self.commit_duration = clock() - commit_start
 
 
 
@@ -125,7 +220,11 @@ def animationDuration():
     global threadData
     return threadData.current_frame.duration
 
-def beginAnimation(duration=0.25):
+def beginAnimation(duration=None):
+    """
+    Start a new block. A block begun inside another one is nested: when it's committed it is composed into its parent,
+    its waits only waiting on what was added to it. duration defaults to the parent's.
+    """
     global threadData
 
     if not hasattr(threadData, 'superLayer'):
@@ -134,20 +233,81 @@ def beginAnimation(duration=0.25):
         threadData.current_frame = None
     if not hasattr(threadData, 'frames'):
         threadData.frames = []
+    if not hasattr(threadData, 'run'):
+        threadData.run = None
 
-    new_frame = AnimationBlock(duration)
+    parent = threadData.current_frame
+    if duration is None:
+        duration = parent.duration if parent else 0.25
+    new_frame = AnimationBlock(duration, threadData.run, parent=parent)
     new_frame.baseLayer = threadData.superLayer
-    if threadData.current_frame:
-        frames.append(threadData.current_frame)
+    if parent:
+        threadData.frames.append(parent)
     threadData.current_frame = new_frame
 
 
-def commitAnimation():
+def popAnimation():
+    """
+    End the current block without committing it or composing it into its parent. Returns it.
+    """
     global threadData
-    threadData.current_frame.commit()
-
+    popped = threadData.current_frame
     if not threadData.frames:
         threadData.current_frame = None
     else:
         threadData.current_frame = threadData.frames.pop()
+    return popped
+
+
+def commitAnimation():
+    global threadData
+    committed = threadData.current_frame
+    if committed.parent is not None:
+        committed.parent.add_block(committed)
+    elif committed.run is None:
+        committed.commit()
+    else:
+        #committed on the main thread when the script is done
+        committed.run.blocks.append(committed)
+
+    popAnimation()
+    return committed
+
+def run_animation(animation, input_arg, duration, superlayer, run=None, stream=False, frame_budget=None):
+    """
+    Run an animation plugin's do_animation() inside a new animation block and commit it.
+    Returns the committed AnimationBlock. When called on a worker thread by CSAnimationRun, run is the AnimationRun
+    and the blocks are handed to it instead of being committed. With stream set the top level block hands each
+    segment between global waits to the layers as soon as the script gets past it. A frame_budget
+    (CSFrameBudget.FrameBudget) spreads adding the top level block's animations over display frames.
+    """
+    global threadData
+    threadData.superLayer = superlayer
+    threadData.run = run
+    threadData.current_frame = None
+    threadData.frames = []
+
+    beginAnimation(duration)
+    top = threadData.current_frame
+    top.stream = stream
+    top.frame_budget = frame_budget
+    animation.wait = wait
+    animation.waitAnimation = waitAnimation
+    animation.animationDuration = animationDuration
+    animation.beginAnimation = beginAnimation
+    animation.commitAnimation = commitAnimation
+    animation.record_clip = CSAnimationClip.record_clip
+    animation.log = get_backend().log
+
+    try:
+        animation.do_animation(input_arg, duration)
+    except:
+        while threadData.current_frame is not top:
+            commitAnimation()
+        commitAnimation()
+        raise
+    #nested blocks the script didn't commit
+    while threadData.current_frame is not top:
+        commitAnimation()
+    return commitAnimation()
 
@@ -0,0 +1,137 @@
+"""
+Reusable animation clips.
+
+record_clip() runs a function that animates some inputs inside a nested block, resolves the block's schedule and keeps
+the result as a Clip, a mini timeline whose entries refer to the inputs by their position in the call. Nothing is
+animated by recording and the inputs' model values are put back the way they were.
+
+Clip.play() stamps the clip onto any inputs in the current block, beginning offset seconds after everything those
+inputs would wait on at that point. That only copies the recorded entries into new animations, the function isn't run
+again. Movement (position, translation, rotation) is relative: it is replayed from where each input is when the clip is
+played, other keypaths (opacity, bounds, ...) get the recorded values.
+"""
+import CSAnimationBlock
+from CSAnimationTimeline import Timeline, TimelineEntry
+from CSAnimationTiming import value_parts, make_value
+
+
+RELATIVE_KEYPATHS = ('position', 'position.x', 'position.y', 'transform.translation', 'transform.translation.x',
+                     'transform.translation.y', 'transform.rotation', 'transform.rotation.x', 'transform.rotation.y',
+                     'transform.rotation.z')
+
+
+def _shift(value, kind, delta, keyPath):
+    if value is None:
+        return None
+    parts = value_parts(value, keyPath)[1]
+    return make_value(kind, [part + change for part, change in zip(parts, delta)])
+
+
+def _shift_entry(entry, kind, delta):
+    keyPath = entry.keyPath
+    values = entry.values
+    if values is not None:
+        values = [_shift(value, kind, delta, keyPath) for value in values]
+    return entry.replace(values=values, fromValue=_shift(entry.fromValue, kind, delta, keyPath),
+                         toValue=_shift(entry.toValue, kind, delta, keyPath),
+                         end_value=_shift(entry.end_value, kind, delta, keyPath))
+
+
+class Clip(Timeline):
+    """
+    A recorded timeline. Entries name their input by its index in the record_clip() call, begin is relative to the
+    start of the clip. start_values has the (kind, floats) of each relative keypath when it was recorded, keyed by
+    (index, keyPath).
+    """
+
+    def __init__(self, entries=None, input_count=0, start_values=None):
+        super(Clip, self).__init__(entries)
+        self.input_count = input_count
+        self.start_values = start_values or {}
+
+    def entries_for(self, inputs):
+        """
+        The entries moved to where inputs are now
+        """
+        deltas = {}
+        for key, (kind, start) in self.start_values.items():
+            index, keyPath = key
+            now = value_parts(inputs[index].model_value(keyPath), keyPath)[1]
+            delta = tuple(value - start_value for value, start_value in zip(now, start))
+            if any(delta):
+                deltas[key] = (kind, delta)
+        if not deltas:
+            return self.entries
+        ret = []
+        for entry in self.entries:
+            shift = deltas.get((entry.input_name, entry.keyPath))
+            if shift is not None:
+                entry = _shift_entry(entry, shift[0], shift[1])
+            ret.append(entry)
+        return ret
+
+    def play(self, *inputs, **kwargs):
+        """
+        Add the clip's animations for inputs (in the order they were recorded) to the current block, offset seconds
+        after the point everything inputs would wait on. Returns the list of CSAnimations.
+        """
+        if len(inputs) != self.input_count:
+            raise ValueError("clip was recorded for %d inputs, got %d" % (self.input_count, len(inputs)))
+        offset = kwargs.get('offset', 0.0)
+        frame = CSAnimationBlock.threadData.current_frame
+        animations = []
+        offsets = []
+        for entry in self.entries_for(inputs):
+            cs_input = inputs[entry.input_name]
+            csanim = entry.make_animation(cs_input)
+            for key_path in entry.model_keypaths:
+                cs_input.set_model_value(entry.end_value, key_path)
+            animations.append(csanim)
+            offsets.append(offset + entry.begin)
+        frame.add_resolved(animations, offsets, inputs)
+        return animations
+
+
+def record_clip(build, *inputs, **kwargs):
+    """
+    Record build(*inputs) as a Clip. build animates the inputs the way a script would, waits included; duration
+    (default: the current block's) is the animation duration it sees. Everything it does has to be replayable, see
+    Timeline.from_block().
+    """
+    if getattr(CSAnimationBlock.threadData, 'current_frame', None) is None:
+        raise ValueError("clips are recorded inside an animation block")
+    CSAnimationBlock.beginAnimation(kwargs.get('duration'))
+    block = CSAnimationBlock.threadData.current_frame
+    block.start_values = {}
+    try:
+        build(*inputs)
+    finally:
+        CSAnimationBlock.popAnimation()
+        if block.parent.start_values is not None:
+            #recorded inside another clip, which has to see the values from before this one
+            for key, value in block.start_values.items():
+                block.parent.start_values.setdefault(key, value)
+        #undo the model writes; build's own layer writes are still deferred in the dropped block when it ran async
+        for (cs_input, keyPath), value in block.start_values.items():
+            cs_input.set_model_value(value, keyPath)
+
+    if not block.cacheable:
+        raise ValueError("clips can't contain animations that aren't replayable")
+    schedule = block.build_schedule(0.0)
+    entries = []
+    start_values = {}
+    for anim, begin in zip(block.animations, schedule.begins):
+        if anim.isWaitMark:
+            continue
+        if anim.cs_input not in inputs:
+            raise ValueError("clip animates an input it wasn't recorded for")
+        index = inputs.index(anim.cs_input)
+        anim.begin_time = begin
+        entry = TimelineEntry.from_animation(anim, index, 0.0)
+        if entry is None:
+            raise ValueError("clips can't contain animations with completion handlers")
+        entries.append(entry)
+        if anim.keyPath in RELATIVE_KEYPATHS and (index, anim.keyPath) not in start_values:
+            start = block.start_values[(anim.cs_input, anim.keyPath)]
+            start_values[(index, anim.keyPath)] = value_parts(start, anim.keyPath)
+    return Clip(entries, len(inputs), start_values)
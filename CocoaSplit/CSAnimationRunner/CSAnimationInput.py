@@ -0,0 +1,959 @@
+"""
+The input wrapper handed to animation scripts. All layer reads/writes go through the active animation backend
+"""
+import math
+import numbers
+import CSAnimationBlock
+from CSAnimation import *
+from CSAnimationBackend import get_backend
+from CSGeometrySnapshot import GeometrySnapshot
+from CSAnimationTiming import timing_curve, timing_keyframes, make_value
+
+try:
+    import numpy as np
+except ImportError:
+    #keyframe lists are converted one keyframe at a time
+    np = None
+
+#shorter keyframe lists are faster one keyframe at a time than through numpy
+MIN_BATCH_KEYFRAMES = 32
+
+
+class CSAnimationInput(object):
+    fingerprint_keypaths = ('transform.rotation.x', 'transform.rotation.y', 'transform.rotation.z', 'transform.scale',
+                            'opacity', 'hidden', 'zPosition', 'borderWidth', 'cornerRadius')
+    translation_keypaths = ('transform.translation', 'transform.translation.x', 'transform.translation.y')
+
+    def __init__(self, cs_input):
+        self.__input__ = cs_input
+        self.__layer__ = cs_input.layer()
+        self.__animationLayer__ = cs_input.animationLayer()
+        self.geometry = GeometrySnapshot(self.__animationLayer__, self.__layer__)
+        self.frames = []
+        self.current_frame = None
+    
+    
+    def snapshot_geometry(self):
+        """
+        Read every layer property the animation methods use into the geometry snapshot, so a script running on
+        another thread doesn't have to touch the layer
+        """
+        return self.geometry.load(self.fingerprint_keypaths + self.translation_keypaths)
+
+    def geometry_fingerprint(self):
+        """
+        Hashable snapshot of every layer property an animation script can read from this input.
+        Two inputs with the same fingerprint produce the same animations from the same script.
+        """
+        geometry = self.geometry
+        m_bounds = geometry.bounds_rect()
+        translation = geometry.value('transform.translation').sizeValue()
+        ret = list(geometry.frame_rect())
+        ret.extend([m_bounds[0], m_bounds[1], translation.width, translation.height])
+        for key_path in self.fingerprint_keypaths:
+            ret.append(geometry.value(key_path))
+        s_bounds = geometry.superlayer_rect()
+        if s_bounds:
+            ret.extend(s_bounds)
+        return tuple(ret)
+    
+    @property
+    def input(self):
+        """
+        The source being animated. This is set via the UI and animation_input keys to the input dict.
+        """
+        return self.__input__
+    
+    @property
+    def layer(self):
+        """
+        The InputSource's CALayer.
+        """
+        return self.__layer__
+    
+    @property
+    def animationLayer(self):
+        """
+        A "shadow" copy of the layer being animated. This layer is updated as animations are applied to the layer.
+        """
+        return self.__animationLayer__
+    
+    
+    @property
+    def width(self):
+        """
+        Current width of the input
+        """
+        return self.geometry.bounds_rect()[2]
+    
+    @property
+    def height(self):
+        """
+        Current height of the input
+        """
+        return self.geometry.bounds_rect()[3]
+    
+    
+    @property
+    def minY(self):
+        """
+        Minimum Y value, otherwise known as the Y coordinate of the input's origin
+        """
+        return self.geometry.frame_rect()[1]
+    
+    @property
+    def maxY(self):
+        """
+        Maximum Y value of the input's frame. origin.y+height
+        """
+        m_frame = self.geometry.frame_rect()
+        return m_frame[1] + m_frame[3]
+
+    @property
+    def minX(self):
+        """
+        Minimum X value, otherwise known as the X coordinate of the input's origin
+        """
+        return self.geometry.frame_rect()[0]
+    
+    @property
+    def maxX(self):
+        """
+        Maximum X value of the input's frame. origin.x+width
+        """
+        m_frame = self.geometry.frame_rect()
+        return m_frame[0] + m_frame[2]
+
+    @property
+    def midY(self):
+        """
+        Midpoint of the input's frame on the Y axis. origin.y+(height/2)
+        """
+        m_frame = self.geometry.frame_rect()
+        return m_frame[1] + m_frame[3]/2
+
+    @property
+    def midX(self):
+        """
+        Midpoint of the input's frame on the X axis. origin.x+(width/2)
+        """
+        m_frame = self.geometry.frame_rect()
+        return m_frame[0] + m_frame[2]/2
+
+
+    def basic_animation(self, forKey, withDuration):
+        cab = get_backend().basic_animation(forKey)
+        if withDuration != None:
+            cab.setDuration_(withDuration)
+        else:
+            cab.setDuration_(CSAnimationBlock.threadData.current_frame.duration)
+        return cab
+    
+
+    def keyframe_animation(self, forKey, withDuration):
+    
+        kanim = get_backend().keyframe_animation(forKey)
+        if withDuration != None:
+            kanim.setDuration_(withDuration)
+        else:
+            kanim.setDuration_(CSAnimationBlock.threadData.current_frame.duration)
+        kanim.setCalculationMode_('paced')
+        kanim.setRotationMode_('autoReverse')
+        
+        return kanim
+        
+    
+    def simple_animation(self, forKey, toValue, withDuration=None, **kwargs):
+        """
+        Animate forKey to toValue, or through it if it's a list of keyframes or a path. timing= is a named
+        CAMediaTimingFunction or anything CSAnimationTiming.timing_curve() takes: a curve like Spring(), a curve name
+        like 'bounce', or cubic bezier control points (x1, y1, x2, y2). Curves are sampled into keyframes.
+        """
+        
+        real_end_value = toValue
+        
+        for_layer = self.layer
+        
+        if 'source_only' in kwargs and kwargs['source_only']:
+            for_layer = self.layer.sourceLayer()
+        if 'use_layer' in kwargs:
+            for_layer = kwargs['use_layer']
+
+        curve = timing_curve(kwargs.get('timing'))
+        if curve is not None:
+            del kwargs['timing']
+            if type(toValue) in (list,tuple):
+                path = toValue
+                real_end_value = toValue[-1]
+            elif 'use_fromVal' in kwargs:
+                path = (kwargs['use_fromVal'], toValue)
+            elif for_layer is self.layer:
+                path = (self.geometry.value(forKey), toValue)
+            else:
+                path = (for_layer.valueForKeyPath_(forKey), toValue)
+            banim = self.keyframe_animation(forKey, withDuration)
+            values, key_times = timing_keyframes(curve, path, forKey, kwargs.pop('timing_samples', None))
+            banim.setCalculationMode_('linear')
+            banim.setValues_(values)
+            banim.setKeyTimes_(key_times)
+        elif type(toValue) in (list,tuple) or get_backend().is_path(toValue):
+            banim = self.keyframe_animation(forKey, withDuration)
+            real_end_value = toValue[-1]
+            banim.setValues_(toValue)
+        else:
+            banim = self.basic_animation(forKey, withDuration)
+            if 'use_fromVal' in kwargs:
+                banim.setFromValue_(kwargs['use_fromVal'])
+            banim.setToValue_(toValue)
+
+        csanim = CSAnimation(for_layer, forKey, banim, **kwargs)
+        
+        if not 'autoreverse' in kwargs:
+            self.set_model_value(real_end_value, forKey)
+            csanim.model_keypaths = [forKey]
+            if 'extra_keypath' in kwargs:
+                self.set_model_value(real_end_value, kwargs['extra_keypath'])
+                csanim.model_keypaths.append(kwargs['extra_keypath'])
+        
+        
+        csanim.toValue = real_end_value
+
+        return self.add_animation(csanim, for_layer, forKey)
+    
+    
+    def set_model_value(self, value, keyPath):
+        """
+        Write value to keyPath on the animation layer and keep the geometry snapshot in sync. Inside a block built
+        on a worker thread the layer write waits for the block's commit.
+        """
+        frame = getattr(CSAnimationBlock.threadData, 'current_frame', None)
+        if frame is not None:
+            if frame.start_values is not None:
+                frame.note_start_value(self, keyPath)
+            frame.defer(self.animationLayer.setValue_forKeyPath_, value, keyPath)
+        else:
+            self.animationLayer.setValue_forKeyPath_(value, keyPath)
+        self.geometry.model_value_written(keyPath, value)
+
+    def model_value(self, keyPath):
+        """
+        Model value of keyPath as the script sees it, including what earlier animations in the script wrote
+        """
+        if keyPath == 'position':
+            return make_value('point', self.geometry.position_point())
+        if keyPath == 'position.x':
+            return self.geometry.position_point()[0]
+        if keyPath == 'position.y':
+            return self.geometry.position_point()[1]
+        return self.geometry.value(keyPath)
+
+
+    def make_animation_values(self,initial_value, anim_value, valueMaker, points=False, batchMaker=None):
+        """
+        Run valueMaker over anim_value, or over each keyframe if anim_value is a list/tuple of keyframes.
+        For point valued animations (points=True) a single (x,y) tuple is one value, not two keyframes.
+        Keyframes can also be a numpy array, shape (n,) or (n, 2) for points. When numpy is available, batchMaker
+        gets the keyframes of an array or a long list all at once as a float array of that shape and returns the
+        list of values.
+        """
+
+        ret_val = None
+
+        if np is not None and isinstance(anim_value, np.ndarray):
+            if anim_value.ndim < (2 if points else 1):
+                return valueMaker(anim_value.tolist())
+        elif not (type(anim_value) in (list,tuple) and not (points and anim_value and isinstance(anim_value[0], numbers.Number))):
+            return valueMaker(anim_value)
+
+        val_arr = []
+        if initial_value is not None:
+            val_arr.append(initial_value)
+
+        keyframes = None
+        if batchMaker is not None and (len(anim_value) >= MIN_BATCH_KEYFRAMES or type(anim_value) not in (list,tuple)):
+            keyframes = self.keyframe_array(anim_value, points)
+        if keyframes is not None:
+            val_arr.extend(batchMaker(keyframes))
+        else:
+            if np is not None and isinstance(anim_value, np.ndarray):
+                anim_value = anim_value.tolist()
+            for val in anim_value:
+                n_val = valueMaker(val)
+                val_arr.append(n_val)
+        ret_val = val_arr
+
+        return ret_val
+
+
+    def keyframe_array(self, anim_value, points=False):
+        """
+        Keyframes as a float numpy array, (n, 2) for points. None without numpy or if they aren't plain numbers.
+        """
+        if np is None:
+            return None
+        try:
+            keyframes = np.asarray(anim_value, dtype=float)
+        except (TypeError, ValueError):
+            return None
+        if keyframes.ndim != (2 if points else 1) or (points and keyframes.shape[1] != 2):
+            return None
+        return keyframes
+
+
+    def real_coordinates_from_fract(self, values, axis):
+        """
+        real_coordinate_from_fract() for an array of x (axis 0) or y (axis 1) coordinates
+        """
+        fract = (values > 0.0) & (values <= 1.0)
+        if not fract.any():
+            return values
+        s_bounds = self.geometry.superlayer_rect()
+        return np.where(fract, s_bounds[axis] + s_bounds[axis + 2] * values, values)
+
+
+    def adjust_coordinate_array(self, values, axis):
+        """
+        adjust_coordinates() for an array of x (axis 0) or y (axis 1) coordinates
+        """
+        return values - self.geometry.frame_rect()[axis]
+
+
+    def add_animation(self, animation, target, keyPath):
+        animation.cs_input = self
+        current_frame = CSAnimationBlock.threadData.current_frame
+        if current_frame.start_values is not None:
+            #animations that don't write a model value (autoreverse) still need their start value in a clip
+            current_frame.note_start_value(self, keyPath)
+        current_frame.add_animation(animation, target, keyPath)
+        return animation
+    
+
+    def adjust_coordinates(self, x, y):
+        m_frame = self.geometry.frame_rect()
+        return get_backend().make_point(x-m_frame[0], y-m_frame[1])
+
+    def real_coordinate_from_fract(self, x,y):
+        ret_x = x
+        ret_y = y
+        if x > 0.0 and x <= 1.0:
+            s_bounds = self.geometry.superlayer_rect()
+            ret_x = s_bounds[0] + (s_bounds[2] * x)
+        if y > 0.0 and y <= 1.0:
+            s_bounds = self.geometry.superlayer_rect()
+            ret_y = s_bounds[1] + (s_bounds[3] * y)
+        return get_backend().make_point(ret_x, ret_y)
+
+
+    def multiTransition(self, duration=None):
+        """
+        Trigger this inputs "multi source" transition
+        If the duration isn't explicitly set the current user-configured value is used.
+        This function doesn't honor auto-reverse or count towards wait animation calculations, it merely calls the transition function on the input with the duration set. Returns the duration of the transition.
+        """
+        
+        if duration:
+            retval = duration
+        else:
+            retval = self.input.transitionDuration()
+
+        def transition():
+            if duration:
+                restore_duration = self.input.setTransitionDuration_(duration)
+            else:
+                restore_duration = None
+            self.input.multiChangeForce()
+            if restore_duration:
+                self.input.setTransitionDuration_(restore_duration)
+
+        #this happens immediately instead of being recorded in the block, so the block can't be replayed from a cache
+        current_frame = CSAnimationBlock.threadData.current_frame
+        current_frame.cacheable = False
+        current_frame.defer(transition)
+        return retval
+    
+    def waitAnimation(self, duration=0, **kwargs):
+        """
+        Wait for all in-progress animations on this input to complete before adding any more. 
+        This ONLY changes the timing for the input this wait is applied to. Example:
+        input1.moveTo(0,0,2.5)
+        input2.moveTo(100,100.5.5)
+        input1.waitAnimation()
+        input2.rotate(360, 5.5)
+        input1.moveCenter(3.5)
+        
+        input1 will start to move towards the bottom left corner and simultaneously input2 will begin its rotation AND begin moving to 100,100.
+        After input1 finishes moving to the corner it will then start moving towards the center.
+        Notice that the timing of input2's animations are not modified by the waitAnimation() on input1.
+        
+        Like the global waitAnimation() you can specify a keyword argument of 'label' to wait on a specific animation.
+        """
+        return CSAnimationBlock.threadData.current_frame.waitAnimation(duration, self, **kwargs)
+    
+    def wait(self, duration=0):
+        """
+        Wait duration seconds before starting any new animations on this input. As described previously in waitAnimation() this 
+        only modifies the timing of animations on THIS input.
+        """
+        return CSAnimationBlock.threadData.current_frame.wait(duration, self)
+    
+    def scaleLayer(self, scaleVal, duration=None, **kwargs):
+        """
+        Apply a uniform scale transform to the layer. Grows or shrinks the input by the given scale. 
+        
+        Two important points about scale animations:
+        1) They ARE NOT PERMANENT. If you use an animation to apply a 0.5 scale to an input, then go live or save the layout, the scale does not carry over. If you want to make the change permanent use scaleSize()
+        2) The scale is relative to the original size of the input. So applying one 2x scale and then another 2x scale only results in the scale changing once.
+        """
+        
+        cval = self.geometry.value('transform.scale')
+        
+        anim_vals = self.make_animation_values(cval, scaleVal, lambda x: x)
+        return self.simple_animation('transform.scale', anim_vals, duration, **kwargs)
+    
+
+    def scaleSize(self, scaleVal, duration=None, **kwargs):
+        """
+        Changes the input bounds by scaleVal. This change IS permanent; if you save and restore the layout after performing a scaleSize() the input will retain the size it was set to by the animation. Note that the scaleVal is relative to the CURRENT size of the input, so applying a 2x scaleSize followed by another 2x scaleSize will result in something 4x as big as the original bounds.
+        """
+        m_bounds = self.geometry.bounds_rect()
+        curr_width = m_bounds[2]
+        curr_height = m_bounds[3]
+        return self.size((curr_width * scaleVal, curr_height*scaleVal), duration, **kwargs)
+    
+    def sizeWidth(self, width, duration=None, **kwargs):
+        """
+        Set the width of the input. This change saves/is permanent. It is applied to the underlying layer's bounds.
+        """
+
+        move_frames = []
+        original_width = self.width
+        
+        def vmk(val):
+            
+            mvval = None
+            if 'anchorLeft' in kwargs and kwargs['anchorLeft']:
+                mvval = (val - original_width)/2
+            elif 'anchorRight' in kwargs and kwargs['anchorRight']:
+                mvval = (original_width - val)/2
+            if mvval is not None:
+                move_frames.append(mvval)
+            return val
+        
+        anim_vals = self.make_animation_values(self.width, width, vmk)
+        kwargs['use_fromVal'] = self.width
+        kwargs['extra_keypath'] = 'bounds.size.width'
+        ret = self.simple_animation('fakeWidth', anim_vals, duration, **kwargs)
+        kwargs.pop('use_fromVal', None)
+        kwargs.pop('extra_keypath', None)
+
+        self.moveX(move_frames, duration, **kwargs)
+        return ret
+    
+    def sizeHeight(self, height, duration=None, **kwargs):
+        """
+        Set the height of the input. This change saves/is permanent. It is applied to the underlying layer's bounds.
+        """
+        move_frames = []
+        original_height = self.height
+        
+        def vmk(val):
+            mvval = None
+            if 'anchorBottom' in kwargs and kwargs['anchorBottom']:
+                mvval = (val - original_height)/2
+            elif 'anchorTop' in kwargs and kwargs['anchorTop']:
+                mvval = (original_height - val)/2
+            if mvval is not None:
+                move_frames.append(mvval)
+            return val
+        
+        anim_vals = self.make_animation_values(self.height, height, vmk)
+        kwargs['use_fromVal'] = self.height
+        kwargs['extra_keypath'] = 'bounds.size.height'
+        ret = self.simple_animation('fakeHeight', anim_vals, duration, **kwargs)
+        kwargs.pop('use_fromVal', None)
+        kwargs.pop('extra_keypath', None)
+        
+        self.moveY(move_frames, duration, **kwargs)
+        return ret
+
+    def size(self, size_tpl, duration=None, **kwargs):
+        """
+        Set the width and height of the input. This change saves/is permanent. It is applied to the underlying layer's bounds.
+        """
+        
+        if type(size_tpl[0]) in (list, tuple):
+            width_vals = [x[0] for x in size_tpl]
+            height_vals = [y[1] for y in size_tpl]
+        else:
+            width_vals = size_tpl[0]
+            height_vals = size_tpl[1]
+
+        self.sizeWidth(width_vals, duration, **kwargs)
+        return self.sizeHeight(height_vals, duration, **kwargs)
+    
+    
+    def translateYTo(self, y, duration=None, **kwargs):
+        """
+        Translate/move the input on the y-axis to the new value y. The final result of this translation is not permanent/saved. If you translate an input and then manually move it via the UI or via the move* functions, it may not restore/go live in the exact position it appears in the layout. Use caution.
+        """
+        cval = self.geometry.value('transform.translation.y')
+
+        def vmk(val):
+            new_coord = self.real_coordinate_from_fract(0,val)
+            new_coord = self.adjust_coordinates(0,new_coord.y)
+            return new_coord.y + cval
+
+        def batch(vals):
+            return (self.adjust_coordinate_array(self.real_coordinates_from_fract(vals, 1), 1) + cval).tolist()
+
+        anim_vals = self.make_animation_values(0, y, vmk, batchMaker=batch)
+        
+        
+        return self.simple_animation('transform.translation.y', anim_vals, duration, **kwargs)
+    
+    def translateXTo(self, x, duration=None, **kwargs):
+        """
+        Translate/move the input on the x-axis to the new value x. The final result of this translation is not permanent/saved. If you translate an input and then manually move it via the UI or via the move* functions, it may not restore/go live in the exact position it appears in the layout. Use caution.
+        """
+        cval = self.geometry.value('transform.translation.x')
+
+        def vmk(val):
+            new_coord = self.real_coordinate_from_fract(val,0)
+            new_coord = self.adjust_coordinates(new_coord.x,0)
+            return new_coord.x + cval
+
+        def batch(vals):
+            return (self.adjust_coordinate_array(self.real_coordinates_from_fract(vals, 0), 0) + cval).tolist()
+
+        anim_vals = self.make_animation_values(0,x,vmk, batchMaker=batch)
+        return self.simple_animation('transform.translation.x', anim_vals, duration, **kwargs)
+
+    def translateTo(self, pos_tpl,duration=None, **kwargs):
+        """
+        Translate/move the input's origin to the coordinate (x,y) The final result of this translation is not permanent/saved. If you translate an input and then manually move it via the UI or via the move* functions, it may not restore/go live in the exact position it appears in the layout. Use caution.
+        """
+        backend = get_backend()
+        cpos = self.geometry.value('transform.translation')
+        csize = cpos.sizeValue()
+        def vmk(val):
+            new_coord = self.real_coordinate_from_fract(val[0], val[1])
+            new_coord = self.adjust_coordinates(new_coord.x,new_coord.y)
+            nsize = backend.make_size(csize.width+new_coord.x, csize.height+new_coord.y)
+            return backend.size_value(nsize)
+
+        def batch(vals):
+            widths = self.adjust_coordinate_array(self.real_coordinates_from_fract(vals[:, 0], 0), 0) + csize.width
+            heights = self.adjust_coordinate_array(self.real_coordinates_from_fract(vals[:, 1], 1), 1) + csize.height
+            return backend.size_values(widths.tolist(), heights.tolist())
+
+        isize = backend.make_size(0,0)
+
+        anim_vals = self.make_animation_values(backend.size_value(isize), pos_tpl, vmk, points=True, batchMaker=batch)
+        return self.simple_animation('transform.translation', anim_vals, duration, **kwargs)
+
+    def translateY(self, y, duration=None, **kwargs):
+        
+        cval = self.geometry.value('transform.translation.y')
+
+        def vmk(val):
+            new_coord = self.real_coordinate_from_fract(0,val)
+            return new_coord.y+cval
+
+        def batch(vals):
+            return (self.real_coordinates_from_fract(vals, 1) + cval).tolist()
+
+        anim_vals = self.make_animation_values(0, y, vmk, batchMaker=batch)
+        
+        return self.simple_animation('transform.translation.y', anim_vals, duration, **kwargs)
+ 
+    def translateX(self, x, duration=None, **kwargs):
+        
+        cval = self.geometry.value('transform.translation.x')
+
+        def vmk(val):
+            new_coord = self.real_coordinate_from_fract(val,0)
+            return new_coord.x+cval
+
+        def batch(vals):
+            return (self.real_coordinates_from_fract(vals, 0) + cval).tolist()
+
+        anim_vals = self.make_animation_values(0,x,vmk, batchMaker=batch)
+
+        return self.simple_animation('transform.translation.x', anim_vals, duration, **kwargs)
+    
+    def translate(self, pos_tpl,duration=None, **kwargs):
+        
+        backend = get_backend()
+        cpos = self.geometry.value('transform.translation')
+        csize = cpos.sizeValue()
+
+        def vmk(val):
+            new_coord = self.real_coordinate_from_fract(val[0],val[1])
+            return backend.make_size(csize.width+new_coord.x, csize.height+new_coord.y)
+
+        def batch(vals):
+            widths = self.real_coordinates_from_fract(vals[:, 0], 0) + csize.width
+            heights = self.real_coordinates_from_fract(vals[:, 1], 1) + csize.height
+            make_size = backend.make_size
+            return [make_size(width, height) for width, height in zip(widths.tolist(), heights.tolist())]
+
+        isize = backend.make_size(0,0)
+        anim_vals = self.make_animation_values(backend.size_value(isize), pos_tpl, vmk, points=True, batchMaker=batch)
+        
+        return self.simple_animation('transform.translation', anim_vals, duration, **kwargs)
+    
+    def translateCenter(self, duration=None, **kwargs):
+        """
+            Translate to the center of the layout. This translate is slight different from the other translate animations; it moves the input's CENTER to the center of the layout. The final result of this translation is not permanent/saved. If you translate an input and then manually move it via the UI or via the move* functions, it may not restore/go live in the exact position it appears in the layout. Use caution.
+            """
+        root_bounds = self.geometry.superlayer_rect()
+        m_frame = self.geometry.frame_rect()
+        #we want to move our center to root center. do anchor point correction..
+        new_x = root_bounds[2] * 0.5 - m_frame[2] * 0.5
+        new_y = root_bounds[3] * 0.5 - m_frame[3] * 0.5
+        return self.translateTo((new_x, new_y), duration, **kwargs)
+
+    def moveX(self, move_x, duration=None, **kwargs):
+        """
+        Move the input's X coordinate by move_x units. This change is permanent/saved. If you want non-saved move use the translate* animations
+        """
+        
+        cpos = self.geometry.position()
+        
+        def vmk(val):
+            new_coord = self.real_coordinate_from_fract(val,0)
+            return cpos.x+new_coord.x
+
+        def batch(vals):
+            return (self.real_coordinates_from_fract(vals, 0) + cpos.x).tolist()
+
+        anim_vals = self.make_animation_values(cpos.x, move_x, vmk, batchMaker=batch)
+        return self.simple_animation('position.x', anim_vals, duration, **kwargs)
+    
+    def moveY(self, move_y, duration=None, **kwargs):
+        """
+        Move the input's Y coordinate by move_y units. This change is permanent/saved. If you want non-saved move use the translate* animations
+        """
+        cpos = self.geometry.position()
+        def vmk(val):
+            new_coord = self.real_coordinate_from_fract(0,val)
+            return cpos.y+new_coord.y
+
+        def batch(vals):
+            return (self.real_coordinates_from_fract(vals, 1) + cpos.y).tolist()
+
+        anim_vals = self.make_animation_values(cpos.y, move_y, vmk, batchMaker=batch)
+
+        return self.simple_animation('position.y', anim_vals, duration, **kwargs)
+
+
+    def move(self, pos_tpl, duration=None, **kwargs):
+        """
+        Move the input's position by move_x and move_y units This change is permanent/saved. If you want non-saved move use the translate* animations
+        """
+        backend = get_backend()
+        curr_x, curr_y = self.geometry.position_point()
+
+        def vmk(val):
+            new_coord = self.real_coordinate_from_fract(val[0],val[1])
+            return backend.make_point(curr_x+new_coord.x, curr_y+new_coord.y)
+
+        def batch(vals):
+            xs = self.real_coordinates_from_fract(vals[:, 0], 0) + curr_x
+            ys = self.real_coordinates_from_fract(vals[:, 1], 1) + curr_y
+            make_point = backend.make_point
+            return [make_point(x, y) for x, y in zip(xs.tolist(), ys.tolist())]
+
+        anim_vals = self.make_animation_values(backend.make_point(curr_x, curr_y), pos_tpl, vmk, points=True,
+                                               batchMaker=batch)
+        
+        return self.moveTo(anim_vals, duration, **kwargs)
+    
+    
+    
+    def moveCenter(self, duration=None, **kwargs):
+        """
+        Move to the center of the layout. This move is slight different from the other move animations; it moves the input's CENTER to the center of the layout.
+        """
+        root_bounds = self.geometry.superlayer_rect()
+        m_frame = self.geometry.frame_rect()
+        #we want to move our center to root center. do anchor point correction..
+        new_x = root_bounds[2] * 0.5 - m_frame[2] * 0.5
+        new_y = root_bounds[3] * 0.5 - m_frame[3] * 0.5
+        return self.moveTo((new_x, new_y), duration, **kwargs)
+    
+    
+    def moveYTo(self, move_y, duration=None, **kwargs):
+        """
+        Move the y component of the input's origin to the move_y point. The origin of an input is the input's bottom left corner. This is an absolute positioning, not a delta from the current position. This move is permanent/saved. If you want a non-saved move use the translate* animations.
+        """
+        c_pos = self.geometry.position()
+        
+        def vmk(val):
+            new_coord = self.real_coordinate_from_fract(0,val)
+            new_coord = self.adjust_coordinates(0,new_coord.y)
+            n_val = c_pos.y + new_coord.y
+            return n_val
+
+        def batch(vals):
+            return (self.adjust_coordinate_array(self.real_coordinates_from_fract(vals, 1), 1) + c_pos.y).tolist()
+
+        anim_value = self.make_animation_values(c_pos.y, move_y, vmk, batchMaker=batch)
+
+        return self.simple_animation('position.y', anim_value, duration, **kwargs)
+    
+    def moveXTo(self, move_x, duration=None, **kwargs):
+        """
+        Move the x component of the input's origin to the move_x point. The origin of an input is the input's bottom left corner. This is an absolute positioning, not a delta from the current position. This move is permanent/saved. If you want a non-saved move use the translate* animations.
+        """
+        c_pos = self.geometry.position()
+        
+        def vmk(val):
+            new_coord = self.real_coordinate_from_fract(val, 0)
+            new_coord = self.adjust_coordinates(new_coord.x, 0)
+            n_val = c_pos.x + new_coord.x
+            return n_val
+
+        def batch(vals):
+            return (self.adjust_coordinate_array(self.real_coordinates_from_fract(vals, 0), 0) + c_pos.x).tolist()
+
+        anim_value = self.make_animation_values(c_pos.x, move_x, vmk, batchMaker=batch)
+        
+        return self.simple_animation('position.x', anim_value, duration, **kwargs)
+
+    def moveTo(self, move_tpl, duration=None, **kwargs):
+        """
+        Move the y component of the input's origin to (move_x, move_y) The origin of an input is the input's bottom left corner. This is an absolute positioning, not a delta from the current position. This move is permanent/saved. If you want a non-saved move use the translate* animations.
+        """
+
+        backend = get_backend()
+        c_pos = self.geometry.position()
+
+        def vmk(val):
+            new_coord = self.real_coordinate_from_fract(val[0], val[1])
+            new_coord = self.adjust_coordinates(new_coord.x, new_coord.y)
+            n_pos = backend.make_point(c_pos.x + new_coord.x, c_pos.y + new_coord.y)
+            return backend.point_value(n_pos)
+
+        def batch(vals):
+            xs = self.adjust_coordinate_array(self.real_coordinates_from_fract(vals[:, 0], 0), 0) + c_pos.x
+            ys = self.adjust_coordinate_array(self.real_coordinates_from_fract(vals[:, 1], 1), 1) + c_pos.y
+            return backend.point_values(xs.tolist(), ys.tolist())
+
+        anim_vals = self.make_animation_values(backend.point_value(c_pos), move_tpl, vmk, points=True,
+                                               batchMaker=batch)
+        
+        return self.simple_animation('position', anim_vals, duration, **kwargs)
+    
+    def opacity(self, opacity, duration=None, **kwargs):
+        """
+        Change the opacity/transparency of the input.
+        """
+        
+        anim_vals = self.make_animation_values(self.geometry.value('opacity'), opacity, lambda x: x)
+        
+        return self.simple_animation('opacity', anim_vals, duration, **kwargs)
+
+
+    def rotateX(self, angle, duration=None, **kwargs):
+        """
+        Rotate the input around the x-axis by angle degrees. This rotation is additive: a rotate of 45 degrees followed by another rotate of 45 degrees results in a total rotation of 90 degrees. This rotation is not permanent, it will not persist across save/restore or go live.
+        """
+        fromVal = self.geometry.value('transform.rotation.x')
+
+        anim_vals = self.make_animation_values(fromVal, angle, lambda x: fromVal+math.radians(x))
+        
+        return self.simple_animation('transform.rotation.x', anim_vals, duration, **kwargs)
+
+    def rotateY(self, angle, duration=None, **kwargs):
+        """
+        Rotate the input around the y-axis by angle degrees. This rotation is additive: a rotate of 45 degrees followed by another rotate of 45 degrees results in a total rotation of 90 degrees. This rotation is not permanent, it will not persist across save/restore or go live.
+        """
+        fromVal = self.geometry.value('transform.rotation.y')
+        
+        anim_vals = self.make_animation_values(fromVal, angle, lambda x: fromVal+math.radians(x))
+
+        return self.simple_animation('transform.rotation.y', anim_vals, duration, **kwargs)
+    
+    def rotateXTo(self, angle, duration=None, **kwargs):
+        
+        initVal = self.geometry.value('transform.rotation.x')
+
+        anim_vals = self.make_animation_values(initVal, angle, lambda x: math.radians(x))
+        
+        return self.simple_animation('transform.rotation.x', anim_vals, duration, **kwargs)
+
+    def rotateYTo(self, angle, duration=None, **kwargs):
+        initVal = self.geometry.value('transform.rotation.y')
+        
+        anim_vals = self.make_animation_values(initVal, angle, lambda x: math.radians(x))
+        
+        return self.simple_animation('transform.rotation.y', anim_vals, duration, **kwargs)
+
+
+    def rotate(self, angle, duration=None, **kwargs):
+        """
+        Rotate the input by angle degrees. Positive angles are anti-clockwise, negative angles are clockwise. This rotation is additive: a rotate of 45 degrees followed by another rotate of 45 degrees results in a total rotation of 90 degrees. This rotation is not permanent, it will not persist across save/restore or go live.
+        """
+        fromVal = self.geometry.value('transform.rotation.z')
+        
+        
+        anim_vals = self.make_animation_values(fromVal, angle, lambda x: fromVal+math.radians(x))
+        
+        return self.simple_animation('transform.rotation.z', anim_vals, duration, **kwargs)
+    
+    def rotateTo(self, angle, duration=None, **kwargs):
+        """
+        Rotate the input to the specified angle. 
+        """
+        fromVal = self.geometry.value('transform.rotation.z')
+        
+        
+        anim_vals = self.make_animation_values(fromVal, angle, lambda x: math.radians(x))
+        
+        return self.simple_animation('transform.rotation.z', anim_vals, duration, **kwargs)
+
+
+    def borderwidth(self, width, duration=None, **kwargs):
+        """
+        Change the border width of the input. You probably also want to set a border color.
+        """
+        fromVal = self.geometry.value('borderWidth')
+        
+        anim_vals = self.make_animation_values(fromVal, width, lambda x: x)
+
+        return self.simple_animation('borderWidth', anim_vals, duration, **kwargs)
+
+    def cornerradius(self, radius, duration=None, **kwargs):
+        """
+        Change the corner radius of the input. The corner radius is what creates rounded corners.
+        """
+        fromVal = self.geometry.value('cornerRadius')
+        
+        anim_vals = self.make_animation_values(fromVal, radius, lambda x: x)
+        
+        return self.simple_animation('cornerRadius', anim_vals, duration, **kwargs)
+
+    def __hidden_complete__(self, animation, yesno):
+        animation.set_model_value()
+        animation.target.setHidden_(yesno)
+    
+    def hidden(self, yesno, duration=None, **kwargs):
+        ret = self.simple_animation('hidden', yesno, duration, **kwargs)
+        ret.internal_completion_handler = lambda a: self.__hidden_complete__(a, yesno)
+        return ret
+
+    def hide(self, duration=None, **kwargs):
+        """
+        Hide the input, making it not visible. If it is already hidden this does nothing, but the duration will count towards any waitAnimation() calls
+        """
+
+        return self.hidden(True, duration, **kwargs)
+    
+    def show(self, duration=None, **kwargs):
+        """
+        Make the input visible. If it is already visible this does nothing, but the duration will count towards any waitAnimation() calls
+        """
+        return self.hidden(False, duration, **kwargs)
+    
+    def toggle(self, duration=None, **kwargs):
+        """
+        Toggle the visibility of the input. If it's hidden, show it, if it's visible hide etc. There is no fadein/fadeout animation for this change. The duration basically acts as a delay, if you hide an input with a duration of 2, it waits 2 seconds before hiding.
+        """
+        cval = self.geometry.value('hidden')        
+        return self.hidden(not cval, duration, **kwargs)
+    
+    
+    def zPosition(self, zpos, duration=None, **kwargs):
+        """
+        Change the depth of the input to zpos.
+        """
+        return self.simple_animation('zPosition', zpos, duration, **kwargs)
+
+    def __calculateRelativeMove(self, toInput, **kwargs):
+        m_frame = self.geometry.frame_rect()
+        m_bounds = self.geometry.bounds_rect()
+        new_coords = get_backend().make_point(m_frame[0], m_frame[1])
+        if 'left' in kwargs:
+            l_space = kwargs['left']
+            new_coords.x = toInput.minX-m_bounds[2]-l_space
+        elif 'right' in kwargs:
+            r_space = kwargs['right']
+            new_coords.x = toInput.maxX+r_space
+        
+        if 'top' in kwargs:
+            t_space = kwargs['top']
+            new_coords.y = toInput.maxY+t_space
+        elif 'bottom' in kwargs:
+            b_space = kwargs['bottom']
+            new_coords.y = toInput.minY-m_bounds[3]-b_space
+        
+        if 'offsetX' in kwargs:
+            ex_space = kwargs['offsetX']
+            new_coords.x = toInput.minX+ex_space
+
+        if 'offsetY' in kwargs:
+            ex_space = kwargs['offsetY']
+            new_coords.y = toInput.minY+ex_space
+        return new_coords
+            
+
+
+    def translateRelativeTo(self, toInput, duration=None, **kwargs):
+        """
+            Translates this input relative to toInput. The following keyword arguments describe positioning options:
+            
+            left=<margin>: The input is positioned so that its maximum X coordinate is equal to the x coordinate of toInput's origin. If <margin> is greater than zero, the input is positioned offset <margin> pixels from toInput.
+            right=<margin>: The input is positioned so that its origin x coordinate is equal to the maximum x coordinate of toInput If <margin> is greater than zero, the input is positioned offset <margin> pixels from toInput.
+            bottom=<margin>: The input is positioned so that its maximum Y coordinate is equal to the y coordinate of toInput's origin. If <margin> is greater than zero, the input is positioned offset <margin> pixels from toInput.
+            top=<margin>: The input is positioned so that its origin y coordinate is equal to the maximum y coordinate of toInput If <margin> is greater than zero, the input is positioned offset <margin> pixels from toInput.
+            
+            offsetX=<value>: The input is positioned so that its origin X coordinate is equal to toInput.minX+<value>
+            
+            offsetY=<value>: The input is positioned so that its origin Y coordinate is equal to toInput.minY+<value>
+            
+            
+            Positioning an input next to some other input typically requires TWO of the above arguments to properly set both the x and y position of the input. Say you have two inputs, input1 and input2. Both are the same size. You wish to move input1 such that it is directly to the left of input2. Your end state looks like the bad ascii diagram below.
+            
+            +=========+=========+
+            |         |         |
+            | input1  |  input2 |
+            |         |         |
+            |         |         |
+            +=========+=========+
+            
+            The animation to do this would be: input1.translateRelativeTo(input2, 1.5, left=0, offsetY=0)
+            """
+
+        new_coords = self.__calculateRelativeMove(toInput, **kwargs)
+        return self.translateTo((new_coords.x, new_coords.y), duration, **kwargs)
+
+
+    def moveRelativeTo(self, toInput, duration=None, **kwargs):
+        """
+        Moves this input relative to toInput. The following keyword arguments describe positioning options:
+          
+          left=<margin>: The input is positioned so that its maximum X coordinate is equal to the x coordinate of toInput's origin. If <margin> is greater than zero, the input is positioned offset <margin> pixels from toInput. 
+          right=<margin>: The input is positioned so that its origin x coordinate is equal to the maximum x coordinate of toInput If <margin> is greater than zero, the input is positioned offset <margin> pixels from toInput.
+          bottom=<margin>: The input is positioned so that its maximum Y coordinate is equal to the y coordinate of toInput's origin. If <margin> is greater than zero, the input is positioned offset <margin> pixels from toInput.
+          top=<margin>: The input is positioned so that its origin y coordinate is equal to the maximum y coordinate of toInput If <margin> is greater than zero, the input is positioned offset <margin> pixels from toInput.
+
+         offsetX=<value>: The input is positioned so that its origin X coordinate is equal to toInput.minX+<value>
+         
+         offsetY=<value>: The input is positioned so that its origin Y coordinate is equal to toInput.minY+<value>
+
+
+         Positioning an input next to some other input typically requires TWO of the above arguments to properly set both the x and y position of the input. Say you have two inputs, input1 and input2. Both are the same size. You wish to move input1 such that it is directly to the left of input2. Your end state looks like the bad ascii diagram below.
+         
+             +=========+=========+
+             |         |         |
+             | input1  |  input2 |
+             |         |         |
+             |         |         |
+             +=========+=========+
+             
+             The animation to do this would be: input1.moveRelativeTo(input2, 1.5, left=0, offsetY=0)
+        """
+        new_coords = self.__calculateRelativeMove(toInput, **kwargs)
+        
+        return self.moveTo((new_coords.x, new_coords.y), duration, **kwargs)
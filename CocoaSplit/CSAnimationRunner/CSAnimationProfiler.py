@@ -0,0 +1,238 @@
+"""
+Opt-in profiling of animation runs.
+
+When enabled, every run started through CSAnimationRunnerObj gets a RunProfile with:
+    phases     - seconds spent in load (plugin import/reload), prepare (inputs and cache key), script (do_animation,
+                 or the whole worker round trip for async and sandboxed runs), commit and replay (timeline cache hits)
+    counts     - animations, keyframe values and bridge reads (layer geometry reads through PyObjC)
+    latency    - trigger to first frame: from the runner being called until the main run loop pass after the commit,
+                 which is when Core Animation hands the transaction to the render server
+
+Completion write-back happens later and for many runs at once; the CompletionQueue reports it per plugin as the
+'completion' metric. Every metric of every plugin feeds a rolling histogram of its last samples. stats() summarizes
+them and to_json() dumps everything for the host.
+"""
+import json
+import time
+import threading
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from CSAnimationBackend import get_backend
+
+
+clock = getattr(time, 'perf_counter', time.time)
+
+TIME_BOUNDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+COUNT_BOUNDS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+COUNT_METRICS = ('animations', 'keyframes', 'bridge_reads')
+
+
+class RollingHistogram(object):
+    """
+    The last size samples of one metric, bucketed by bounds when summarized
+    """
+
+    def __init__(self, bounds=TIME_BOUNDS, size=256):
+        self.bounds = bounds
+        self.samples = deque(maxlen=size)
+        self.total_count = 0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.total_count += 1
+
+    def percentile(self, ordered, fraction):
+        idx = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        ret = {'count': len(ordered), 'total_count': self.total_count}
+        if not ordered:
+            return ret
+        buckets = OrderedDict()
+        pos = 0
+        for bound in self.bounds:
+            in_bucket = 0
+            while pos < len(ordered) and ordered[pos] <= bound:
+                in_bucket += 1
+                pos += 1
+            buckets['<=%g' % bound] = in_bucket
+        buckets['>%g' % self.bounds[-1]] = len(ordered) - pos
+        ret.update({'min': ordered[0], 'max': ordered[-1], 'mean': sum(ordered) / float(len(ordered)),
+                    'p50': self.percentile(ordered, 0.5), 'p90': self.percentile(ordered, 0.9),
+                    'p99': self.percentile(ordered, 0.99), 'buckets': buckets})
+        return ret
+
+
+class RunProfile(object):
+    """
+    Measurements for one run. Times are seconds.
+    """
+
+    def __init__(self, plugin_name, mode='sync'):
+        self.plugin_name = plugin_name
+        self.mode = mode
+        self.trigger_time = clock()
+        self.phases = OrderedDict()
+        self.counts = {'animations': 0, 'keyframes': 0, 'bridge_reads': 0}
+        self.first_frame_latency = None
+        self.cached = False
+        self.failed = False
+
+    @contextmanager
+    def phase(self, name):
+        start = clock()
+        try:
+            yield
+        finally:
+            self.add_phase(name, clock() - start)
+
+    def add_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count_block(self, block):
+        """
+        Add the animations and keyframes of a committed AnimationBlock
+        """
+        for anim in block.animations:
+            if anim.isWaitMark or anim.animation is None:
+                continue
+            self.counts['animations'] += 1
+            values = None
+            if hasattr(anim.animation, 'values'):
+                values = anim.animation.values()
+            if values is not None:
+                self.counts['keyframes'] += len(values)
+
+    def count_timeline(self, timeline):
+        for entry in timeline.entries:
+            self.counts['animations'] += 1
+            if entry.values is not None:
+                self.counts['keyframes'] += len(entry.values)
+
+    def mark_first_frame(self):
+        if self.first_frame_latency is None:
+            self.first_frame_latency = clock() - self.trigger_time
+
+    def to_dict(self):
+        return {'plugin': self.plugin_name, 'mode': self.mode, 'cached': self.cached, 'failed': self.failed,
+                'phases': dict(self.phases), 'counts': dict(self.counts),
+                'first_frame_latency': self.first_frame_latency}
+
+
+class _NoProfile(object):
+    """
+    Stands in for a RunProfile while profiling is off, so call sites don't need to check
+    """
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def add_phase(self, name, seconds):
+        pass
+
+    def count_block(self, block):
+        pass
+
+    def count_timeline(self, timeline):
+        pass
+
+
+NO_PROFILE = _NoProfile()
+
+
+class AnimationProfiler(object):
+
+    def __init__(self, history=256):
+        self.enabled = False
+        self.history = history
+        self.plugins = {}
+        self.runs = 0
+        self.last_run = None
+        self._lock = threading.Lock()
+
+    def start_run(self, plugin_name, mode='sync'):
+        """
+        A new RunProfile, or NO_PROFILE when profiling is off
+        """
+        if not self.enabled:
+            return NO_PROFILE
+        return RunProfile(plugin_name, mode)
+
+    def finish_run(self, profile):
+        """
+        Record a finished run. Call from the main run loop pass after the commit; that is the first frame.
+        """
+        if profile is NO_PROFILE:
+            return
+        profile.mark_first_frame()
+        with self._lock:
+            self.runs += 1
+            self.last_run = profile.to_dict()
+            for name, seconds in profile.phases.items():
+                self._add(profile.plugin_name, name, seconds)
+            for name, count in profile.counts.items():
+                self._add(profile.plugin_name, name, count)
+            self._add(profile.plugin_name, 'total', sum(profile.phases.values()))
+            self._add(profile.plugin_name, 'first_frame_latency', profile.first_frame_latency)
+
+    def run_committed(self, profile, input_arg, animations=()):
+        """
+        Fill in what is known once a run's animations are committed and schedule finish_run() for the next run loop
+        pass. animations are tagged so their completion write-back is reported under the plugin.
+        """
+        if profile is NO_PROFILE:
+            return
+        reads = 0
+        for value in input_arg.values():
+            if value is not None and hasattr(value, 'geometry'):
+                reads += value.geometry.bridge_reads
+        profile.counts['bridge_reads'] = reads
+        for anim in animations:
+            anim.profile_plugin = profile.plugin_name
+        get_backend().call_soon(lambda: self.finish_run(profile))
+
+    def record(self, plugin_name, metric, value):
+        """
+        Add one sample of metric outside of a run (e.g. completion write-back)
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._add(plugin_name, metric, value)
+
+    def _add(self, plugin_name, metric, value):
+        metrics = self.plugins.setdefault(plugin_name, {})
+        histogram = metrics.get(metric)
+        if histogram is None:
+            histogram = RollingHistogram(COUNT_BOUNDS if metric in COUNT_METRICS else TIME_BOUNDS, self.history)
+            metrics[metric] = histogram
+        histogram.add(value)
+
+    def stats(self, plugin_name=None):
+        """
+        {plugin: {metric: summary}}, or just {metric: summary} for plugin_name
+        """
+        with self._lock:
+            if plugin_name is not None:
+                metrics = self.plugins.get(plugin_name, {})
+                return dict((name, h.summary()) for name, h in metrics.items())
+            return dict((p_name, dict((name, h.summary()) for name, h in metrics.items()))
+                        for p_name, metrics in self.plugins.items())
+
+    def to_json(self, indent=None):
+        return json.dumps({'enabled': self.enabled, 'runs': self.runs, 'last_run': self.last_run,
+                           'plugins': self.stats()}, indent=indent, sort_keys=True)
+
+    def dump(self, path):
+        with open(path, 'w') as dump_file:
+            dump_file.write(self.to_json(indent=2))
+
+    def reset(self):
+        with self._lock:
+            self.plugins = {}
+            self.runs = 0
+            self.last_run = None
@@ -0,0 +1,237 @@
+"""
+Asynchronous animation runs.
+
+run_animation_async() runs a plugin's do_animation() on a worker thread so heavy scripts don't stall the UI. The
+script works against each input's GeometrySnapshot, which is fully loaded on the calling thread before the worker
+starts. Model value writes and other side effects (multiTransition) are recorded on the block instead of touching
+the layers. When the script returns, every block it built is committed in a single call on the main thread, so the
+layers only ever change there. A run that is cancelled before that call leaves no trace.
+
+A streaming run (stream=True) also sends each segment of the top level block to the main thread as soon as the script
+passes a global wait()/waitAnimation(), so the first animations start while the script is still running. Cancelling
+a streaming run stops the script and drops what hasn't been sent yet; segments that already started keep running.
+"""
+import threading
+import CSAnimationBlock
+from CSAnimationBackend import get_backend
+from CSAnimationProfiler import clock
+
+
+RUNNING, COMMITTING, DONE, CANCELLED = range(4)
+
+
+class AnimationCancelled(Exception):
+    """
+    Raised inside a cancelled script the next time it adds an animation or a wait
+    """
+    pass
+
+
+class AnimationRun(object):
+    """
+    Handle for a script running on a worker thread, in the spirit of concurrent.futures.Future.
+
+    The blocks are committed on the main thread, so the thread that started the run must not block in result() or
+    wait(); it gets notified through add_done_callback() instead. Done callbacks are called on the main thread.
+    """
+
+    def __init__(self):
+        self.blocks = []
+        self.cancel_requested = False
+        self._state = RUNNING
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+        self._condition = threading.Condition()
+        self._owner = threading.current_thread()
+        self._committed = False
+        self.started_at = clock()
+        self.commit_started_at = None
+        self.commit_duration = 0.0
+        self.first_segment_at = None
+        self._stream_error = None
+
+    def check_cancelled(self):
+        if self.cancel_requested:
+            raise AnimationCancelled()
+
+    def cancel(self):
+        """
+        Stop the run if its blocks haven't been committed yet. A running script is stopped the next time it adds an
+        animation. Returns False if it is too late.
+        """
+        with self._condition:
+            if self._committed or self._state == DONE:
+                return False
+            self.cancel_requested = True
+            return True
+
+    def cancelled(self):
+        return self._state == CANCELLED
+
+    def running(self):
+        return self._state == RUNNING
+
+    def done(self):
+        return self._state in (DONE, CANCELLED)
+
+    def wait(self, timeout=None):
+        """
+        Block until the run is committed or cancelled. Returns done().
+        """
+        with self._condition:
+            if not self.done():
+                if threading.current_thread() is self._owner:
+                    raise RuntimeError("waiting on the thread that commits the run would never finish")
+                self._condition.wait(timeout)
+            return self.done()
+
+    def result(self, timeout=None):
+        """
+        The committed top level AnimationBlock. Raises AnimationCancelled if the run was cancelled, or whatever the
+        script raised.
+        """
+        if not self.wait(timeout):
+            raise RuntimeError("animation run did not finish in time")
+        if self._state == CANCELLED:
+            raise AnimationCancelled()
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout=None):
+        if not self.wait(timeout):
+            raise RuntimeError("animation run did not finish in time")
+        return self._exception
+
+    def add_done_callback(self, func):
+        """
+        Call func(run) once the run is done. Called immediately if it already is.
+        """
+        with self._condition:
+            if not self.done():
+                self._callbacks.append(func)
+                return
+        func(self)
+
+    def script_finished(self, exception=None):
+        """
+        Called by the worker when do_animation() returns. Hands the blocks to the main thread for committing.
+        """
+        with self._condition:
+            self._exception = exception
+            self._state = COMMITTING
+        get_backend().call_soon(self.commit)
+
+    def stream_segment(self, block, end, calls):
+        """
+        Called by the worker at a barrier of a streaming block: apply block's animations up to end on the main thread,
+        after calls (the layer writes deferred since the last segment)
+        """
+        get_backend().call_soon(lambda: self._apply_segment(block, end, calls))
+
+    def _apply_segment(self, block, end, calls):
+        with self._condition:
+            if self.cancel_requested:
+                return
+        backend = get_backend()
+        backend.begin_transaction()
+        try:
+            if block.apply_through(end, calls) and self.first_segment_at is None:
+                self.first_segment_at = clock()
+        except Exception as e:
+            #stop the script, the final commit reports the error
+            with self._condition:
+                self._stream_error = e
+                self.cancel_requested = True
+            backend.log("animation segment failed: %s" % e)
+        finally:
+            backend.commit_transaction()
+
+    def commit(self):
+        """
+        Commit every block the script built, in the order the script finished them. Main thread only.
+        """
+        if self._stream_error is not None:
+            self._exception = self._stream_error
+            self._finish(DONE)
+            return
+        with self._condition:
+            if self.cancel_requested or isinstance(self._exception, AnimationCancelled):
+                cancelled = True
+            else:
+                cancelled = False
+                self._committed = True
+        if cancelled:
+            self._finish(CANCELLED)
+            return
+        self.commit_started_at = clock()
+        try:
+            self._result = self.commit_blocks()
+        except Exception as e:
+            if self._exception is None:
+                self._exception = e
+        self.commit_duration = clock() - self.commit_started_at
+        self._finish(DONE)
+
+    def commit_blocks(self):
+        """
+        Apply what the script produced. Returns the run's result.
+        """
+        for block in self.blocks:
+            block.commit()
+        if self.blocks:
+            return self.blocks[-1]
+        return None
+
+    def _finish(self, state):
+        with self._condition:
+            self._state = state
+            callbacks = self._callbacks
+            self._callbacks = []
+            self._condition.notify_all()
+        for func in callbacks:
+            try:
+                func(self)
+            except Exception as e:
+                get_backend().log("animation run callback failed: %s" % e)
+
+    @classmethod
+    def completed(cls, result=None):
+        """
+        A run that is already done, e.g. because it was replayed from the timeline cache
+        """
+        ret = cls()
+        ret._result = result
+        ret._state = DONE
+        return ret
+
+
+def _run_script(run, animation, input_arg, duration, superlayer, stream, frame_budget):
+    exception = None
+    with get_backend().worker_context():
+        try:
+            CSAnimationBlock.run_animation(animation, input_arg, duration, superlayer, run, stream, frame_budget)
+        except BaseException as e:
+            #SystemExit from a script's sys.exit() too, the run has to finish either way
+            exception = e
+            get_backend().log("animation script failed: %r" % (e,))
+    run.script_finished(exception)
+
+
+def run_animation_async(animation, input_arg, duration, superlayer, stream=False, frame_budget=None):
+    """
+    Start an animation plugin's do_animation() on a worker thread. Returns its AnimationRun.
+    Must be called on the main thread. With stream set, segments are applied while the script runs; frame_budget is
+    passed on to CSAnimationBlock.run_animation().
+    """
+    for value in input_arg.values():
+        if value is not None and hasattr(value, 'snapshot_geometry'):
+            value.snapshot_geometry()
+    run = AnimationRun()
+    worker = threading.Thread(target=_run_script, args=(run, animation, input_arg, duration, superlayer, stream,
+                                                                frame_budget),
+                              name="animation %s" % getattr(animation, '__name__', ''))
+    worker.daemon = True
+    worker.start()
+    return run
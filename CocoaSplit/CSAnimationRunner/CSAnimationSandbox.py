@@ -0,0 +1,455 @@
+"""
+Run animation scripts in a separate Python process.
+
+A script running in the app's interpreter competes with everything else for the GIL, and an infinite loop in it
+wedges the interpreter for good. In sandbox mode the app never imports the plugin. It sends a serialized snapshot of
+the inputs' geometry to a worker process, which rebuilds the layout on the headless backend and runs do_animation()
+there. The worker sends back the resolved timeline as JSON, and the app applies it in one commit. Every job has a
+wall clock budget; a worker that doesn't answer in time is killed and replaced.
+
+Workers are long lived (a SandboxPool keeps them around), so each job only costs the script itself and a round trip,
+not an interpreter start. Within a worker, plugins are reloaded only when their source changes.
+
+The app's own interpreter is embedded, so sys.executable is the app binary. The pool needs an explicit Python;
+find_python() picks one. Scripts whose result can't be captured as a timeline (on_complete handlers, extra_model,
+multiTransition, layers other than the input's own) fail with SandboxError.
+
+Run as a script, this module is the worker: it reads one JSON job per line on stdin and answers with one JSON line on
+stdout.
+"""
+import os
+import sys
+import json
+import time
+import errno
+import select
+import threading
+import subprocess
+
+import CSAnimationBlock
+import CSAnimationBackend
+from CSAnimationBackend import get_backend
+from CSAnimationRun import AnimationRun, AnimationCancelled
+from CSAnimationTimeline import Timeline, encode_value, decode_value
+from CSTimelineFile import TimelineFile
+
+WORKER_SCRIPT = os.path.abspath(__file__)
+if WORKER_SCRIPT.endswith(('.pyc', '.pyo')):
+    WORKER_SCRIPT = WORKER_SCRIPT[:-1]
+
+PYTHON_CANDIDATES = ('/usr/bin/python', '/usr/bin/python3', '/usr/local/bin/python', '/usr/local/bin/python3',
+                     '/opt/homebrew/bin/python3')
+
+
+class SandboxError(Exception):
+    pass
+
+
+class SandboxTimeout(SandboxError):
+    pass
+
+
+def find_python():
+    """
+    A Python interpreter for sandbox workers: sys.executable when this isn't the embedded interpreter, otherwise the
+    first of PYTHON_CANDIDATES that exists. Returns None if there is none.
+    """
+    executable = sys.executable
+    if executable and os.path.basename(executable).lower().startswith('python'):
+        return executable
+    for candidate in PYTHON_CANDIDATES:
+        if os.access(candidate, os.X_OK):
+            return candidate
+    return None
+
+
+def snapshot_input(cs_input):
+    """
+    JSON-safe geometry of a CSAnimationInput, everything the animation methods can read from it
+    """
+    geometry = cs_input.snapshot_geometry()
+    values = {}
+    for key_path in cs_input.fingerprint_keypaths + cs_input.translation_keypaths[1:]:
+        values[key_path] = encode_value(geometry.value(key_path))
+    anchor = cs_input.animationLayer.anchorPoint()
+    uuid = None
+    if hasattr(cs_input.input, 'uuid'):
+        uuid = cs_input.input.uuid()
+    return {'frame': list(geometry.frame_rect()), 'bounds': list(geometry.bounds_rect()),
+            'position': list(geometry.position_point()), 'anchor': [anchor.x, anchor.y], 'values': values,
+            'uuid': uuid, 'transition_duration': cs_input.input.transitionDuration()}
+
+
+def make_job(plugin_path, input_arg, duration, superlayer):
+    """
+    The job a worker runs: the plugin's path, input snapshots, the other script parameters and the superlayer bounds
+    """
+    inputs = {}
+    params = {}
+    for name, value in input_arg.items():
+        if value is not None and hasattr(value, 'snapshot_geometry'):
+            inputs[name] = snapshot_input(value)
+        else:
+            try:
+                params[name] = encode_value(value)
+            except TypeError:
+                raise SandboxError("parameter %s can't be sent to a sandbox" % name)
+    s_bounds = superlayer.bounds()
+    return {'plugin': plugin_path, 'inputs': inputs, 'params': params, 'duration': duration,
+            'superlayer': [s_bounds.origin.x, s_bounds.origin.y, s_bounds.size.width, s_bounds.size.height]}
+
+
+class SandboxWorker(object):
+    """
+    One worker process. request() sends a job and waits at most budget seconds for the answer. cancel() may be called
+    from any thread; everything else belongs to the thread using the worker.
+    """
+
+    def __init__(self, python):
+        self.python = python
+        self.jobs = 0
+        self.proc = subprocess.Popen([python, '-B', WORKER_SCRIPT], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     cwd=os.path.dirname(WORKER_SCRIPT), close_fds=True)
+        self._buffer = b''
+        self._lock = threading.Lock()
+        self.cancelled = False
+
+    @property
+    def alive(self):
+        return self.proc is not None and not self.cancelled and self.proc.poll() is None
+
+    def request(self, job, budget):
+        if self.cancelled:
+            self.kill()
+            raise SandboxError("sandbox job was cancelled")
+        if not self.alive:
+            raise SandboxError("sandbox worker is not running")
+        deadline = time.time() + budget
+        try:
+            self.proc.stdin.write((json.dumps(job) + '\n').encode('utf-8'))
+            self.proc.stdin.flush()
+        except (IOError, OSError) as e:
+            self.kill()
+            raise SandboxError("sandbox worker went away: %s" % e)
+
+        fd = self.proc.stdout.fileno()
+        while b'\n' not in self._buffer:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                self.kill()
+                raise SandboxTimeout("animation script ran longer than %.2f seconds" % budget)
+            try:
+                ready = select.select([fd], [], [], remaining)[0]
+                chunk = os.read(fd, 65536) if ready else None
+            except (select.error, OSError) as e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                self.kill()
+                raise SandboxError("reading from sandbox worker failed: %s" % e)
+            if chunk is None:
+                continue
+            if not chunk:
+                self.kill()
+                if self.cancelled:
+                    raise SandboxError("sandbox job was cancelled")
+                raise SandboxError("sandbox worker exited")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        self.jobs += 1
+        return json.loads(line.decode('utf-8'))
+
+    def cancel(self):
+        """
+        Stop the running job from another thread: the process is killed, the thread in request() notices its pipe
+        closing and cleans up
+        """
+        with self._lock:
+            self.cancelled = True
+            if self.proc is not None:
+                try:
+                    self.proc.kill()
+                except OSError:
+                    pass
+
+    def kill(self):
+        with self._lock:
+            proc = self.proc
+            self.proc = None
+        if proc is None:
+            return
+        try:
+            proc.kill()
+        except OSError:
+            pass
+        proc.wait()
+        for pipe in (proc.stdin, proc.stdout):
+            try:
+                pipe.close()
+            except (IOError, OSError):
+                pass
+
+
+class SandboxPool(object):
+    """
+    Up to size worker processes running python. Workers are started on demand and replaced after being killed.
+    """
+
+    def __init__(self, python=None, size=2, budget=5.0):
+        self.python = python
+        self.size = size
+        self.budget = budget
+        self._idle = []
+        self._busy = 0
+        self._condition = threading.Condition()
+        self.started = 0
+        self.jobs = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                while self._idle:
+                    worker = self._idle.pop()
+                    if worker.alive:
+                        self._busy += 1
+                        return worker
+                if self._busy < self.size:
+                    break
+                self._condition.wait()
+            self._busy += 1
+        python = self.python or find_python()
+        if python is None:
+            self.release(None)
+            raise SandboxError("no Python interpreter for the animation sandbox")
+        try:
+            worker = SandboxWorker(python)
+        except OSError as e:
+            self.release(None)
+            raise SandboxError("can't start %s: %s" % (python, e))
+        self.started += 1
+        return worker
+
+    def release(self, worker):
+        with self._condition:
+            self._busy -= 1
+            if worker is not None and worker.alive:
+                self._idle.append(worker)
+            self._condition.notify()
+
+    def run(self, job, budget=None, worker_started=None):
+        """
+        Run job on a worker and return its answer. worker_started(worker) is called once a worker is assigned, and
+        worker_started(None) before it goes back to the pool.
+        """
+        if budget is None:
+            budget = self.budget
+        worker = self.acquire()
+        try:
+            if worker_started is not None:
+                worker_started(worker)
+            self.jobs += 1
+            response = worker.request(job, budget)
+        except SandboxTimeout:
+            self.timeouts += 1
+            raise
+        except SandboxError:
+            self.errors += 1
+            raise
+        finally:
+            if worker_started is not None:
+                worker_started(None)
+            self.release(worker)
+        if 'error' in response:
+            self.errors += 1
+            raise SandboxError(response['error'])
+        return response
+
+    def shutdown(self):
+        with self._condition:
+            idle = self._idle
+            self._idle = []
+        for worker in idle:
+            worker.kill()
+
+    def stats(self):
+        return {'size': self.size, 'idle': len(self._idle), 'busy': self._busy, 'started': self.started,
+                'jobs': self.jobs, 'timeouts': self.timeouts, 'errors': self.errors}
+
+
+class SandboxRun(AnimationRun):
+    """
+    AnimationRun for a sandboxed script. The result is the applied Timeline. Cancelling kills the worker's process.
+    """
+
+    def __init__(self):
+        super(SandboxRun, self).__init__()
+        self.timeline = None
+        self.animations = []
+        self.input_arg = None
+        self.superlayer = None
+        self._worker = None
+
+    def cancel(self):
+        ret = super(SandboxRun, self).cancel()
+        worker = self._worker
+        if ret and worker is not None:
+            worker.cancel()
+        return ret
+
+    def worker_started(self, worker):
+        self._worker = worker
+        if worker is not None and self.cancel_requested:
+            worker.cancel()
+
+    def commit_blocks(self):
+        if self.timeline is None:
+            return None
+        self.animations = self.timeline.apply(self.input_arg, self.superlayer)
+        return self.timeline
+
+
+def _run_sandboxed(run, pool, job, budget):
+    exception = None
+    try:
+        response = pool.run(job, budget, run.worker_started)
+        backend = get_backend()
+        for message in response.get('messages', []):
+            backend.log(message)
+        run.timeline = Timeline.from_dict(response['timeline'])
+    except SandboxError as e:
+        exception = AnimationCancelled() if run.cancel_requested else e
+        if not run.cancel_requested:
+            get_backend().log("sandboxed animation failed: %s" % e)
+    except Exception as e:
+        exception = e
+    run.script_finished(exception)
+
+
+def run_animation_sandboxed(pool, plugin_path, input_arg, duration, superlayer, budget=None):
+    """
+    Run the plugin at plugin_path in a pool worker. Returns a SandboxRun; the timeline is applied on the main thread
+    when the worker answers. Must be called on the main thread.
+    """
+    run = SandboxRun()
+    run.input_arg = input_arg
+    run.superlayer = superlayer
+    try:
+        job = make_job(plugin_path, input_arg, duration, superlayer)
+    except SandboxError as e:
+        run.script_finished(e)
+        return run
+    worker = threading.Thread(target=_run_sandboxed, args=(run, pool, job, budget), name="animation sandbox")
+    worker.daemon = True
+    worker.start()
+    return run
+
+
+def export_timeline(pool, plugin_path, input_arg, duration, superlayer, animation=None, budget=None):
+    """
+    Run the plugin at plugin_path in a pool worker and return its timeline as a CSTimelineFile.TimelineFile, without
+    animating anything. Blocks until the worker answers.
+    """
+    from CSHeadlessBackend import HeadlessBackend
+
+    job = make_job(plugin_path, input_arg, duration, superlayer)
+    for name, state in job['inputs'].items():
+        if not state['uuid']:
+            raise SandboxError("input %s has no UUID" % name)
+    response = pool.run(job, budget)
+    #boxed the way the worker did, so timing functions stay names instead of becoming CAMediaTimingFunctions
+    timeline = Timeline.from_dict(response['timeline'], HeadlessBackend())
+    uuids = dict((name, state['uuid']) for name, state in job['inputs'].items())
+    return TimelineFile.from_timeline(timeline, uuids, animation)
+
+
+#worker side
+
+_plugin_sources = {}
+
+
+def _load_plugin(path):
+    from pluginbase import PluginBase
+    from CSPluginReloader import PluginReloader
+
+    if os.path.basename(path) == '__init__.py':
+        path = os.path.dirname(path)
+    search_dir, file_name = os.path.split(path)
+    m_name = os.path.splitext(file_name)[0]
+    if search_dir not in _plugin_sources:
+        #the PluginBase has to stay alive as long as its source
+        plugin_base = PluginBase(package='sandboxanimations')
+        reloader = PluginReloader(plugin_base.make_plugin_source(searchpath=[search_dir]))
+        _plugin_sources[search_dir] = (plugin_base, reloader)
+    return _plugin_sources[search_dir][1].get(m_name)
+
+
+def _make_input(backend, root_layer, name, state):
+    from CSHeadlessBackend import HeadlessInput, Rect, Point
+
+    frame = Rect(*state['frame'])
+    h_input = HeadlessInput(backend, root_layer, frame, uuid=state.get('uuid') or name)
+    h_input.setTransitionDuration_(state.get('transition_duration') or 0.0)
+    bounds = Rect(*state['bounds'])
+    for layer in (h_input.layer(), h_input.animationLayer()):
+        layer.setBounds_(bounds)
+        layer.setAnchorPoint_(state['anchor'])
+        layer.setPosition_(Point(*state['position']))
+        for key_path, value in state['values'].items():
+            if value is not None:
+                layer.setValue_forKeyPath_(decode_value(value, backend), key_path)
+    return h_input
+
+
+def run_job(job):
+    """
+    Run one job on a fresh headless layout. Returns the answer to send back.
+    """
+    from CSHeadlessBackend import HeadlessBackend, Rect
+    from CSAnimationInput import CSAnimationInput
+
+    backend = HeadlessBackend()
+    CSAnimationBackend.set_backend(backend)
+    CSAnimationBlock.threadData.frames = []
+    CSAnimationBlock.threadData.current_frame = None
+    root_layer = backend.make_layer(Rect(*job['superlayer']))
+
+    input_arg = {}
+    for name, value in job['params'].items():
+        input_arg[name] = decode_value(value, backend)
+    for name, state in job['inputs'].items():
+        input_arg[name] = CSAnimationInput(_make_input(backend, root_layer, name, state))
+
+    animation = _load_plugin(job['plugin'])
+    block = CSAnimationBlock.run_animation(animation, input_arg, job['duration'], root_layer)
+    timeline = Timeline.from_block(block, input_arg)
+    if timeline is None:
+        raise SandboxError("the script does something that can't be replayed outside the app (on_complete, "
+                           "extra_model, multiTransition or animating other layers)")
+    return {'timeline': timeline.to_dict(), 'messages': [str(m) for m in backend.messages]}
+
+
+def serve(job_in, answer_out):
+    while True:
+        line = job_in.readline()
+        if not line:
+            break
+        try:
+            answer = run_job(json.loads(line))
+        except Exception as e:
+            answer = {'error': "%s: %s" % (type(e).__name__, e)}
+        answer_out.write(json.dumps(answer) + '\n')
+        answer_out.flush()
+
+
+def main():
+    #scripts that print would corrupt the answers, so stdout is only used through its own handle
+    answer_out = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+    sys.stdout = sys.stderr
+    sys.dont_write_bytecode = True
+    serve(sys.stdin, answer_out)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,395 @@
+"""
+Dependency graph scheduling of an AnimationBlock.
+
+Every animation and wait marker in a block starts when the cursors of its input and of the block say so, and those
+cursors only move by waits, which read the latest end time of an input, of the block or of a labelled animation.
+Schedule turns that into an explicit graph of time values, each one a constant, the max of two values or a value plus
+a duration, built in one pass over the block with indexes by input and label. Resolving it is a single depth first
+evaluation, so a block of any size schedules in linear time.
+
+The values are exactly the ones AnimationBlock.commit() always computed, including its quirks: a wait marker has an
+end time of begin + its duration, which counts towards the latest end time like an animation does, and an input's
+latest end time starts at 0 rather than at the block's begin time.
+
+A labelled wait normally sees the last animation with that label added before it. If there is none it now waits on
+the first one added after it (a forward reference). A forward reference that would make the labelled animation wait
+on itself can't be honored; that wait falls back to the input's (or block's) latest end time, as it did before forward
+references existed, and is listed in Schedule.fallbacks.
+
+A nested block or a played clip comes already resolved: a CSClipMark begins after everything its inputs would wait on
+at that point (like an animation added to all of them at once), and the animations anchored to it begin at their fixed
+offset from it. They don't move any cursor, but their end times count towards the latest end times as usual.
+
+A schedule can grow: extend() adds animations and the next resolve() only evaluates what is new. Nothing added later
+changes the times of what was already there, unless it is the target of an earlier wait's forward reference;
+open_refs() tells whether any such wait is still waiting for its label.
+"""
+from bisect import bisect_right
+
+CONST = 0
+MAX = 1
+ADD = 2
+REF = 3
+
+
+class Schedule(object):
+    """
+    The schedule of animations (CSAnimations in the order they were added to their block).
+    Call resolve() before reading begins, ends (None for animations that repeat forever), after(), total_duration()
+    or critical_path().
+    """
+
+    def __init__(self, animations=()):
+        self.animations = []
+        self.by_input = {}
+        self.by_label = {}
+        self.waits = []
+        self.forward_refs = {}
+        self.fallbacks = []
+        self.begins = []
+        self.ends = []
+        self.base = None
+        self._after = None
+        #node 0 is the block's begin time, filled in by resolve(); node 1 is an input's initial latest end time
+        self._kind = [CONST, CONST]
+        self._a = [0.0, 0.0]
+        self._b = [None, None]
+        self._zero = 1
+        self._begin_nodes = []
+        self._end_nodes = []
+        self._end_items = {}
+        self._labelled = {}
+        self._cursors = {}
+        self._anchors = {}
+        self._c_begin = 0
+        self._latest_end = 0
+        self._open_refs = []
+        self._ref_waits = {}
+        self._values = []
+        self._state = bytearray()
+        self._order = []
+        self.extend(animations)
+
+    def _node(self, kind, a, b=None):
+        self._kind.append(kind)
+        self._a.append(a)
+        self._b.append(b)
+        return len(self._kind) - 1
+
+    def extend(self, animations):
+        """
+        Add animations (following the ones already scheduled) to the graph
+        """
+        zero = self._zero
+        begin_nodes = self._begin_nodes
+        end_nodes = self._end_nodes
+        end_items = self._end_items
+        labelled = self._labelled
+        cursors = self._cursors
+        c_begin = self._c_begin
+        latest_end = self._latest_end
+        #MAX and ADD nodes are appended inline, this loop runs for every animation of every commit
+        kinds = self._kind
+        add_kind = kinds.append
+        add_a = self._a.append
+        add_b = self._b.append
+        for idx, anim in enumerate(animations, len(self.animations)):
+            if anim.isClipMark:
+                anchor = c_begin
+                for clip_input in anim.inputs:
+                    if clip_input in cursors:
+                        anchor = self._node(MAX, anchor, cursors[clip_input][0])
+                self._anchors[id(anim)] = anchor
+                begin_nodes.append(anchor)
+                end_nodes.append(anchor)
+                self.animations.append(anim)
+                continue
+
+            target = anim.cs_input
+            if target:
+                self.by_input.setdefault(target, []).append(idx)
+                if target not in cursors:
+                    cursors[target] = [c_begin, zero]
+            if anim.label:
+                self.by_label.setdefault(anim.label, []).append(idx)
+
+            if anim.isWaitMark:
+                self.waits.append(idx)
+                tmp_begin = c_begin
+                use_end = latest_end
+                if target:
+                    tmp_begin = cursors[target][0]
+                    use_end = cursors[target][1]
+                if anim.label:
+                    if anim.label in labelled:
+                        use_end = end_nodes[labelled[anim.label]]
+                    else:
+                        #pointed at the labelled animation once it's known, use_end is the fallback
+                        use_end = self._node(REF, None, use_end)
+                        self._open_refs.append((use_end, anim.label, idx))
+                        self._ref_waits[use_end] = idx
+
+                if anim.isWaitOnly:
+                    tmp_begin = self._node(ADD, tmp_begin, anim.duration)
+                else:
+                    tmp_begin = self._node(ADD, use_end, anim.duration)
+                if target:
+                    cursors[target][0] = tmp_begin
+                else:
+                    c_begin = tmp_begin
+
+            real_begin = c_begin
+            if anim.anchor is not None:
+                cursor = cursors.get(target)
+                real_begin = self._node(ADD, self._anchors[id(anim.anchor)], anim.offset)
+            elif target:
+                cursor = cursors[target]
+                real_begin = len(kinds)
+                add_kind(MAX)
+                add_a(c_begin)
+                add_b(cursor[0])
+                cursor[0] = real_begin
+            begin_nodes.append(real_begin)
+
+            if anim.ignore_wait:
+                #never ends as far as waits are concerned; end_time stays at its initial 0
+                end_nodes.append(zero)
+            else:
+                end = len(kinds)
+                add_kind(ADD)
+                add_a(real_begin)
+                add_b(anim.duration)
+                end_nodes.append(end)
+                end_items[end] = idx
+                add_kind(MAX)
+                add_a(latest_end)
+                add_b(end)
+                latest_end = end + 1
+                if target:
+                    add_kind(MAX)
+                    add_a(cursor[1])
+                    add_b(end)
+                    cursor[1] = end + 2
+
+            if anim.label and not anim.isWaitMark:
+                labelled[anim.label] = idx
+            self.animations.append(anim)
+
+        self._c_begin = c_begin
+        self._latest_end = latest_end
+        if self._open_refs:
+            self._link_refs()
+
+    def _link_refs(self):
+        """
+        Point forward references at their labelled animation where it has been added by now
+        """
+        still_open = []
+        for ref, label, wait_idx in self._open_refs:
+            target_idx = None
+            candidates = self.by_label.get(label, ())
+            for pos in range(bisect_right(candidates, wait_idx), len(candidates)):
+                if not self.animations[candidates[pos]].isWaitMark:
+                    target_idx = candidates[pos]
+                    break
+            if target_idx is None:
+                still_open.append((ref, label, wait_idx))
+            else:
+                self._a[ref] = self._end_nodes[target_idx]
+                self.forward_refs[wait_idx] = target_idx
+        self._open_refs = still_open
+
+    def open_refs(self):
+        """
+        True if a labelled wait refers to a label that hasn't been added yet
+        """
+        return bool(self._open_refs)
+
+    def _deps(self, node):
+        kind = self._kind[node]
+        if kind == MAX:
+            return (self._a[node], self._b[node])
+        if kind == CONST:
+            return ()
+        return (self._a[node],)
+
+    def _evaluate(self, first):
+        """
+        Evaluate every node from first on that isn't known yet. Nodes are appended to _order as they are evaluated,
+        so every node comes after the nodes it depends on.
+        """
+        kind = self._kind
+        arg_a = self._a
+        arg_b = self._b
+        values = self._values
+        state = self._state
+        order = self._order
+        count = len(kind)
+        values.extend([None] * (count - len(values)))
+        state.extend(bytearray(count - len(state)))
+        if not self.forward_refs:
+            #every node only depends on nodes created before it
+            for node in range(first, count):
+                node_kind = kind[node]
+                if node_kind == MAX:
+                    a_val = values[arg_a[node]]
+                    b_val = values[arg_b[node]]
+                    values[node] = b_val if b_val > a_val else a_val
+                elif node_kind == ADD:
+                    values[node] = values[arg_a[node]] + arg_b[node]
+                elif node_kind == CONST:
+                    values[node] = arg_a[node]
+                else:
+                    values[node] = values[arg_a[node]]
+                state[node] = 2
+            order.extend(range(first, count))
+            return
+
+        for root in range(first, count):
+            if state[root] == 2:
+                continue
+            stack = [root]
+            path = []
+            while stack:
+                node = stack[-1]
+                if state[node] == 2:
+                    stack.pop()
+                    continue
+                if state[node] == 0:
+                    state[node] = 1
+                    path.append(node)
+                pending = [dep for dep in self._deps(node) if state[dep] != 2]
+                cycle = [dep for dep in pending if state[dep] == 1]
+                if cycle:
+                    self._break_cycle(cycle[0], path, stack, state)
+                    continue
+                if pending:
+                    stack.extend(pending)
+                    continue
+
+                node_kind = kind[node]
+                if node_kind == MAX:
+                    a_val = values[arg_a[node]]
+                    b_val = values[arg_b[node]]
+                    values[node] = b_val if b_val > a_val else a_val
+                elif node_kind == ADD:
+                    values[node] = values[arg_a[node]] + arg_b[node]
+                elif node_kind == CONST:
+                    values[node] = arg_a[node]
+                else:
+                    values[node] = values[arg_a[node]]
+                state[node] = 2
+                order.append(node)
+                path.pop()
+                stack.pop()
+
+    def _break_cycle(self, repeated, path, stack, state):
+        """
+        repeated is on the current path again, so a forward reference on the path after it waits on an animation
+        that depends on the wait itself. Point the last such reference at its fallback and redo the nodes after it.
+        """
+        start = len(path) - 1
+        while path[start] != repeated:
+            start -= 1
+        ref_pos = None
+        for pos in range(len(path) - 1, start - 1, -1):
+            node = path[pos]
+            if self._kind[node] == REF and self._a[node] != self._b[node]:
+                ref_pos = pos
+                break
+        if ref_pos is None:
+            raise ValueError("animation schedule has a cycle without a forward label reference")
+        ref = path[ref_pos]
+        self._a[ref] = self._b[ref]
+        wait_idx = self._ref_waits[ref]
+        self.forward_refs.pop(wait_idx, None)
+        self.fallbacks.append(wait_idx)
+        for node in path[ref_pos + 1:]:
+            state[node] = 0
+        del path[ref_pos + 1:]
+        while stack[-1] != ref:
+            stack.pop()
+
+    def _sources(self):
+        """
+        sources[node] is the index of the animation whose end time node's value came from, None for the block's begin
+        """
+        arg_a = self._a
+        arg_b = self._b
+        values = self._values
+        end_items = self._end_items
+        sources = [None] * len(values)
+        for node in self._order:
+            node_kind = self._kind[node]
+            if node_kind == MAX:
+                if values[arg_b[node]] > values[arg_a[node]]:
+                    sources[node] = sources[arg_b[node]]
+                else:
+                    sources[node] = sources[arg_a[node]]
+            elif node_kind == ADD:
+                sources[node] = end_items.get(node, sources[arg_a[node]])
+            elif node_kind == REF:
+                sources[node] = sources[arg_a[node]]
+        return sources
+
+    def resolve(self, base=0.0):
+        """
+        Compute the begin and end times of everything not resolved yet, for a block beginning at base (a different
+        base recomputes everything). Waits whose label was never added wait on the latest end time instead.
+        Returns the list of begin times.
+        """
+        for ref, label, wait_idx in self._open_refs:
+            self._a[ref] = self._b[ref]
+        self._open_refs = []
+
+        if base != self.base:
+            self._a[0] = base
+            self.base = base
+            self._values = []
+            self._state = bytearray()
+            self._order = []
+            self.begins = []
+            self.ends = []
+        self._evaluate(len(self._order))
+        self._after = None
+        values = self._values
+        zero = self._zero
+        self.begins.extend([values[node] for node in self._begin_nodes[len(self.begins):]])
+        self.ends.extend([values[node] if node != zero else None for node in self._end_nodes[len(self.ends):]])
+        return self.begins
+
+    def after(self, idx):
+        """
+        Index of the animation or wait marker whose end decided when animation idx begins, None if it begins with
+        the block
+        """
+        if self._after is None:
+            sources = self._sources()
+            self._after = [sources[node] for node in self._begin_nodes]
+        return self._after[idx]
+
+    def end_time(self):
+        """
+        Latest end time of anything that ends, or the base time for an empty block
+        """
+        ends = [end for end in self.ends if end is not None]
+        return max(ends) if ends else self.base
+
+    def total_duration(self):
+        return self.end_time() - self.base
+
+    def critical_path(self):
+        """
+        Indexes of the animations and wait markers on the longest chain, first to last: each one begins when the one
+        before it ends. Animations that repeat forever aren't part of any chain.
+        """
+        last = None
+        for idx, end in enumerate(self.ends):
+            if end is not None and (last is None or end > self.ends[last]):
+                last = idx
+        ret = []
+        while last is not None:
+            ret.append(last)
+            last = self.after(last)
+        ret.reverse()
+        return ret
@@ -0,0 +1,382 @@
+"""
+Resolved animation timelines and the timeline cache.
+
+A Timeline is the flattened result of committing an AnimationBlock: one entry per animation with the target input,
+keypath, values, begin offset and duration already worked out. Replaying a timeline creates the same animations
+without running the script that produced it.
+"""
+import hashlib
+import numbers
+from collections import OrderedDict
+from CSAnimation import CSAnimation
+from CSAnimationBackend import get_backend
+
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+
+def encode_value(value):
+    """
+    JSON-safe form of an animation value: numbers, strings, booleans and None as is, boxed or bare points and sizes as
+    {'point': [x, y]} / {'size': [width, height]}, keyframe lists element by element. Works for both backends' values.
+    """
+    if value is None or isinstance(value, (bool, numbers.Number, string_types)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [encode_value(v) for v in value]
+    if hasattr(value, 'objCType'):
+        o_type = value.objCType()
+        if 'Point' in o_type:
+            value = value.pointValue()
+        elif 'Size' in o_type:
+            value = value.sizeValue()
+    elif hasattr(value, 'pointValue') and hasattr(value, 'value'):
+        value = value.value
+    if hasattr(value, 'x') and hasattr(value, 'y'):
+        return {'point': [value.x, value.y]}
+    if hasattr(value, 'width') and hasattr(value, 'height'):
+        return {'size': [value.width, value.height]}
+    raise TypeError("can't serialize animation value %r" % (value,))
+
+
+def decode_value(data, backend=None):
+    """
+    Inverse of encode_value. Points and sizes come back boxed by backend.
+    """
+    if isinstance(data, list):
+        return [decode_value(v, backend) for v in data]
+    if isinstance(data, dict):
+        if backend is None:
+            backend = get_backend()
+        if 'point' in data:
+            return backend.point_value(backend.make_point(*data['point']))
+        if 'size' in data:
+            return backend.size_value(backend.make_size(*data['size']))
+        raise ValueError("unknown animation value %r" % (data,))
+    return data
+
+
+class TimelineEntry(object):
+    """
+    One resolved animation. begin is relative to the time the block was committed.
+    """
+    __slots__ = ('input_name', 'source_only', 'keyPath', 'values', 'fromValue', 'toValue', 'begin', 'duration',
+                 'total_duration', 'repeat_count', 'repeat_duration', 'autoreverses', 'timing_function',
+                 'ignore_wait', 'model_keypaths', 'end_value', 'key_times')
+
+    def __init__(self, input_name, keyPath, begin, duration, total_duration, values=None, fromValue=None, toValue=None,
+                 source_only=False, repeat_count=0, repeat_duration=0, autoreverses=False, timing_function=None,
+                 ignore_wait=False, model_keypaths=(), end_value=None, key_times=None):
+        self.input_name = input_name
+        self.source_only = source_only
+        self.keyPath = keyPath
+        self.values = values
+        self.fromValue = fromValue
+        self.toValue = toValue
+        self.begin = begin
+        self.duration = duration
+        self.total_duration = total_duration
+        self.repeat_count = repeat_count
+        self.repeat_duration = repeat_duration
+        self.autoreverses = autoreverses
+        self.timing_function = timing_function
+        self.ignore_wait = ignore_wait
+        self.model_keypaths = tuple(model_keypaths)
+        self.end_value = end_value
+        #keyframes with their own keyTimes (timing curves) are linear, otherwise paced
+        self.key_times = key_times
+
+    @property
+    def end(self):
+        return self.begin + self.total_duration
+
+    def replace(self, **changes):
+        """
+        A copy of the entry with the attributes in changes set to new values
+        """
+        ret = TimelineEntry.__new__(TimelineEntry)
+        for name in self.__slots__:
+            setattr(ret, name, changes[name] if name in changes else getattr(self, name))
+        return ret
+
+    @classmethod
+    def from_animation(cls, csanim, input_name, base_time, replayable_only=True):
+        """
+        Build an entry from a committed CSAnimation. Returns None for animations a timeline can't reproduce, unless
+        replayable_only is False.
+        """
+        cs_input = csanim.cs_input
+        if replayable_only and (csanim.completion_handler or csanim.extra_model):
+            return None
+        if csanim.target is cs_input.layer:
+            source_only = False
+        elif csanim.target is cs_input.layer.sourceLayer():
+            source_only = True
+        elif replayable_only:
+            return None
+        else:
+            source_only = False
+
+        ca_anim = csanim.animation
+        values = None
+        fromValue = None
+        toValue = None
+        key_times = None
+        if hasattr(ca_anim, 'values') and ca_anim.values() is not None:
+            values = list(ca_anim.values())
+            if ca_anim.keyTimes() is not None:
+                key_times = [float(key_time) for key_time in ca_anim.keyTimes()]
+        else:
+            fromValue = ca_anim.fromValue()
+            toValue = ca_anim.toValue()
+
+        return cls(input_name, csanim.keyPath, csanim.begin_time - base_time, ca_anim.duration(), csanim.duration,
+                   values=values, fromValue=fromValue, toValue=toValue, source_only=source_only,
+                   repeat_count=ca_anim.repeatCount(), repeat_duration=ca_anim.repeatDuration(),
+                   autoreverses=ca_anim.autoreverses(), timing_function=ca_anim.timingFunction(),
+                   ignore_wait=csanim.ignore_wait, model_keypaths=csanim.model_keypaths, end_value=csanim.toValue,
+                   key_times=key_times)
+
+    def to_dict(self):
+        """
+        JSON-safe form of the entry. The timing function must be a name, which is what the headless backend uses.
+        """
+        timing_function = self.timing_function
+        if timing_function is not None and not isinstance(timing_function, string_types):
+            raise TypeError("can't serialize timing function %r" % (timing_function,))
+        return {'input': self.input_name, 'keyPath': self.keyPath, 'values': encode_value(self.values),
+                'fromValue': encode_value(self.fromValue), 'toValue': encode_value(self.toValue), 'begin': self.begin,
+                'duration': self.duration, 'total_duration': self.total_duration, 'source_only': self.source_only,
+                'repeat_count': self.repeat_count, 'repeat_duration': self.repeat_duration,
+                'autoreverses': self.autoreverses, 'timing_function': timing_function,
+                'ignore_wait': self.ignore_wait, 'model_keypaths': list(self.model_keypaths),
+                'end_value': encode_value(self.end_value), 'key_times': self.key_times}
+
+    @classmethod
+    def from_dict(cls, data, backend=None):
+        if backend is None:
+            backend = get_backend()
+        timing_function = data.get('timing_function')
+        if timing_function is not None:
+            timing_function = backend.timing_function(timing_function)
+        return cls(data['input'], data['keyPath'], data['begin'], data['duration'], data['total_duration'],
+                   values=decode_value(data.get('values'), backend),
+                   fromValue=decode_value(data.get('fromValue'), backend),
+                   toValue=decode_value(data.get('toValue'), backend), source_only=data.get('source_only', False),
+                   repeat_count=data.get('repeat_count', 0), repeat_duration=data.get('repeat_duration', 0),
+                   autoreverses=data.get('autoreverses', False), timing_function=timing_function,
+                   ignore_wait=data.get('ignore_wait', False), model_keypaths=data.get('model_keypaths', ()),
+                   end_value=decode_value(data.get('end_value'), backend), key_times=data.get('key_times'))
+
+    def make_animation(self, cs_input):
+        """
+        Create a CSAnimation for cs_input equivalent to the one this entry was captured from
+        """
+        backend = get_backend()
+        if self.values is not None:
+            ca_anim = backend.keyframe_animation(self.keyPath)
+            ca_anim.setValues_(self.values)
+            if self.key_times is not None:
+                ca_anim.setKeyTimes_(self.key_times)
+                ca_anim.setCalculationMode_('linear')
+            else:
+                ca_anim.setCalculationMode_('paced')
+            ca_anim.setRotationMode_('autoReverse')
+        else:
+            ca_anim = backend.basic_animation(self.keyPath)
+            if self.fromValue is not None:
+                ca_anim.setFromValue_(self.fromValue)
+            ca_anim.setToValue_(self.toValue)
+        ca_anim.setDuration_(self.duration)
+        if self.repeat_count:
+            ca_anim.setRepeatCount_(self.repeat_count)
+        if self.repeat_duration:
+            ca_anim.setRepeatDuration_(self.repeat_duration)
+        if self.autoreverses:
+            ca_anim.setAutoreverses_(True)
+        if self.timing_function is not None:
+            ca_anim.setTimingFunction_(self.timing_function)
+
+        target = cs_input.layer
+        if self.source_only:
+            target = target.sourceLayer()
+        csanim = CSAnimation(target, self.keyPath, ca_anim)
+        csanim.duration = self.total_duration
+        csanim.ignore_wait = self.ignore_wait
+        csanim.toValue = self.end_value
+        csanim.model_keypaths = self.model_keypaths
+        csanim.cs_input = cs_input
+        if self.keyPath == 'hidden':
+            hidden_value = self.end_value
+            csanim.internal_completion_handler = lambda a: cs_input.__hidden_complete__(a, hidden_value)
+        return csanim
+
+
+class Timeline(object):
+    """
+    An ordered list of TimelineEntry objects plus the total duration of the block they came from
+    """
+
+    def __init__(self, entries=None):
+        self.entries = entries or []
+
+    @property
+    def duration(self):
+        end_time = 0.0
+        for entry in self.entries:
+            if not entry.ignore_wait:
+                end_time = max(end_time, entry.end)
+        return end_time
+
+    @classmethod
+    def from_block(cls, block, input_arg, replayable_only=True):
+        """
+        Capture the resolved schedule of a committed AnimationBlock. input_arg is the dict that was passed to the
+        script; entries refer to inputs by their key in it. Returns None if the block did something a timeline
+        can't replay. With replayable_only=False everything that can be described is captured regardless.
+        """
+        if replayable_only and not block.cacheable:
+            return None
+        input_names = {}
+        for name, value in input_arg.items():
+            if value is not None and hasattr(value, 'animationLayer'):
+                input_names[value] = name
+
+        entries = []
+        for anim in block.animations:
+            if anim.isWaitMark:
+                continue
+            input_name = input_names.get(anim.cs_input)
+            if input_name is None:
+                return None
+            entry = TimelineEntry.from_animation(anim, input_name, block.beginTime, replayable_only)
+            if entry is None:
+                return None
+            entries.append(entry)
+        return cls(entries)
+
+    def to_dict(self):
+        return {'entries': [entry.to_dict() for entry in self.entries]}
+
+    @classmethod
+    def from_dict(cls, data, backend=None):
+        """
+        Rebuild a timeline serialized with to_dict(), boxing values for backend (the active one by default)
+        """
+        return cls([TimelineEntry.from_dict(entry, backend) for entry in data['entries']])
+
+    def apply(self, input_arg, superlayer):
+        """
+        Replay the timeline on the inputs in input_arg, starting now. Returns the list of CSAnimations created.
+        """
+        backend = get_backend()
+        backend.begin_transaction()
+        base_time = superlayer.convertTime_fromLayer_(backend.current_time(), None)
+        ret = []
+        for entry in self.entries:
+            cs_input = input_arg[entry.input_name]
+            csanim = entry.make_animation(cs_input)
+            for key_path in entry.model_keypaths:
+                cs_input.set_model_value(entry.end_value, key_path)
+            if not csanim.ignore_wait:
+                csanim.animation.setValue_forKeyPath_(csanim, "__CS_COMPLETION__")
+                csanim.animation.setDelegate_(backend.animation_delegate())
+            csanim.apply(base_time + entry.begin)
+            ret.append(csanim)
+        backend.commit_transaction()
+        return ret
+
+
+def _hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+class TimelineCache(object):
+    """
+    Bounded LRU cache of timelines keyed by (plugin source hash, script parameters, layout geometry fingerprint).
+
+    Only scripts that set animation_cacheable = True are cached: a cached script isn't run again for the same
+    parameters and geometry, which would freeze scripts that use random numbers, the time or any other outside state.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._timelines = OrderedDict()
+
+    def source_hash(self, plugin):
+        """
+        Content hash of the plugin's source file
+        """
+        plugin_file = plugin.__file__
+        if plugin_file.endswith(('.pyc', '.pyo')):
+            plugin_file = plugin_file[:-1]
+        with open(plugin_file, 'rb') as src:
+            return hashlib.sha1(src.read()).hexdigest()
+
+    def make_key(self, plugin, input_arg, superlayer, source_hash=None):
+        """
+        Cache key for running plugin with input_arg, or None if the plugin didn't opt in with animation_cacheable = True.
+        Pass source_hash if the plugin's content hash is already known, to skip hashing the file again.
+        """
+        if not getattr(plugin, 'animation_cacheable', False):
+            return None
+        params = []
+        geometry = []
+        for name in sorted(input_arg.keys()):
+            value = input_arg[name]
+            if value is not None and hasattr(value, 'geometry_fingerprint'):
+                geometry.append((name, value.geometry_fingerprint()))
+            else:
+                params.append((name, _hashable(value)))
+        s_bounds = superlayer.bounds()
+        geometry.append((s_bounds.size.width, s_bounds.size.height))
+        if source_hash is None:
+            source_hash = self.source_hash(plugin)
+        return (source_hash, tuple(params), tuple(geometry))
+
+    def get(self, key):
+        if key is None:
+            return None
+        timeline = self._timelines.get(key)
+        if timeline is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._timelines.pop(key)
+        self._timelines[key] = timeline
+        return timeline
+
+    def store(self, key, block, input_arg, plugin=None):
+        """
+        Capture block as a timeline and cache it under key. Returns the timeline, or None if it can't be cached.
+        """
+        if key is None:
+            return None
+        if plugin is not None and not getattr(plugin, 'animation_cacheable', False):
+            return None
+        timeline = Timeline.from_block(block, input_arg)
+        if timeline is None:
+            return None
+        self._timelines.pop(key, None)
+        self._timelines[key] = timeline
+        while len(self._timelines) > self.max_entries:
+            self._timelines.popitem(last=False)
+            self.evictions += 1
+        return timeline
+
+    def clear(self):
+        self._timelines.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self._timelines),
+                'max_entries': self.max_entries}
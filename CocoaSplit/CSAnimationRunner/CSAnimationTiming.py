@@ -0,0 +1,441 @@
+"""
+Timing curves beyond the named CAMediaTimingFunction constants.
+
+    source.moveTo((100, 100), 1.0, timing=Spring(damping=8))
+    source.opacity(0.0, 0.5, timing='bounce')
+    source.rotate(90, 1.0, timing=(0.68, -0.55, 0.27, 1.55))     # any cubic bezier
+
+A curve maps linear progress through an animation (0 to 1) to eased progress, which may overshoot. simple_animation
+turns an animation with a curve into a linear keyframe animation: the curve is sampled into a table of keyTimes and
+eased progress, and the values are the animation's path (from/to, or its keyframes, paced) at those progress values.
+Tables are computed with NumPy when it's available and memoized by curve parameters and sample count, so a curve used
+on a thousand inputs is only evaluated once.
+
+Named CAMediaTimingFunction constants ('easeIn', 'easeInEaseOut', ...) are still handed to Core Animation as they are.
+"""
+import math
+import numbers
+from bisect import bisect_right
+from CSAnimationBackend import get_backend
+
+try:
+    import numpy as np
+except ImportError:
+    #curves are evaluated one sample at a time
+    np = None
+
+
+#control points of the named CAMediaTimingFunctions, None for linear
+NAMED_CONTROL_POINTS = {
+    'linear': None,
+    'easeIn': (0.42, 0.0, 1.0, 1.0),
+    'easeOut': (0.0, 0.0, 0.58, 1.0),
+    'easeInEaseOut': (0.42, 0.0, 0.58, 1.0),
+    'default': (0.25, 0.1, 0.25, 1.0),
+}
+
+#NSValues animated on these keypaths box sizes, everywhere else points
+SIZE_KEYPATHS = ('transform.translation', 'bounds.size')
+
+DEFAULT_SAMPLES = 64
+
+MAX_TABLES = 256
+
+_tables = {}
+
+
+class _ScalarMath(object):
+    """
+    The part of numpy's interface the curves use, for a single float
+    """
+    exp = staticmethod(math.exp)
+    cos = staticmethod(math.cos)
+    sin = staticmethod(math.sin)
+    floor = staticmethod(math.floor)
+    abs = staticmethod(abs)
+
+    @staticmethod
+    def where(condition, if_true, if_false):
+        return if_true if condition else if_false
+
+    @staticmethod
+    def clip(value, low, high):
+        return min(max(value, low), high)
+
+    @staticmethod
+    def minimum(a, b):
+        return min(a, b)
+
+
+def _bezier(t, fract, control_points, m, iterations):
+    x1, y1, x2, y2 = control_points
+    cx = 3.0 * x1
+    bx = 3.0 * (x2 - x1) - cx
+    ax = 1.0 - cx - bx
+    cy = 3.0 * y1
+    by = 3.0 * (y2 - y1) - cy
+    ay = 1.0 - cy - by
+
+    for _ in range(iterations):
+        x_err = ((ax * t + bx) * t + cx) * t - fract
+        dx = (3.0 * ax * t + 2.0 * bx) * t + cx
+        safe = m.abs(dx) > 1e-6
+        t = m.where(safe, t - x_err / m.where(safe, dx, 1.0), t)
+        t = m.clip(t, 0.0, 1.0)
+    return ((ay * t + by) * t + cy) * t
+
+
+def cubic_bezier_ease(fract, control_points, iterations=8):
+    """
+    Map linear progress through a cubic bezier timing curve. fract is a number or a sequence of numbers in [0, 1];
+    sequences give an array, or a list without numpy.
+    """
+    if np is not None:
+        return _bezier(np.array(fract, dtype=float), fract, control_points, np, iterations)
+    if isinstance(fract, numbers.Number):
+        return _bezier(float(fract), fract, control_points, _ScalarMath, iterations)
+    return [_bezier(float(value), value, control_points, _ScalarMath, iterations) for value in fract]
+
+
+def timing_table(curve, samples=None):
+    """
+    (keyTimes, progress) tuples for curve, memoized by the curve's parameters and the sample count
+    """
+    if samples is None:
+        samples = curve.samples
+    memo_key = (curve.key, samples)
+    table = _tables.get(memo_key)
+    if table is None:
+        table = curve.make_table(max(samples, 2))
+        if len(_tables) >= MAX_TABLES:
+            _tables.clear()
+        _tables[memo_key] = table
+    return table
+
+
+class TimingCurve(object):
+    """
+    Base of the curves. Subclasses set key (their parameters) and implement ease(t, m), where t is a numpy array
+    of linear progress and m is numpy, or t is a float and m a stand-in with the same functions.
+    """
+    samples = DEFAULT_SAMPLES
+    key = None
+
+    def ease(self, t, m):
+        raise NotImplementedError
+
+    def make_table(self, samples):
+        if np is not None:
+            times = np.linspace(0.0, 1.0, samples)
+            progress = np.asarray(self.ease(times, np), dtype=float).tolist()
+            times = times.tolist()
+        else:
+            times = [idx / float(samples - 1) for idx in range(samples)]
+            progress = [float(self.ease(t, _ScalarMath)) for t in times]
+        #the model value is set to the end of the path, the table has to end there exactly
+        progress[0] = 0.0
+        progress[-1] = 1.0
+        return tuple(times), tuple(progress)
+
+    def table(self, samples=None):
+        return timing_table(self, samples)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.key == self.key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return "%s%r" % (type(self).__name__, self.key[1:])
+
+
+class _ModeCurve(TimingCurve):
+    """
+    A curve defined by its ease-out form; mode 'in' and 'inOut' are derived from it
+    """
+
+    def __init__(self, mode='out'):
+        if mode not in ('in', 'out', 'inOut'):
+            raise ValueError("mode must be 'in', 'out' or 'inOut', not %r" % (mode,))
+        self.mode = mode
+
+    def ease_out(self, t, m):
+        raise NotImplementedError
+
+    def ease(self, t, m):
+        if self.mode == 'out':
+            return self.ease_out(t, m)
+        if self.mode == 'in':
+            return 1.0 - self.ease_out(1.0 - t, m)
+        first = 0.5 - 0.5 * self.ease_out(1.0 - 2.0 * t, m)
+        second = 0.5 + 0.5 * self.ease_out(2.0 * t - 1.0, m)
+        return m.where(t < 0.5, first, second)
+
+
+class CubicBezier(TimingCurve):
+    """
+    The timing curve with control points (x1, y1) and (x2, y2), like CSS cubic-bezier(). y can leave [0, 1].
+    """
+
+    def __init__(self, x1, y1, x2, y2):
+        if not (0.0 <= x1 <= 1.0 and 0.0 <= x2 <= 1.0):
+            raise ValueError("cubic bezier x coordinates must be between 0 and 1")
+        self.control_points = (float(x1), float(y1), float(x2), float(y2))
+        self.key = ('bezier',) + self.control_points
+
+    def ease(self, t, m):
+        return _bezier(t, t, self.control_points, m, 8)
+
+
+class Spring(TimingCurve):
+    """
+    A damped spring released at the start value and settling at the end value. stiffness, damping and mass are in
+    the units CASpringAnimation uses, velocity is the initial speed in path lengths per second. The curve covers
+    settling_time() seconds of the spring's motion, whatever the animation's duration is; pass that as the duration
+    to see the spring at its natural speed.
+    """
+
+    def __init__(self, damping=10.0, stiffness=100.0, mass=1.0, velocity=0.0):
+        if stiffness <= 0 or mass <= 0 or damping < 0:
+            raise ValueError("spring needs positive stiffness and mass and non-negative damping")
+        self.damping = float(damping)
+        self.stiffness = float(stiffness)
+        self.mass = float(mass)
+        self.velocity = float(velocity)
+        self.key = ('spring', self.damping, self.stiffness, self.mass, self.velocity)
+        self.omega = math.sqrt(self.stiffness / self.mass)
+        self.zeta = self.damping / (2.0 * math.sqrt(self.stiffness * self.mass))
+
+    def settling_time(self, tolerance=0.001):
+        """
+        Seconds until the spring stays within tolerance of the end value
+        """
+        if self.zeta >= 1.0:
+            decay = self.omega * (self.zeta - math.sqrt(self.zeta * self.zeta - 1.0))
+        else:
+            decay = self.zeta * self.omega
+        if decay <= 0:
+            #undamped, one full oscillation
+            return 2.0 * math.pi / self.omega
+        return math.log(1.0 / tolerance) / decay
+
+    def ease(self, t, m):
+        t = t * self.settling_time()
+        omega = self.omega
+        zeta = self.zeta
+        v0 = self.velocity
+        if zeta < 1.0:
+            omega_d = omega * math.sqrt(1.0 - zeta * zeta)
+            factor = (zeta * omega - v0) / omega_d
+            return 1.0 - m.exp(-zeta * omega * t) * (m.cos(omega_d * t) + factor * m.sin(omega_d * t))
+        if zeta == 1.0:
+            return 1.0 - m.exp(-omega * t) * (1.0 + (omega - v0) * t)
+        root = omega * math.sqrt(zeta * zeta - 1.0)
+        r1 = -zeta * omega + root
+        r2 = -zeta * omega - root
+        c1 = (v0 + r2) / (r1 - r2)
+        return 1.0 + c1 * m.exp(r1 * t) + (-1.0 - c1) * m.exp(r2 * t)
+
+
+class Bounce(_ModeCurve):
+    """
+    Bounces against the end value with decreasing height (the classic easeOutBounce), or the start value for 'in'
+    """
+
+    def __init__(self, mode='out'):
+        super(Bounce, self).__init__(mode)
+        self.key = ('bounce', mode)
+
+    def ease_out(self, t, m):
+        n1 = 7.5625
+        d1 = 2.75
+        return m.where(t < 1.0 / d1, n1 * t * t,
+                       m.where(t < 2.0 / d1, n1 * (t - 1.5 / d1) ** 2 + 0.75,
+                               m.where(t < 2.5 / d1, n1 * (t - 2.25 / d1) ** 2 + 0.9375,
+                                       n1 * (t - 2.625 / d1) ** 2 + 0.984375)))
+
+
+class Elastic(_ModeCurve):
+    """
+    Overshoots and oscillates around the end value like a plucked string. amplitude below 1 is treated as 1; a
+    smaller period oscillates faster.
+    """
+
+    def __init__(self, amplitude=1.0, period=0.3, mode='out'):
+        super(Elastic, self).__init__(mode)
+        if period <= 0:
+            raise ValueError("elastic period must be positive")
+        self.amplitude = max(float(amplitude), 1.0)
+        self.period = float(period)
+        self.key = ('elastic', self.amplitude, self.period, mode)
+
+    def ease_out(self, t, m):
+        shift = self.period / (2.0 * math.pi) * math.asin(1.0 / self.amplitude)
+        return self.amplitude * m.exp(-10.0 * math.log(2.0) * t) * \
+            m.sin((t - shift) * 2.0 * math.pi / self.period) + 1.0
+
+
+class Steps(TimingCurve):
+    """
+    Jumps through count equal steps, at the end of each interval ('end', like CSS steps()) or at its start
+    """
+
+    def __init__(self, count, position='end'):
+        if int(count) < 1:
+            raise ValueError("steps needs at least one step")
+        if position not in ('start', 'end'):
+            raise ValueError("steps position must be 'start' or 'end', not %r" % (position,))
+        self.count = int(count)
+        self.position = position
+        self.key = ('steps', self.count, position)
+
+    def ease(self, t, m):
+        steps = m.floor(t * self.count)
+        if self.position == 'start':
+            steps = steps + 1.0
+        return m.minimum(steps, float(self.count)) / self.count
+
+    def make_table(self, samples):
+        #exact jumps: every boundary appears twice, with the value before and after it
+        count = self.count
+        times = [0.0]
+        progress = [0.0 if self.position == 'end' else 1.0 / count]
+        for step in range(1, count):
+            boundary = step / float(count)
+            level = step if self.position == 'end' else step + 1
+            times.extend((boundary, boundary))
+            progress.extend((progress[-1], level / float(count)))
+        times.extend((1.0, 1.0))
+        progress.extend((progress[-1], 1.0))
+        if self.position == 'start':
+            times = [0.0] + times
+            progress = [0.0] + progress
+        return tuple(times), tuple(progress)
+
+
+NAMED_CURVES = {
+    'spring': Spring(),
+    'bounce': Bounce(),
+    'bounceIn': Bounce('in'),
+    'bounceInOut': Bounce('inOut'),
+    'elastic': Elastic(),
+    'elasticIn': Elastic(mode='in'),
+    'elasticInOut': Elastic(mode='inOut'),
+    'easeInBack': CubicBezier(0.36, 0.0, 0.66, -0.56),
+    'easeOutBack': CubicBezier(0.34, 1.56, 0.64, 1.0),
+    'easeInOutBack': CubicBezier(0.68, -0.6, 0.32, 1.6),
+}
+
+
+def timing_curve(timing):
+    """
+    The TimingCurve a timing= argument asks for: a curve, one of NAMED_CURVES or four cubic bezier control point
+    coordinates. None for a named CAMediaTimingFunction (or no timing), which Core Animation does itself.
+    """
+    if timing is None or isinstance(timing, TimingCurve):
+        return timing
+    if isinstance(timing, (type(''), type(u''))):
+        return NAMED_CURVES.get(timing)
+    if len(timing) == 4 and all(isinstance(coord, numbers.Number) for coord in timing):
+        return CubicBezier(*timing)
+    raise ValueError("unknown timing %r" % (timing,))
+
+
+def value_parts(value, keyPath):
+    """
+    (kind, floats) of an animation value: 'number', 'point' or 'size'
+    """
+    if isinstance(value, numbers.Number):
+        return 'number', (float(value),)
+    if hasattr(value, 'pointValue') and hasattr(value, 'sizeValue'):
+        if keyPath in SIZE_KEYPATHS:
+            value = value.sizeValue()
+        else:
+            value = value.pointValue()
+    if hasattr(value, 'x') and hasattr(value, 'y'):
+        return 'point', (float(value.x), float(value.y))
+    if hasattr(value, 'width') and hasattr(value, 'height'):
+        return 'size', (float(value.width), float(value.height))
+    raise ValueError("need a number, point or size value, not %r" % (value,))
+
+
+def make_value(kind, parts, backend=None):
+    """
+    The animation value of kind made from parts, the reverse of value_parts()
+    """
+    if kind == 'number':
+        return parts[0]
+    if backend is None:
+        backend = get_backend()
+    if kind == 'point':
+        return backend.point_values([parts[0]], [parts[1]])[0]
+    return backend.size_values([parts[0]], [parts[1]])[0]
+
+
+def _paced_positions(points):
+    lengths = [math.sqrt(sum((b - a) ** 2 for a, b in zip(p1, p2))) for p1, p2 in zip(points, points[1:])]
+    total = sum(lengths)
+    if total <= 0:
+        return [idx / float(len(points) - 1) for idx in range(len(points))]
+    positions = [0.0]
+    for length in lengths:
+        positions.append(positions[-1] + length / total)
+    positions[-1] = 1.0
+    return positions
+
+
+def _resample(points, positions, progress):
+    """
+    Points along the path (points at positions) at each progress, extrapolating past either end
+    """
+    if np is not None:
+        points = np.array(points, dtype=float)
+        positions = np.array(positions, dtype=float)
+        progress = np.array(progress, dtype=float)
+        idx = np.clip(np.searchsorted(positions, progress, side='right') - 1, 0, len(positions) - 2)
+        span = positions[idx + 1] - positions[idx]
+        local = np.where(span > 0, (progress - positions[idx]) / np.where(span > 0, span, 1.0), 1.0)
+        start = points[idx]
+        return (start + (points[idx + 1] - start) * local[:, None]).tolist()
+    ret = []
+    last = len(positions) - 2
+    for fract in progress:
+        idx = min(max(bisect_right(positions, fract) - 1, 0), last)
+        span = positions[idx + 1] - positions[idx]
+        local = (fract - positions[idx]) / span if span > 0 else 1.0
+        start = points[idx]
+        ret.append([a + (b - a) * local for a, b in zip(start, points[idx + 1])])
+    return ret
+
+
+def timing_keyframes(curve, path, keyPath, samples=None, backend=None):
+    """
+    (values, keyTimes) of a linear keyframe animation moving along path (from/to values, or keyframes that would be
+    paced) with curve's timing
+    """
+    if backend is None:
+        backend = get_backend()
+    key_times, progress = timing_table(curve, samples)
+    kinds = set()
+    points = []
+    for value in path:
+        kind, components = value_parts(value, keyPath)
+        kinds.add(kind)
+        points.append(components)
+    if len(kinds) != 1:
+        raise ValueError("can't mix numbers, points and sizes in one animation path")
+    if len(points) == 1:
+        points = points * 2
+    values = _resample(points, _paced_positions(points), progress)
+    kind = kinds.pop()
+    if kind == 'number':
+        return [value[0] for value in values], list(key_times)
+    xs = [value[0] for value in values]
+    ys = [value[1] for value in values]
+    if kind == 'point':
+        return backend.point_values(xs, ys), list(key_times)
+    return backend.size_values(xs, ys), list(key_times)
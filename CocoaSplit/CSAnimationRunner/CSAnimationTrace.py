@@ -0,0 +1,141 @@
+"""
+Export committed animation schedules as Chrome trace-event JSON (chrome://tracing, Perfetto, speedscope).
+
+After AnimationBlock.commit() every CSAnimation knows its resolved begin_time and end_time, and every wait marker's
+begin_time is the time the wait released. A TraceRecorder collects those into:
+    one track (thread) per source (keyed and named by its UUID, or by its layer when it has none), plus a 'block'
+    track for waits that aren't tied to an input. The script's name for an input is an event arg, since the same
+    source can go by different names in different scripts
+    a complete ('X') event per animation, named by keypath
+    an instant ('i') event per wait marker, and per completion as the CompletionQueue delivers it
+
+Times are layer times as used by the commit, which are media times as long as no layer changes speed or timeOffset.
+Timestamps in the file are microseconds from the first recorded event.
+"""
+import json
+import threading
+
+
+class TraceRecorder(object):
+
+    def __init__(self, max_events=100000):
+        self.enabled = False
+        self.max_events = max_events
+        self.events = []
+        self.dropped = 0
+        self._tracks = {}
+        self._track_names = []
+        self._epoch = None
+        self._lock = threading.Lock()
+
+    def _ts(self, seconds):
+        if self._epoch is None:
+            self._epoch = seconds
+        return (seconds - self._epoch) * 1e6
+
+    def _track(self, cs_input):
+        if cs_input is None:
+            key = None
+            name = 'block'
+        else:
+            source = getattr(cs_input, 'input', None)
+            if source is not None and hasattr(source, 'uuid'):
+                key = name = source.uuid()
+            else:
+                key = cs_input.layer
+                name = 'input %d' % (len(self._tracks) + 1)
+        tid = self._tracks.get(key)
+        if tid is None:
+            tid = len(self._tracks) + 1
+            self._tracks[key] = tid
+            self._track_names.append((tid, name))
+        return tid
+
+    def _add(self, event):
+        if len(self.events) >= self.max_events:
+            self.dropped += 1
+            return
+        self.events.append(event)
+
+    def add_animations(self, animations, input_arg=None, run_name=None):
+        """
+        Record committed CSAnimations (an AnimationBlock's animations, or the ones a timeline replay created)
+        """
+        if not self.enabled:
+            return
+        input_names = {}
+        if input_arg:
+            for name, value in input_arg.items():
+                if value is not None and hasattr(value, 'animationLayer'):
+                    input_names[value] = name
+        with self._lock:
+            for anim in animations:
+                tid = self._track(anim.cs_input)
+                args = {'run': run_name}
+                if anim.cs_input is not None and anim.cs_input in input_names:
+                    args['input'] = input_names[anim.cs_input]
+                if anim.label:
+                    args['label'] = anim.label
+                if anim.isClipMark:
+                    self._add({'name': 'clip', 'cat': 'clip', 'ph': 'i', 's': 'p', 'ts': self._ts(anim.begin_time),
+                               'pid': 1, 'tid': tid, 'args': args})
+                    continue
+                if anim.isWaitMark:
+                    args['duration'] = anim.duration
+                    self._add({'name': 'wait' if anim.isWaitOnly else 'waitAnimation', 'cat': 'wait', 'ph': 'i',
+                               's': 't' if anim.cs_input is not None else 'p', 'ts': self._ts(anim.begin_time),
+                               'pid': 1, 'tid': tid, 'args': args})
+                    continue
+                duration = anim.duration
+                if anim.ignore_wait:
+                    args['repeat'] = 'forever'
+                    if anim.animation is not None:
+                        duration = anim.animation.duration()
+                if anim.animation is not None and anim.target is not None and anim.cs_input is not None \
+                        and anim.target is not anim.cs_input.layer:
+                    args['layer'] = 'source'
+                self._add({'name': anim.keyPath, 'cat': 'animation', 'ph': 'X', 'ts': self._ts(anim.begin_time),
+                           'dur': duration * 1e6, 'pid': 1, 'tid': tid, 'args': args})
+
+    def add_block(self, block, input_arg=None, run_name=None):
+        self.add_animations(block.animations, input_arg, run_name)
+
+    def add_completion(self, cs_anim, now):
+        """
+        Record that cs_anim's completion was delivered at media time now
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            tid = self._track(cs_anim.cs_input)
+            self._add({'name': 'complete %s' % cs_anim.keyPath, 'cat': 'completion', 'ph': 'i', 's': 't',
+                       'ts': self._ts(now), 'pid': 1, 'tid': tid,
+                       'args': {'late_ms': (now - cs_anim.end_time) * 1000.0 if cs_anim.end_time else None}})
+
+    def trace(self):
+        """
+        The trace as a dict in Chrome's JSON object format
+        """
+        with self._lock:
+            metadata = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'CocoaSplit animations'}}]
+            for tid, name in self._track_names:
+                metadata.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': name}})
+                metadata.append({'name': 'thread_sort_index', 'ph': 'M', 'pid': 1, 'tid': tid,
+                                 'args': {'sort_index': tid}})
+            return {'traceEvents': metadata + list(self.events), 'displayTimeUnit': 'ms',
+                    'otherData': {'dropped_events': self.dropped}}
+
+    def to_json(self):
+        return json.dumps(self.trace())
+
+    def dump(self, path):
+        with open(path, 'w') as trace_file:
+            json.dump(self.trace(), trace_file)
+
+    def clear(self):
+        with self._lock:
+            self.events = []
+            self.dropped = 0
+            self._tracks = {}
+            self._track_names = []
+            self._epoch = None
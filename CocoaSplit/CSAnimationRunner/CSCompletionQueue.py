@@ -0,0 +1,104 @@
+"""
+Batched animation completion handling.
+
+Every animation in a block shares one delegate, which just queues the finished CSAnimation here. The first
+completion queued in a frame schedules a drain with the backend; Core Animation delivers all the stops for a frame
+in the same run loop pass, so the drain sees all of them. The drain writes every model value back inside one
+transaction and only then runs the scripts' on_complete handlers, so handlers see the final layer state. An
+exception from one write-back or handler is logged and doesn't stop the rest of the batch.
+
+With a profiler attached (and enabled) the write-back time of each drain is recorded per plugin as 'completion'.
+With a tracer attached each completion becomes an instant event in the trace (see CSAnimationTrace).
+"""
+import threading
+from CSAnimationProfiler import clock
+
+
+class CompletionQueue(object):
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._pending = []
+        self._scheduled = False
+        self.drains = 0
+        self.completions = 0
+        self.max_batch = 0
+        self.profiler = None
+        self.tracer = None
+
+    def enqueue(self, cs_anim):
+        """
+        Queue a finished CSAnimation. Safe to call from any thread.
+        """
+        with self._lock:
+            self._pending.append(cs_anim)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.backend.call_soon(self.drain)
+
+    def drain(self):
+        """
+        Complete everything queued so far. Returns the number of animations completed.
+        """
+        with self._lock:
+            batch = self._pending
+            self._pending = []
+            self._scheduled = False
+        if not batch:
+            return 0
+
+        backend = self.backend
+        backend.begin_transaction()
+        backend.set_disable_actions(True)
+        profiler = self.profiler
+        try:
+            if profiler is not None and profiler.enabled:
+                self._complete_profiled(batch, profiler)
+            else:
+                for cs_anim in batch:
+                    self._complete_model(cs_anim)
+        finally:
+            backend.commit_transaction()
+
+        for cs_anim in batch:
+            try:
+                cs_anim.complete_handler()
+            except Exception as e:
+                backend.log("on_complete handler failed: %s" % e)
+
+        tracer = self.tracer
+        if tracer is not None and tracer.enabled:
+            now = backend.current_time()
+            for cs_anim in batch:
+                tracer.add_completion(cs_anim, now)
+
+        self.drains += 1
+        self.completions += len(batch)
+        self.max_batch = max(self.max_batch, len(batch))
+        return len(batch)
+
+    def _complete_profiled(self, batch, profiler):
+        by_plugin = {}
+        for cs_anim in batch:
+            start = clock()
+            self._complete_model(cs_anim)
+            plugin_name = cs_anim.profile_plugin
+            if plugin_name is not None:
+                by_plugin[plugin_name] = by_plugin.get(plugin_name, 0.0) + clock() - start
+        for plugin_name, seconds in by_plugin.items():
+            profiler.record(plugin_name, 'completion', seconds)
+
+    def _complete_model(self, cs_anim):
+        try:
+            cs_anim.complete_model()
+        except Exception as e:
+            self.backend.log("animation completion failed: %s" % e)
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def stats(self):
+        return {'drains': self.drains, 'completions': self.completions, 'max_batch': self.max_batch,
+                'pending': len(self._pending)}
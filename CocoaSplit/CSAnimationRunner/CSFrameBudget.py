@@ -0,0 +1,150 @@
+"""
+Frame budgeted application of committed animations.
+
+Adding hundreds of animations to their layers in one go (a layout switch) can take longer than a display frame. With a
+FrameBudget set on a block, commit() still resolves the whole schedule at once but only adds animations to their layers
+in priority order, soonest begin time first (then in the order they were added), until the frame's budget is spent.
+The rest are added in later frames, one budget's worth per frame.
+
+An animation is never held back past its begin time on purpose: everything beginning within lead seconds of the
+current frame is added in that frame whatever the budget says. Animations that begin later don't show anything before
+they begin, so adding them a few frames after the commit changes nothing on screen. Their begin_time and end_time are
+filled in at commit time so the timeline cache, tracing and profiling see the whole schedule right away.
+"""
+import threading
+from operator import itemgetter
+from CSAnimationBackend import get_backend
+from CSAnimationProfiler import clock, RollingHistogram, COUNT_BOUNDS, TIME_BOUNDS
+
+
+FRAME_INTERVAL = 1 / 60.0
+
+
+class FrameBudget(object):
+    """
+    Settings and statistics of budgeted commits. budget and frame_interval are seconds, lead defaults to three frames.
+    """
+
+    def __init__(self, budget=0.004, frame_interval=FRAME_INTERVAL, lead=None, history=256):
+        self.budget = budget
+        self.frame_interval = frame_interval
+        self.lead = lead if lead is not None else 3 * frame_interval
+        self.history = history
+        self._lock = threading.Lock()
+        self.reset()
+
+    def apply(self, block, begins):
+        """
+        Apply block's animations at the begin times in begins ([(begin, CSAnimation)]), the first frame's worth now.
+        Returns the BudgetedApply doing it.
+        """
+        pending = []
+        for begin, anim in begins:
+            if anim.isWaitMark or anim.target is None:
+                #nothing to add to a layer
+                block.apply_animation(anim, begin)
+                continue
+            anim.begin_time = begin
+            if not anim.ignore_wait:
+                anim.end_time = begin + anim.duration
+            pending.append((begin, anim))
+        pending.sort(key=itemgetter(0))
+        job = BudgetedApply(self, block, pending)
+        job.run_frame(first=True)
+        return job
+
+    def record_frame(self, seconds, applied, late):
+        with self._lock:
+            self.frame_time.add(seconds)
+            self.per_frame.add(applied)
+            self.frames += 1
+            self.applied += applied
+            self.late += late
+
+    def record_commit(self, frames):
+        with self._lock:
+            self.commits += 1
+            self.frames_per_commit.add(frames)
+            if frames > 1:
+                self.spread_commits += 1
+            self.max_frames = max(self.max_frames, frames)
+
+    def stats(self):
+        """
+        commits: budgeted commits finished, spread_commits: how many needed more than one frame, frames_per_commit,
+        frame_time (seconds spent adding animations per frame) and animations_per_frame summaries, late: animations
+        added after their begin time had passed
+        """
+        with self._lock:
+            return {'budget': self.budget, 'lead': self.lead, 'commits': self.commits,
+                    'spread_commits': self.spread_commits, 'max_frames': self.max_frames, 'frames': self.frames,
+                    'applied': self.applied, 'late': self.late, 'in_progress': self.in_progress,
+                    'frames_per_commit': self.frames_per_commit.summary(), 'frame_time': self.frame_time.summary(),
+                    'animations_per_frame': self.per_frame.summary()}
+
+    def reset(self):
+        with self._lock:
+            self.commits = 0
+            self.spread_commits = 0
+            self.max_frames = 0
+            self.frames = 0
+            self.applied = 0
+            self.late = 0
+            self.in_progress = 0
+            self.frames_per_commit = RollingHistogram(COUNT_BOUNDS, self.history)
+            self.frame_time = RollingHistogram(TIME_BOUNDS, self.history)
+            self.per_frame = RollingHistogram(COUNT_BOUNDS, self.history)
+
+
+class BudgetedApply(object):
+    """
+    The animations of one commit that still have to be added to their layers, sorted by begin time
+    """
+
+    def __init__(self, budget, block, pending):
+        self.budget = budget
+        self.block = block
+        self.pending = pending
+        self.pos = 0
+        self.frames = 0
+        with budget._lock:
+            budget.in_progress += 1
+
+    def done(self):
+        return self.pos >= len(self.pending)
+
+    def run_frame(self, first=False):
+        """
+        Add one frame's worth. The first frame runs inside the commit's transaction, later ones open their own.
+        """
+        backend = get_backend()
+        start = clock()
+        if not first:
+            backend.begin_transaction()
+        now = self.block.baseLayer.convertTime_fromLayer_(backend.current_time(), None)
+        due = now + self.budget.lead
+        pending = self.pending
+        pos = self.pos
+        late = 0
+        try:
+            while pos < len(pending):
+                begin, anim = pending[pos]
+                if begin > due and clock() - start >= self.budget.budget:
+                    break
+                if begin < now:
+                    late += 1
+                self.block.apply_animation(anim, begin, backend)
+                pos += 1
+        finally:
+            if not first:
+                backend.commit_transaction()
+        applied = pos - self.pos
+        self.pos = pos
+        self.frames += 1
+        self.budget.record_frame(clock() - start, applied, late)
+        if self.done():
+            with self.budget._lock:
+                self.budget.in_progress -= 1
+            self.budget.record_commit(self.frames)
+        else:
+            backend.call_later(self.budget.frame_interval, self.run_frame)
@@ -0,0 +1,317 @@
+"""
+Python-side cache of an input's layer geometry.
+
+Every frame()/bounds()/valueForKeyPath_() on a real layer is a trip through the PyObjC bridge. GeometrySnapshot
+reads each property from the layer at most once and keeps it as plain floats. When an animation writes a new model
+value the snapshot is updated in place: position moves and translations shift the cached frame, other geometry
+changes make it derive the frame from its own copy of the layer's geometry. Nothing written is ever read back.
+"""
+import math
+from CSAnimationBackend import get_backend
+
+
+def _point(value):
+    if hasattr(value, 'pointValue'):
+        value = value.pointValue()
+    return (value[0], value[1])
+
+
+def _size(value):
+    if hasattr(value, 'sizeValue'):
+        value = value.sizeValue()
+    if hasattr(value, 'width'):
+        return (value.width, value.height)
+    return (value[0], value[1])
+
+
+def _rect(rect):
+    return (rect.origin.x, rect.origin.y, rect.size.width, rect.size.height)
+
+
+def _rect_value(value):
+    if hasattr(value, 'rectValue'):
+        value = value.rectValue()
+    if hasattr(value, 'origin'):
+        return _rect(value)
+    return tuple(value)
+
+
+#a whole transform can't be split into the parts below, so everything gets re-read after one is written
+_RESET_KEYPATHS = ('transform',)
+
+#the parts of the transform the frame depends on
+_TRANSFORM_KEYPATHS = ('transform.translation.x', 'transform.translation.y', 'transform.scale.x', 'transform.scale.y',
+                       'transform.scale.z', 'transform.rotation.x', 'transform.rotation.y', 'transform.rotation.z')
+
+#keypaths made of other keypaths; written to them sets their parts
+_TRANSFORM_PARTS = {
+    'transform.translation': ('transform.translation.x', 'transform.translation.y'),
+    'transform.rotation': ('transform.rotation.z',),
+    'transform.scale': ('transform.scale.x', 'transform.scale.y', 'transform.scale.z'),
+}
+
+
+def layer_frame(position, size, anchor, translation=(0.0, 0.0), scale=(1.0, 1.0), rotation=(0.0, 0.0, 0.0)):
+    """
+    (x, y, width, height) of a layer's frame the way CALayer derives it: the bounding box of the bounds, placed by
+    anchor at position, after translation, scale and rotation (x, y, z in radians, no perspective)
+    """
+    width, height = size
+    scale_x = scale[0] * math.cos(rotation[1])
+    scale_y = scale[1] * math.cos(rotation[0])
+    corners_x = (-anchor[0] * width * scale_x, (1.0 - anchor[0]) * width * scale_x)
+    corners_y = (-anchor[1] * height * scale_y, (1.0 - anchor[1]) * height * scale_y)
+    if rotation[2]:
+        cos_z = math.cos(rotation[2])
+        sin_z = math.sin(rotation[2])
+        xs = [x * cos_z - y * sin_z for x in corners_x for y in corners_y]
+        ys = [x * sin_z + y * cos_z for x in corners_x for y in corners_y]
+        min_x = min(xs)
+        min_y = min(ys)
+        frame_width = max(xs) - min_x
+        frame_height = max(ys) - min_y
+    else:
+        min_x = min(corners_x)
+        min_y = min(corners_y)
+        frame_width = width * abs(scale_x)
+        frame_height = height * abs(scale_y)
+    return (position[0] + min_x + translation[0], position[1] + min_y + translation[1], frame_width, frame_height)
+
+
+class GeometrySnapshot(object):
+    """
+    Cached geometry of layer. superlayer_of is the layer whose superlayer's bounds are used for fractional
+    coordinates (the input's real layer; the animation layer isn't in the layer tree).
+
+    Once anything was written the frame is derived from the cached bounds, position, anchorPoint and transform parts
+    (layer_frame()) instead of being read back, because the writes may not have reached the layer yet.
+    """
+
+    def __init__(self, layer, superlayer_of=None):
+        self.layer = layer
+        self.superlayer_of = superlayer_of if superlayer_of is not None else layer
+        self.bridge_reads = 0
+        self._superlayer_bounds = None
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Drop everything except the superlayer bounds, which animations never change
+        """
+        self._frame = None
+        self._bounds = None
+        self._position = None
+        self._anchor = None
+        self._values = {}
+        self._written = False
+
+    def load(self, keyPaths=()):
+        """
+        Read the geometry plus any extra keyPaths now, so later reads don't touch the layer at all
+        """
+        self.frame_rect()
+        self.bounds_rect()
+        self.position_point()
+        self.anchor_point()
+        self.superlayer_rect()
+        for key_path in _TRANSFORM_KEYPATHS + tuple(keyPaths):
+            self.value(key_path)
+        return self
+
+    def frame_rect(self):
+        """
+        (x, y, width, height) of the layer's frame
+        """
+        if self._frame is None:
+            if self._written:
+                value = self.value
+                self._frame = layer_frame(self.position_point(), self.bounds_rect()[2:], self.anchor_point(),
+                                          (value('transform.translation.x'), value('transform.translation.y')),
+                                          (value('transform.scale.x'), value('transform.scale.y')),
+                                          (value('transform.rotation.x'), value('transform.rotation.y'),
+                                           value('transform.rotation.z')))
+            else:
+                self.bridge_reads += 1
+                self._frame = _rect(self.layer.frame())
+        return self._frame
+
+    def bounds_rect(self):
+        if self._bounds is None:
+            self.bridge_reads += 1
+            self._bounds = _rect(self.layer.bounds())
+        return self._bounds
+
+    def position_point(self):
+        if self._position is None:
+            self.bridge_reads += 1
+            self._position = _point(self.layer.position())
+        return self._position
+
+    def anchor_point(self):
+        if self._anchor is None:
+            self.bridge_reads += 1
+            self._anchor = _point(self.layer.anchorPoint())
+        return self._anchor
+
+    def superlayer_rect(self):
+        """
+        (x, y, width, height) of the superlayer's bounds, or None if the layer isn't in a layer tree
+        """
+        if self._superlayer_bounds is None:
+            self.bridge_reads += 1
+            s_layer = self.superlayer_of.superlayer()
+            if s_layer:
+                self.bridge_reads += 1
+                self._superlayer_bounds = _rect(s_layer.bounds())
+        return self._superlayer_bounds
+
+    def position(self):
+        """
+        Layer position as a new point object
+        """
+        c_pos = self.position_point()
+        return get_backend().make_point(c_pos[0], c_pos[1])
+
+    def value(self, keyPath):
+        """
+        valueForKeyPath_() on the layer, cached. Position, bounds size, anchorPoint and the transform keypaths made of
+        other keypaths come from what the snapshot tracks, so they stay right after a write.
+        """
+        try:
+            return self._values[keyPath]
+        except KeyError:
+            pass
+        tracked = _TRACKED_VALUES.get(keyPath)
+        parts = _TRANSFORM_PARTS.get(keyPath)
+        if tracked is not None:
+            return tracked(self)
+        if parts is not None and self._written:
+            part_values = [self.value(part) for part in parts]
+            if keyPath == 'transform.translation':
+                ret = _boxed_size(part_values)
+            else:
+                #CALayer's transform.scale is the average of the three
+                ret = sum(part_values) / len(part_values)
+        else:
+            self.bridge_reads += 1
+            ret = self.layer.valueForKeyPath_(keyPath)
+        self._values[keyPath] = ret
+        return ret
+
+    def model_value_written(self, keyPath, value):
+        """
+        Update the snapshot after value was written to keyPath on the layer
+        """
+        if keyPath in _RESET_KEYPATHS:
+            self.invalidate()
+            return
+        self._written = True
+        if keyPath == 'position':
+            self._move_to(_point(value))
+        elif keyPath == 'position.x':
+            self._move_to((value, self.position_point()[1]))
+        elif keyPath == 'position.y':
+            self._move_to((self.position_point()[0], value))
+        elif keyPath.startswith('bounds'):
+            b_x, b_y, b_width, b_height = self.bounds_rect()
+            if keyPath == 'bounds':
+                self._bounds = _rect_value(value)
+            elif keyPath == 'bounds.size':
+                self._bounds = (b_x, b_y) + _size(value)
+            elif keyPath == 'bounds.size.width':
+                self._bounds = (b_x, b_y, value, b_height)
+            elif keyPath == 'bounds.size.height':
+                self._bounds = (b_x, b_y, b_width, value)
+            elif keyPath == 'bounds.origin':
+                self._bounds = _point(value) + (b_width, b_height)
+            elif keyPath == 'bounds.origin.x':
+                self._bounds = (value, b_y, b_width, b_height)
+            elif keyPath == 'bounds.origin.y':
+                self._bounds = (b_x, value, b_width, b_height)
+            self._values.pop('bounds', None)
+            self._frame = None
+        elif keyPath.startswith('anchorPoint'):
+            if keyPath == 'anchorPoint':
+                self._anchor = _point(value)
+            elif keyPath == 'anchorPoint.x':
+                self._anchor = (value, self.anchor_point()[1])
+            elif keyPath == 'anchorPoint.y':
+                self._anchor = (self.anchor_point()[0], value)
+            self._frame = None
+        elif keyPath == 'frame':
+            #CALayer keeps the anchor point where the new frame puts it
+            self._set_frame(_rect_value(value))
+        elif keyPath.startswith('transform'):
+            self._transform_written(keyPath, value)
+        else:
+            self._values[keyPath] = value
+
+    def _move_to(self, new_position):
+        if self._frame is not None and self._position is not None:
+            dx = new_position[0] - self._position[0]
+            dy = new_position[1] - self._position[1]
+            self._frame = (self._frame[0] + dx, self._frame[1] + dy, self._frame[2], self._frame[3])
+        else:
+            self._frame = None
+        self._position = new_position
+
+    def _set_frame(self, rect):
+        anchor = self.anchor_point()
+        translation = (self.value('transform.translation.x'), self.value('transform.translation.y'))
+        b_x, b_y = self.bounds_rect()[:2]
+        self._bounds = (b_x, b_y, rect[2], rect[3])
+        self._position = (rect[0] + rect[2] * anchor[0] - translation[0], rect[1] + rect[3] * anchor[1] - translation[1])
+        self._frame = None
+
+    def _transform_written(self, keyPath, value):
+        """
+        Keep the transform parts, so the frame can be derived from them. A translation moves the frame by the
+        difference and changes nothing else, as long as the old translation is known. It is, after load().
+        """
+        values = self._values
+        parts = _TRANSFORM_PARTS.get(keyPath, (keyPath,))
+        if keyPath == 'transform.translation':
+            part_values = _size(value)
+        else:
+            part_values = (value,) * len(parts)
+        old = [values.get(part) for part in parts]
+        for composite, composite_parts in _TRANSFORM_PARTS.items():
+            if composite == keyPath or set(composite_parts) & set(parts):
+                values.pop(composite, None)
+        for part, part_value in zip(parts, part_values):
+            values[part] = part_value
+
+        if parts[0] not in _TRANSFORM_KEYPATHS:
+            #translation.z and the like don't change the frame
+            return
+        if self._frame is not None and parts[0].startswith('transform.translation') and None not in old:
+            shift = [0.0, 0.0]
+            for part, old_value, part_value in zip(parts, old, part_values):
+                shift[part.endswith('.y')] = part_value - old_value
+            self._frame = (self._frame[0] + shift[0], self._frame[1] + shift[1], self._frame[2], self._frame[3])
+        else:
+            self._frame = None
+
+
+def _boxed_point(point):
+    backend = get_backend()
+    return backend.point_value(backend.make_point(point[0], point[1]))
+
+
+def _boxed_size(size):
+    backend = get_backend()
+    return backend.size_value(backend.make_size(size[0], size[1]))
+
+
+#keypaths value() answers from the snapshot's own geometry
+_TRACKED_VALUES = {
+    'position': lambda snapshot: _boxed_point(snapshot.position_point()),
+    'position.x': lambda snapshot: snapshot.position_point()[0],
+    'position.y': lambda snapshot: snapshot.position_point()[1],
+    'bounds.size': lambda snapshot: _boxed_size(snapshot.bounds_rect()[2:]),
+    'bounds.size.width': lambda snapshot: snapshot.bounds_rect()[2],
+    'bounds.size.height': lambda snapshot: snapshot.bounds_rect()[3],
+    'anchorPoint': lambda snapshot: _boxed_point(snapshot.anchor_point()),
+    'anchorPoint.x': lambda snapshot: snapshot.anchor_point()[0],
+    'anchorPoint.y': lambda snapshot: snapshot.anchor_point()[1],
+}
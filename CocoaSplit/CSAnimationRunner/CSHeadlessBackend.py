@@ -0,0 +1,747 @@
+"""
+Headless backend: an in-memory stand-in for the CALayer/CAAnimation objects the animation runner uses.
+
+Nothing in here touches PyObjC, so animation scripts can be run, profiled and load tested on any machine.
+Time only moves when the clock is advanced, which lets a 30 second transition run in however long the Python takes.
+
+    backend = HeadlessBackend()
+    CSAnimationBackend.set_backend(backend)
+    root = backend.make_layer(Rect(0, 0, 1280, 720))
+    source = HeadlessInput(backend, root, Rect(0, 0, 320, 180))
+    ...
+    backend.run_until_idle()
+"""
+import heapq
+import itertools
+import math
+import time
+from CSAnimationBackend import AnimationBackend
+from CSGeometrySnapshot import layer_frame
+
+
+class Point(object):
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x=0.0, y=0.0):
+        self.x = x
+        self.y = y
+
+    def __getitem__(self, idx):
+        return (self.x, self.y)[idx]
+
+    def __len__(self):
+        return 2
+
+    def __eq__(self, other):
+        return isinstance(other, Point) and self.x == other.x and self.y == other.y
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "<Point x=%r y=%r>" % (self.x, self.y)
+
+
+class Size(object):
+    __slots__ = ('width', 'height')
+
+    def __init__(self, width=0.0, height=0.0):
+        self.width = width
+        self.height = height
+
+    def __getitem__(self, idx):
+        return (self.width, self.height)[idx]
+
+    def __len__(self):
+        return 2
+
+    def __eq__(self, other):
+        return isinstance(other, Size) and self.width == other.width and self.height == other.height
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "<Size width=%r height=%r>" % (self.width, self.height)
+
+
+class Rect(object):
+    __slots__ = ('origin', 'size')
+
+    def __init__(self, x=0.0, y=0.0, width=0.0, height=0.0):
+        self.origin = Point(x, y)
+        self.size = Size(width, height)
+
+    def copy(self):
+        return Rect(self.origin.x, self.origin.y, self.size.width, self.size.height)
+
+    def __eq__(self, other):
+        return isinstance(other, Rect) and self.origin == other.origin and self.size == other.size
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "<Rect x=%r y=%r width=%r height=%r>" % (self.origin.x, self.origin.y, self.size.width, self.size.height)
+
+
+class HeadlessValue(object):
+    """
+    Stand-in for NSValue boxing a point or a size
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def pointValue(self):
+        return Point(self.value[0], self.value[1])
+
+    def sizeValue(self):
+        return Size(self.value[0], self.value[1])
+
+    def __eq__(self, other):
+        return isinstance(other, HeadlessValue) and tuple(self.value) == tuple(other.value)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "<HeadlessValue %r>" % (self.value,)
+
+
+class HeadlessClock(object):
+    """
+    Manually advanced clock. Any zero-argument callable returning seconds (time.time) can be used instead; without an
+    advance() method the backend's advance() and run_until_idle() wait for the time to pass.
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+        return self.now
+
+
+def _unbox(value):
+    if isinstance(value, HeadlessValue):
+        return value.value
+    return value
+
+
+def _lerp(from_val, to_val, fract):
+    from_val = _unbox(from_val)
+    to_val = _unbox(to_val)
+    if isinstance(from_val, bool) or isinstance(to_val, bool):
+        return to_val if fract >= 1.0 else from_val
+    if isinstance(from_val, (int, float)) and isinstance(to_val, (int, float)):
+        return from_val + (to_val - from_val) * fract
+    if isinstance(from_val, Point) and isinstance(to_val, Point):
+        return Point(_lerp(from_val.x, to_val.x, fract), _lerp(from_val.y, to_val.y, fract))
+    if isinstance(from_val, Size) and isinstance(to_val, Size):
+        return Size(_lerp(from_val.width, to_val.width, fract), _lerp(from_val.height, to_val.height, fract))
+    return to_val if fract >= 1.0 else from_val
+
+
+def _components(value):
+    value = _unbox(value)
+    if isinstance(value, Point):
+        return (value.x, value.y)
+    if isinstance(value, Size):
+        return (value.width, value.height)
+    if isinstance(value, (int, float)):
+        return (value,)
+    return None
+
+
+def _paced_key_times(values):
+    """
+    Key times that give every segment of values the same speed, or None if they aren't all points/sizes/numbers
+    """
+    components = [_components(value) for value in values]
+    if None in components:
+        return None
+    lengths = [math.sqrt(sum((b - a) ** 2 for a, b in zip(start, end)))
+               for start, end in zip(components, components[1:])]
+    total = sum(lengths)
+    if total <= 0:
+        return None
+    ret = [0.0]
+    for length in lengths:
+        ret.append(ret[-1] + length / total)
+    return ret
+
+
+class HeadlessAnimation(object):
+    """
+    Stand-in for CABasicAnimation/CAKeyframeAnimation. Timing functions are recorded but values are interpolated
+    linearly. Paced keyframe animations space their keyframes by distance, like Core Animation's.
+    """
+
+    def __init__(self, keyPath, keyframes=False):
+        self._keyPath = keyPath
+        self.is_keyframe = keyframes
+        self._duration = 0.25
+        self._beginTime = 0.0
+        self._fromValue = None
+        self._toValue = None
+        self._values = None
+        self._keyTimes = None
+        self._repeatCount = 0.0
+        self._repeatDuration = 0.0
+        self._autoreverses = False
+        self._removedOnCompletion = True
+        self._fillMode = 'removed'
+        self._timingFunction = None
+        self._delegate = None
+        self._kvc = {}
+        self.calculationMode = None
+        self.rotationMode = None
+
+    def keyPath(self):
+        return self._keyPath
+
+    def duration(self):
+        return self._duration
+
+    def setDuration_(self, duration):
+        self._duration = duration
+
+    def beginTime(self):
+        return self._beginTime
+
+    def setBeginTime_(self, begin_time):
+        self._beginTime = begin_time
+
+    def fromValue(self):
+        return self._fromValue
+
+    def setFromValue_(self, value):
+        self._fromValue = value
+
+    def toValue(self):
+        return self._toValue
+
+    def setToValue_(self, value):
+        self._toValue = value
+
+    def values(self):
+        return self._values
+
+    def setValues_(self, values):
+        self._values = list(values)
+
+    def keyTimes(self):
+        return self._keyTimes
+
+    def setKeyTimes_(self, key_times):
+        self._keyTimes = list(key_times)
+
+    def repeatCount(self):
+        return self._repeatCount
+
+    def setRepeatCount_(self, count):
+        self._repeatCount = count
+
+    def repeatDuration(self):
+        return self._repeatDuration
+
+    def setRepeatDuration_(self, duration):
+        self._repeatDuration = duration
+
+    def autoreverses(self):
+        return self._autoreverses
+
+    def setAutoreverses_(self, yesno):
+        self._autoreverses = yesno
+
+    def isRemovedOnCompletion(self):
+        return self._removedOnCompletion
+
+    def setRemovedOnCompletion_(self, yesno):
+        self._removedOnCompletion = yesno
+
+    def fillMode(self):
+        return self._fillMode
+
+    def setFillMode_(self, mode):
+        self._fillMode = mode
+
+    def timingFunction(self):
+        return self._timingFunction
+
+    def setTimingFunction_(self, tfunc):
+        self._timingFunction = tfunc
+
+    def delegate(self):
+        return self._delegate
+
+    def setDelegate_(self, delegate):
+        self._delegate = delegate
+
+    def setCalculationMode_(self, mode):
+        self.calculationMode = mode
+
+    def setRotationMode_(self, mode):
+        self.rotationMode = mode
+
+    def setValue_forKeyPath_(self, value, keyPath):
+        self._kvc[keyPath] = value
+
+    def valueForKeyPath_(self, keyPath):
+        return self._kvc.get(keyPath)
+
+    def active_duration(self):
+        """
+        Total time the animation runs for, including repeats and autoreverse
+        """
+        if self._repeatDuration:
+            return self._repeatDuration
+        total = self._duration * max(self._repeatCount or 1.0, 1.0)
+        if self._autoreverses:
+            total *= 2
+        return total
+
+    def value_at(self, at_time, model_value):
+        """
+        Value this animation contributes at at_time, or None if it has no effect then
+        """
+        elapsed = at_time - self._beginTime
+        if elapsed < 0:
+            return None
+        active = self.active_duration()
+        if elapsed >= active:
+            if self._fillMode not in ('forwards', 'both'):
+                return None
+            fract = 0.0 if self._autoreverses else 1.0
+        elif self._duration <= 0:
+            fract = 1.0
+        else:
+            cycle = self._duration * (2 if self._autoreverses else 1)
+            local = math.fmod(elapsed, cycle)
+            if self._autoreverses and local > self._duration:
+                local = cycle - local
+            fract = local / self._duration
+
+        if self.is_keyframe:
+            return self._keyframe_value(fract)
+        from_val = self._fromValue if self._fromValue is not None else model_value
+        to_val = self._toValue if self._toValue is not None else model_value
+        return _lerp(from_val, to_val, fract)
+
+    def _keyframe_value(self, fract):
+        values = self._values
+        if not values:
+            return None
+        if len(values) == 1 or fract <= 0.0:
+            return values[0]
+        if fract >= 1.0:
+            return values[-1]
+        key_times = self._keyTimes
+        if self.calculationMode in ('paced', 'cubicPaced'):
+            key_times = _paced_key_times(values)
+        if not key_times or len(key_times) != len(values):
+            step = 1.0 / (len(values) - 1)
+            key_times = [step * i for i in range(len(values))]
+        for idx in range(1, len(key_times)):
+            if fract <= key_times[idx]:
+                span = key_times[idx] - key_times[idx - 1]
+                local = (fract - key_times[idx - 1]) / span if span else 1.0
+                return _lerp(values[idx - 1], values[idx], local)
+        return values[-1]
+
+
+class HeadlessDelegate(object):
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def animationDidStop_finished_(self, animation, finished):
+        cs_anim = animation.valueForKeyPath_("__CS_COMPLETION__")
+        self.queue.enqueue(cs_anim)
+
+
+_TRANSFORM_DEFAULTS = {
+    'transform.translation.x': 0.0,
+    'transform.translation.y': 0.0,
+    'transform.translation.z': 0.0,
+    'transform.rotation.x': 0.0,
+    'transform.rotation.y': 0.0,
+    'transform.rotation.z': 0.0,
+    'transform.scale.x': 1.0,
+    'transform.scale.y': 1.0,
+    'transform.scale.z': 1.0,
+}
+
+
+class HeadlessLayer(object):
+    """
+    Stand-in for CALayer. Geometry follows CALayer rules (frame is the bounding box of the bounds placed by position
+    and anchorPoint, after the transform's translation, scale and rotation); transform keypaths are stored as their
+    individual components. Setting the frame only takes the translation into account.
+    """
+
+    def __init__(self, backend, frame=None, superlayer=None):
+        self.backend = backend
+        self._position = Point()
+        self._bounds = Rect()
+        self._anchorPoint = Point(0.5, 0.5)
+        self._values = dict(_TRANSFORM_DEFAULTS)
+        self._values.update({'opacity': 1.0, 'hidden': False, 'zPosition': 0.0, 'borderWidth': 0.0, 'cornerRadius': 0.0})
+        self._animations = {}
+        self._superlayer = None
+        self._sublayers = []
+        self._sourceLayer = None
+        if frame is not None:
+            self.setFrame_(frame)
+        if superlayer is not None:
+            superlayer.addSublayer_(self)
+
+    def copy_model(self):
+        new_layer = HeadlessLayer(self.backend)
+        new_layer._position = Point(self._position.x, self._position.y)
+        new_layer._bounds = self._bounds.copy()
+        new_layer._anchorPoint = Point(self._anchorPoint.x, self._anchorPoint.y)
+        new_layer._values = dict(self._values)
+        new_layer._superlayer = self._superlayer
+        return new_layer
+
+    def superlayer(self):
+        return self._superlayer
+
+    def sublayers(self):
+        return list(self._sublayers)
+
+    def addSublayer_(self, layer):
+        layer._superlayer = self
+        self._sublayers.append(layer)
+
+    def sourceLayer(self):
+        if self._sourceLayer is None:
+            self._sourceLayer = HeadlessLayer(self.backend, Rect(0, 0, self._bounds.size.width, self._bounds.size.height), self)
+        return self._sourceLayer
+
+    def position(self):
+        return Point(self._position.x, self._position.y)
+
+    def setPosition_(self, point):
+        self._position = Point(point[0], point[1])
+
+    def bounds(self):
+        return self._bounds.copy()
+
+    def setBounds_(self, rect):
+        self._bounds = rect.copy()
+
+    def anchorPoint(self):
+        return Point(self._anchorPoint.x, self._anchorPoint.y)
+
+    def setAnchorPoint_(self, point):
+        self._anchorPoint = Point(point[0], point[1])
+
+    def frame(self):
+        values = self._values
+        frame = layer_frame(self._position, (self._bounds.size.width, self._bounds.size.height), self._anchorPoint,
+                            (values['transform.translation.x'], values['transform.translation.y']),
+                            (values['transform.scale.x'], values['transform.scale.y']),
+                            (values['transform.rotation.x'], values['transform.rotation.y'], values['transform.rotation.z']))
+        return Rect(*frame)
+
+    def setFrame_(self, rect):
+        t_x = self._values['transform.translation.x']
+        t_y = self._values['transform.translation.y']
+        self._bounds = Rect(self._bounds.origin.x, self._bounds.origin.y, rect.size.width, rect.size.height)
+        self._position = Point(rect.origin.x + rect.size.width * self._anchorPoint.x - t_x, rect.origin.y + rect.size.height * self._anchorPoint.y - t_y)
+
+    def opacity(self):
+        return self._values['opacity']
+
+    def setOpacity_(self, opacity):
+        self._values['opacity'] = opacity
+
+    def hidden(self):
+        return self._values['hidden']
+
+    def isHidden(self):
+        return self._values['hidden']
+
+    def setHidden_(self, yesno):
+        self._values['hidden'] = bool(yesno)
+
+    def valueForKeyPath_(self, keyPath):
+        if keyPath == 'position':
+            return HeadlessValue(self.position())
+        if keyPath == 'position.x':
+            return self._position.x
+        if keyPath == 'position.y':
+            return self._position.y
+        if keyPath == 'bounds':
+            return HeadlessValue(self.bounds())
+        if keyPath == 'bounds.size':
+            return HeadlessValue(Size(self._bounds.size.width, self._bounds.size.height))
+        if keyPath == 'bounds.size.width':
+            return self._bounds.size.width
+        if keyPath == 'bounds.size.height':
+            return self._bounds.size.height
+        if keyPath == 'transform.translation':
+            return HeadlessValue(Size(self._values['transform.translation.x'], self._values['transform.translation.y']))
+        if keyPath == 'transform.rotation':
+            return self._values['transform.rotation.z']
+        if keyPath == 'transform.scale':
+            return (self._values['transform.scale.x'] + self._values['transform.scale.y'] + self._values['transform.scale.z']) / 3.0
+        return self._values.get(keyPath)
+
+    def setValue_forKeyPath_(self, value, keyPath):
+        value = _unbox(value)
+        if keyPath == 'position':
+            self._position = Point(value[0], value[1])
+        elif keyPath == 'position.x':
+            self._position.x = value
+        elif keyPath == 'position.y':
+            self._position.y = value
+        elif keyPath == 'bounds':
+            self._bounds = value.copy()
+        elif keyPath == 'bounds.size':
+            self._bounds.size = Size(value[0], value[1])
+        elif keyPath == 'bounds.size.width':
+            self._bounds.size.width = value
+        elif keyPath == 'bounds.size.height':
+            self._bounds.size.height = value
+        elif keyPath == 'transform.translation':
+            self._values['transform.translation.x'] = value[0]
+            self._values['transform.translation.y'] = value[1]
+        elif keyPath == 'transform.rotation':
+            self._values['transform.rotation.z'] = value
+        elif keyPath == 'transform.scale':
+            for axis in ('x', 'y', 'z'):
+                self._values['transform.scale.' + axis] = value
+        else:
+            self._values[keyPath] = value
+
+    def convertTime_fromLayer_(self, at_time, layer):
+        return at_time
+
+    def addAnimation_forKey_(self, animation, key):
+        self._animations[key] = animation
+        self.backend.animation_added(self, animation, key)
+
+    def removeAnimationForKey_(self, key):
+        self._animations.pop(key, None)
+
+    def removeAllAnimations(self):
+        self._animations.clear()
+
+    def animationForKey_(self, key):
+        return self._animations.get(key)
+
+    def animationKeys(self):
+        return list(self._animations.keys())
+
+    def presentationLayer(self):
+        """
+        Copy of the model layer with every running or filled animation applied at the backend's current time
+        """
+        now = self.backend.current_time()
+        p_layer = self.copy_model()
+        for animation in sorted(self._animations.values(), key=lambda a: a.beginTime()):
+            key_path = animation.keyPath()
+            p_value = animation.value_at(now, self.valueForKeyPath_(key_path))
+            if p_value is not None:
+                p_layer.setValue_forKeyPath_(p_value, key_path)
+        return p_layer
+
+
+class HeadlessInput(object):
+    """
+    Stand-in for an InputSource: a layer in the layout plus its animation shadow layer
+    """
+
+    def __init__(self, backend, superlayer, frame, uuid=None):
+        self._layer = backend.make_layer(frame, superlayer)
+        self._animationLayer = backend.make_layer(frame)
+        self._animationLayer._superlayer = superlayer
+        self._transitionDuration = 0.0
+        self._uuid = uuid
+        self.multi_changes = 0
+
+    def layer(self):
+        return self._layer
+
+    def animationLayer(self):
+        return self._animationLayer
+
+    def uuid(self):
+        return self._uuid
+
+    def transitionDuration(self):
+        return self._transitionDuration
+
+    def setTransitionDuration_(self, duration):
+        old_duration = self._transitionDuration
+        self._transitionDuration = duration
+        return old_duration
+
+    def multiChangeForce(self):
+        self.multi_changes += 1
+
+
+class HeadlessBackend(AnimationBackend):
+    """
+    In-memory backend. Completion callbacks fire from advance()/run_until_idle() in end time order.
+    """
+
+    def __init__(self, clock=None):
+        if clock is None:
+            clock = HeadlessClock()
+        self.clock = clock
+        self.transaction_depth = 0
+        self.transaction_count = 0
+        self.messages = []
+        self._pending = []
+        self._seq = itertools.count()
+        self._soon = []
+        self._later = []
+        self._delegate = HeadlessDelegate(self.completion_queue())
+
+    def current_time(self):
+        return self.clock()
+
+    def begin_transaction(self):
+        self.transaction_depth += 1
+
+    def commit_transaction(self):
+        self.transaction_depth -= 1
+        self.transaction_count += 1
+
+    def set_disable_actions(self, yesno):
+        pass
+
+    def basic_animation(self, keyPath):
+        return HeadlessAnimation(keyPath)
+
+    def keyframe_animation(self, keyPath):
+        return HeadlessAnimation(keyPath, keyframes=True)
+
+    def timing_function(self, name):
+        return name
+
+    def timing_function_with_points(self, x1, y1, x2, y2):
+        return (x1, y1, x2, y2)
+
+    def animation_delegate(self):
+        return self._delegate
+
+    def call_soon(self, func):
+        self._soon.append(func)
+
+    def run_soon(self):
+        """
+        Run everything queued with call_soon(), the headless equivalent of the main run loop's next pass
+        """
+        while self._soon:
+            soon = self._soon
+            self._soon = []
+            for func in soon:
+                func()
+
+    def call_later(self, delay, func):
+        heapq.heappush(self._later, (self.current_time() + delay, next(self._seq), func))
+
+    def run_later(self):
+        """
+        Run the call_later() functions that are due by the current time
+        """
+        now = self.current_time()
+        while self._later and self._later[0][0] <= now:
+            heapq.heappop(self._later)[2]()
+
+    def make_point(self, x, y):
+        return Point(x, y)
+
+    def make_size(self, width, height):
+        return Size(width, height)
+
+    def point_value(self, point):
+        return HeadlessValue(Point(point[0], point[1]))
+
+    def size_value(self, size):
+        return HeadlessValue(Size(size[0], size[1]))
+
+    def point_values(self, xs, ys):
+        return [HeadlessValue(Point(x, y)) for x, y in zip(xs, ys)]
+
+    def size_values(self, widths, heights):
+        return [HeadlessValue(Size(width, height)) for width, height in zip(widths, heights)]
+
+    def log(self, message):
+        self.messages.append(message)
+
+    def make_layer(self, frame=None, superlayer=None):
+        return HeadlessLayer(self, frame, superlayer)
+
+    def animation_added(self, layer, animation, key):
+        if animation.delegate() is None and not animation.isRemovedOnCompletion():
+            return
+        end_time = animation.beginTime() + animation.active_duration()
+        heapq.heappush(self._pending, (end_time, next(self._seq), layer, key, animation))
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def fire_completions(self):
+        """
+        Deliver animationDidStop_finished_ for every animation that has ended by the current time, then run the
+        call_later() functions that are due and the call_soon() queue like the end of a display frame would. Returns
+        the number of completions delivered.
+        """
+        now = self.current_time()
+        fired = 0
+        while self._pending and self._pending[0][0] <= now:
+            end_time, _, layer, key, animation = heapq.heappop(self._pending)
+            if layer.animationForKey_(key) is not animation:
+                continue
+            if animation.isRemovedOnCompletion():
+                layer.removeAnimationForKey_(key)
+            delegate = animation.delegate()
+            if delegate is not None:
+                delegate.animationDidStop_finished_(animation, True)
+            fired += 1
+        self.run_later()
+        self.run_soon()
+        return fired
+
+    def advance(self, seconds):
+        """
+        Move the clock forward by seconds, or wait that long if it can't be moved, and deliver any completions that
+        became due
+        """
+        self._advance_clock(seconds)
+        return self.fire_completions()
+
+    def _advance_clock(self, seconds):
+        if hasattr(self.clock, 'advance'):
+            self.clock.advance(seconds)
+        else:
+            time.sleep(seconds)
+
+    def run_until_idle(self, step=None):
+        """
+        Advance the clock until every pending animation has completed and every call_later() function ran. With step
+        set the clock moves in increments of step (e.g. 1/60.0 to simulate display frames) instead of jumping straight
+        to each end time.
+        """
+        fired = 0
+        while self._pending or self._later:
+            if step:
+                fired += self.advance(step)
+            else:
+                next_end = min([queue[0][0] for queue in (self._pending, self._later) if queue])
+                now = self.current_time()
+                if next_end > now:
+                    self._advance_clock(next_end - now)
+                fired += self.fire_completions()
+        return fired
@@ -0,0 +1,158 @@
+"""
+Run animation scripts against the headless backend.
+
+    python CSHeadlessRunner.py ../AnimationSamples/movement.py --input source1=0,0,320,180 --input source2=600,300,320,180
+
+Every run builds a fresh in-memory layout, runs the script's do_animation(), commits the block and then advances the
+clock until every animation has completed. Nothing waits on wall clock time.
+"""
+import os
+import sys
+import time
+import argparse
+from pluginbase import PluginBase
+import CSAnimationBlock
+import CSAnimationBackend
+import CSAnimationRun
+from CSAnimationInput import CSAnimationInput
+from CSHeadlessBackend import HeadlessBackend, HeadlessInput, Rect
+
+
+plugin_base = PluginBase(package='headlessanimations')
+
+
+class HeadlessRunner(object):
+    """
+    A layout of headless inputs on a root layer. Installs its backend as the active backend when created.
+    """
+
+    def __init__(self, width=1280, height=720, clock=None, backend=None, timeline_cache=None):
+        if backend is None:
+            backend = HeadlessBackend(clock)
+        self.backend = backend
+        CSAnimationBackend.set_backend(backend)
+        self.rootLayer = backend.make_layer(Rect(0, 0, width, height))
+        self.inputs = {}
+        self.plugin_sources = {}
+        self.timeline_cache = timeline_cache
+
+    def add_input(self, name, x, y, width, height):
+        new_input = HeadlessInput(self.backend, self.rootLayer, Rect(x, y, width, height), uuid=name)
+        self.inputs[name] = new_input
+        return new_input
+
+    def load_script(self, path):
+        """
+        Load an animation script from a file path via pluginbase, the same way the app loads them
+        """
+        path = os.path.abspath(path)
+        search_dir = os.path.dirname(path)
+        source = self.plugin_sources.get(search_dir)
+        if source is None:
+            source = plugin_base.make_plugin_source(searchpath=[search_dir])
+            self.plugin_sources[search_dir] = source
+        return source.load_plugin(os.path.splitext(os.path.basename(path))[0])
+
+    def make_input_arg(self, animation, params=None, duration=None):
+        input_arg = {}
+        for input_name in getattr(animation, 'animation_inputs', []):
+            input_arg[input_name] = None
+        for input_name, h_input in self.inputs.items():
+            input_arg[input_name] = CSAnimationInput(h_input)
+        if params:
+            input_arg.update(params)
+        if duration is not None:
+            input_arg['duration'] = duration
+        return input_arg
+
+    def run(self, animation, params=None, duration=None, run_until_idle=True, step=None, stream=False,
+            frame_budget=None):
+        """
+        Run a loaded animation module against this layout. Unassigned script inputs are passed as None, like the app does.
+        Returns the committed AnimationBlock, or the replayed Timeline if the run was served from the timeline cache.
+        """
+        input_arg = self.make_input_arg(animation, params, duration)
+        cache_key = None
+        if self.timeline_cache is not None:
+            cache_key = self.timeline_cache.make_key(animation, input_arg, self.rootLayer)
+            timeline = self.timeline_cache.get(cache_key)
+            if timeline is not None:
+                timeline.apply(input_arg, self.rootLayer)
+                if run_until_idle:
+                    self.backend.run_until_idle(step)
+                return timeline
+
+        block = CSAnimationBlock.run_animation(animation, input_arg, duration, self.rootLayer, stream=stream,
+                                               frame_budget=frame_budget)
+        if self.timeline_cache is not None:
+            self.timeline_cache.store(cache_key, block, input_arg, animation)
+        if run_until_idle:
+            self.backend.run_until_idle(step)
+        return block
+
+
+    def run_async(self, animation, params=None, duration=None, timeout=None, stream=False, frame_budget=None):
+        """
+        Run the script on a worker thread like the app's async mode. This thread stands in for the main thread: it
+        runs the backend's call_soon() queue until the run is committed. Returns the AnimationRun; the timeline cache
+        isn't used.
+        """
+        input_arg = self.make_input_arg(animation, params, duration)
+        run = CSAnimationRun.run_animation_async(animation, input_arg, duration, self.rootLayer, stream,
+                                                 frame_budget)
+        deadline = None if timeout is None else time.time() + timeout
+        while not run.done():
+            if deadline is not None and time.time() > deadline:
+                break
+            self.backend.run_soon()
+            time.sleep(0.001)
+        return run
+
+
+def _parse_input(spec):
+    name, _, geometry = spec.partition('=')
+    values = [float(v) for v in geometry.split(',')]
+    if len(values) != 4:
+        raise argparse.ArgumentTypeError("inputs are name=x,y,width,height")
+    return name, values
+
+
+def _parse_param(spec):
+    name, _, value = spec.partition('=')
+    return name, value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a CocoaSplit animation script without Core Animation")
+    parser.add_argument('script')
+    parser.add_argument('--input', action='append', type=_parse_input, default=[], help="name=x,y,width,height")
+    parser.add_argument('--param', action='append', type=_parse_param, default=[], help="name=value")
+    parser.add_argument('--duration', type=float, default=None)
+    parser.add_argument('--canvas', default='1280x720', help="layout size, WIDTHxHEIGHT")
+    parser.add_argument('--iterations', type=int, default=1, help="run the script this many times")
+    args = parser.parse_args(argv)
+
+    width, height = [float(v) for v in args.canvas.split('x')]
+    params = dict(args.param)
+    total_animations = 0
+    media_time = 0.0
+    start = time.time()
+    for _ in range(args.iterations):
+        runner = HeadlessRunner(width, height)
+        for name, geometry in args.input:
+            runner.add_input(name, *geometry)
+        animation = runner.load_script(args.script)
+        block = runner.run(animation, params, args.duration)
+        total_animations += len(block.animations)
+        media_time += runner.backend.current_time()
+    elapsed = time.time() - start
+
+    print("%d run(s), %d animations, %.3fs of animation time in %.3fs wall time" % (args.iterations, total_animations, media_time, elapsed))
+    for name, h_input in sorted(runner.inputs.items()):
+        frame = h_input.layer().frame()
+        print("%s: origin=(%.2f, %.2f) size=(%.2f, %.2f)" % (name, frame.origin.x, frame.origin.y, frame.size.width, frame.size.height))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+Layout transitions computed from geometry.
+
+A LayoutSnapshot is the geometry of a layout's inputs (position, size, opacity and rotation) as one row per input,
+keyed by input UUID. LayoutDiff lines up two snapshots by UUID and keeps only what differs: inputs that are in both and
+changed, and for each of them only the properties that changed. animate() turns that into animations in the current
+block, so a whole layout switch is one AnimationBlock, optionally staggered input by input.
+
+The comparison runs on whole arrays when numpy is available, which keeps diffing layouts with hundreds of inputs well
+under a millisecond; without numpy it compares row by row.
+"""
+from CSAnimationBackend import get_backend
+from CSAnimationInput import CSAnimationInput
+from CSGeometrySnapshot import GeometrySnapshot
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+COLUMNS = ('x', 'y', 'width', 'height', 'opacity', 'rotation')
+
+#property name, first column, end column
+PROPERTIES = (('position', 0, 2), ('size', 2, 4), ('opacity', 4, 5), ('rotation', 5, 6))
+
+#differences up to these don't count as a change: points for geometry, plain values for opacity and rotation (radians)
+POINT_TOLERANCE = 0.01
+VALUE_TOLERANCE = 1e-4
+
+
+def _geometry_row(geometry):
+    position = geometry.position_point()
+    bounds = geometry.bounds_rect()
+    return [position[0], position[1], bounds[2], bounds[3], geometry.value('opacity') or 0.0,
+            geometry.value('transform.rotation.z') or 0.0]
+
+
+class LayoutSnapshot(object):
+    """
+    Geometry of inputs: rows[i] is (x, y, width, height, opacity, rotation) of the input with UUID uuids[i], x and y
+    being the layer position.
+    """
+
+    def __init__(self, uuids, rows):
+        self.uuids = list(uuids)
+        self.index = dict((uuid, row) for row, uuid in enumerate(self.uuids))
+        if np is not None:
+            self.rows = np.array(rows, dtype=float).reshape(len(self.uuids), len(COLUMNS))
+        else:
+            self.rows = [[float(value) for value in row] for row in rows]
+
+    @classmethod
+    def from_inputs(cls, inputs):
+        """
+        Snapshot of CSAnimationInputs or InputSources, or a dict of them by UUID. CSAnimationInputs include what
+        animations already added to the script wrote.
+        """
+        if not isinstance(inputs, dict):
+            inputs = dict((_input_uuid(cs_input), cs_input) for cs_input in inputs)
+        uuids = []
+        rows = []
+        for uuid, cs_input in inputs.items():
+            if cs_input is None:
+                continue
+            if isinstance(cs_input, CSAnimationInput):
+                geometry = cs_input.geometry
+            else:
+                geometry = GeometrySnapshot(cs_input.layer())
+            uuids.append(uuid)
+            rows.append(_geometry_row(geometry))
+        return cls(uuids, rows)
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Snapshot from {uuid: {'position': [x, y], 'size': [width, height], 'opacity': 1.0, 'rotation': 0.0}}.
+        opacity and rotation are optional.
+        """
+        uuids = []
+        rows = []
+        for uuid, geometry in data.items():
+            uuids.append(uuid)
+            rows.append(list(geometry['position']) + list(geometry['size']) +
+                        [geometry.get('opacity', 1.0), geometry.get('rotation', 0.0)])
+        return cls(uuids, rows)
+
+    def to_dict(self):
+        ret = {}
+        for uuid, row in zip(self.uuids, self.rows):
+            row = [float(value) for value in row]
+            ret[uuid] = {'position': row[0:2], 'size': row[2:4], 'opacity': row[4], 'rotation': row[5]}
+        return ret
+
+
+def _input_uuid(cs_input):
+    if isinstance(cs_input, CSAnimationInput):
+        cs_input = cs_input.input
+    return cs_input.uuid()
+
+
+class LayoutDiff(object):
+    """
+    What changes going from current to target. uuids are the changed inputs in target's order, with their current and
+    target rows and changed[i][p] telling whether PROPERTIES[p] changed. Inputs that are only in one of the snapshots
+    are ignored.
+    """
+
+    def __init__(self, current, target, point_tolerance=POINT_TOLERANCE, value_tolerance=VALUE_TOLERANCE):
+        common = [uuid for uuid in target.uuids if uuid in current.index]
+        tolerances = [point_tolerance] * 4 + [value_tolerance] * 2
+        current_idx = [current.index[uuid] for uuid in common]
+        target_idx = [target.index[uuid] for uuid in common]
+        if np is not None:
+            from_rows = current.rows[current_idx]
+            to_rows = target.rows[target_idx]
+            over = np.abs(to_rows - from_rows) > np.array(tolerances)
+            changed = np.column_stack([over[:, start:end].any(axis=1) for name, start, end in PROPERTIES])
+            keep = changed.any(axis=1)
+            self.uuids = [uuid for uuid, kept in zip(common, keep) if kept]
+            self.from_rows = from_rows[keep].tolist()
+            self.to_rows = to_rows[keep].tolist()
+            self.changed = changed[keep].tolist()
+        else:
+            self.uuids = []
+            self.from_rows = []
+            self.to_rows = []
+            self.changed = []
+            for uuid, c_idx, t_idx in zip(common, current_idx, target_idx):
+                from_row = current.rows[c_idx]
+                to_row = target.rows[t_idx]
+                over = [abs(b - a) > tolerance for a, b, tolerance in zip(from_row, to_row, tolerances)]
+                changed = [any(over[start:end]) for name, start, end in PROPERTIES]
+                if any(changed):
+                    self.uuids.append(uuid)
+                    self.from_rows.append(from_row)
+                    self.to_rows.append(to_row)
+                    self.changed.append(changed)
+        self.unchanged = len(common) - len(self.uuids)
+
+    def __len__(self):
+        return len(self.uuids)
+
+    def deltas(self):
+        """
+        [(uuid, {property: (from, to)})] for the changed properties, values as tuples
+        """
+        ret = []
+        for uuid, from_row, to_row, changed in zip(self.uuids, self.from_rows, self.to_rows, self.changed):
+            props = {}
+            for (name, start, end), prop_changed in zip(PROPERTIES, changed):
+                if prop_changed:
+                    props[name] = (tuple(from_row[start:end]), tuple(to_row[start:end]))
+            ret.append((uuid, props))
+        return ret
+
+    def animate(self, inputs, duration=None, stagger=0.0, **kwargs):
+        """
+        Add the animations to the current block. inputs maps UUIDs to CSAnimationInputs. With stagger, each changed
+        input starts stagger seconds after the one before it. Other keyword arguments (timing=...) go to every
+        animation. Returns the number of inputs animated.
+        """
+        backend = get_backend()
+        animated = 0
+        for uuid, to_row, changed in zip(self.uuids, self.to_rows, self.changed):
+            cs_input = inputs.get(uuid)
+            if cs_input is None:
+                continue
+            if stagger and animated:
+                cs_input.wait(stagger * animated)
+            position_changed, size_changed, opacity_changed, rotation_changed = changed
+            if position_changed:
+                point = backend.point_value(backend.make_point(to_row[0], to_row[1]))
+                cs_input.simple_animation('position', point, duration, **kwargs)
+            if size_changed:
+                #what sizeWidth()/sizeHeight() do, without their anchor moves
+                m_bounds = cs_input.geometry.bounds_rect()
+                cs_input.simple_animation('fakeWidth', to_row[2], duration, use_fromVal=m_bounds[2],
+                                          extra_keypath='bounds.size.width', **kwargs)
+                cs_input.simple_animation('fakeHeight', to_row[3], duration, use_fromVal=m_bounds[3],
+                                          extra_keypath='bounds.size.height', **kwargs)
+            if opacity_changed:
+                cs_input.simple_animation('opacity', to_row[4], duration, **kwargs)
+            if rotation_changed:
+                cs_input.simple_animation('transform.rotation.z', to_row[5], duration, **kwargs)
+            animated += 1
+        return animated
+
+
+class LayoutTransition(object):
+    """
+    Stands in for an animation plugin module, so a LayoutDiff runs through CSAnimationBlock.run_animation() (or
+    run_animation_async()) like a script: the input dict maps UUIDs to CSAnimationInputs.
+    """
+
+    def __init__(self, diff, stagger=0.0, **kwargs):
+        self.diff = diff
+        self.stagger = stagger
+        self.kwargs = kwargs
+        self.animated = 0
+
+    def do_animation(self, inputs, duration):
+        self.animated = self.diff.animate(inputs, duration, self.stagger, **self.kwargs)
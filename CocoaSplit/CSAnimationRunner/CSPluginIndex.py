@@ -0,0 +1,171 @@
+"""
+On-disk index of animation plugin metadata.
+
+The animation picker only needs animation_name, animation_inputs, animation_params and animation_description from
+each plugin. PluginIndex reads them by parsing the module's top level assignments with ast instead of importing it,
+so no plugin code runs. Results are saved to a JSON file keyed by path; a file is only re-read if its mtime or size
+changed, and only re-parsed if its content hash changed too.
+
+Only literal values (strings, numbers, lists, dicts...) can be read this way. A plugin that computes its
+animation_name isn't listed; the other keys fall back to their defaults.
+"""
+import os
+import ast
+import json
+import hashlib
+from collections import OrderedDict
+
+
+METADATA_KEYS = ('animation_name', 'animation_inputs', 'animation_params', 'animation_description')
+
+INDEX_VERSION = 1
+
+
+def parse_metadata(source, keys=METADATA_KEYS):
+    """
+    Return a dict of the literal values assigned to keys at module level in source
+    """
+    ret = {}
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError, TypeError):
+        return ret
+    for node in tree.body:
+        if not isinstance(node, ast.Assign):
+            continue
+        names = [t.id for t in node.targets if isinstance(t, ast.Name) and t.id in keys]
+        if not names:
+            continue
+        try:
+            value = ast.literal_eval(node.value)
+        except (ValueError, TypeError, SyntaxError):
+            #not a literal, or one that can't be built (e.g. a dict with a list key). A later literal assignment can
+            #still set it
+            for name in names:
+                ret.pop(name, None)
+            continue
+        for name in names:
+            ret[name] = value
+    return ret
+
+
+class PluginIndex(object):
+    """
+    Metadata for every plugin module in search_paths. Earlier search paths win when two contain the same module name,
+    like pluginbase.
+    """
+
+    def __init__(self, search_paths, index_path=None):
+        self.search_paths = list(search_paths)
+        self.index_path = index_path
+        self.entries = {}
+        self.stats_checked = 0
+        self.hashed = 0
+        self.parsed = 0
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        if not self.index_path:
+            return
+        try:
+            with open(self.index_path, 'r') as index_file:
+                data = json.load(index_file)
+        except (IOError, OSError, ValueError):
+            return
+        if data.get('version') != INDEX_VERSION:
+            return
+        self.entries = data.get('plugins', {})
+
+    def save(self):
+        """
+        Write the index if anything changed since it was loaded. Failure to write only costs a re-parse next launch.
+        """
+        if not self.index_path or not self._dirty:
+            return
+        tmp_path = self.index_path + '.tmp'
+        try:
+            index_dir = os.path.dirname(self.index_path)
+            if index_dir and not os.path.isdir(index_dir):
+                os.makedirs(index_dir)
+            with open(tmp_path, 'w') as index_file:
+                json.dump({'version': INDEX_VERSION, 'plugins': self.entries}, index_file)
+            os.rename(tmp_path, self.index_path)
+        except (IOError, OSError):
+            return
+        self._dirty = False
+
+    def plugin_files(self):
+        """
+        OrderedDict of module name -> source file, for every plugin module in the search paths
+        """
+        ret = OrderedDict()
+        for search_dir in self.search_paths:
+            try:
+                dir_names = sorted(os.listdir(search_dir))
+            except OSError:
+                continue
+            for file_name in dir_names:
+                full_path = os.path.join(search_dir, file_name)
+                if file_name.endswith('.py'):
+                    m_name = file_name[:-3]
+                elif os.path.isfile(os.path.join(full_path, '__init__.py')):
+                    m_name = file_name
+                    full_path = os.path.join(full_path, '__init__.py')
+                else:
+                    continue
+                if m_name == '__init__' or m_name in ret:
+                    continue
+                ret[m_name] = full_path
+        return ret
+
+    def entry_for(self, path):
+        """
+        Index entry for path, re-reading the file only if it changed on disk. Returns None if it can't be read.
+        """
+        try:
+            f_stat = os.stat(path)
+        except OSError:
+            return None
+        self.stats_checked += 1
+        entry = self.entries.get(path)
+        if entry and entry['mtime'] == f_stat.st_mtime and entry['size'] == f_stat.st_size:
+            return entry
+
+        try:
+            with open(path, 'rb') as src:
+                source = src.read()
+        except (IOError, OSError):
+            return None
+        self.hashed += 1
+        content_hash = hashlib.sha1(source).hexdigest()
+        if not entry or entry['hash'] != content_hash:
+            self.parsed += 1
+            entry = {'hash': content_hash, 'metadata': parse_metadata(source)}
+        entry['mtime'] = f_stat.st_mtime
+        entry['size'] = f_stat.st_size
+        self.entries[path] = entry
+        self._dirty = True
+        return entry
+
+    def refresh(self):
+        """
+        Bring the index up to date with the search paths and save it. Returns OrderedDict of module name -> metadata.
+        """
+        ret = OrderedDict()
+        seen = set()
+        for m_name, path in self.plugin_files().items():
+            entry = self.entry_for(path)
+            if entry is None:
+                continue
+            seen.add(path)
+            ret[m_name] = entry['metadata']
+        for stale_path in [p for p in self.entries if p not in seen]:
+            del self.entries[stale_path]
+            self._dirty = True
+        self.save()
+        return ret
+
+    def stats(self):
+        return {'entries': len(self.entries), 'stats_checked': self.stats_checked, 'hashed': self.hashed,
+                'parsed': self.parsed}
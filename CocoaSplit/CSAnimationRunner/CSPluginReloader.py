@@ -0,0 +1,191 @@
+"""
+Reload plugin modules only when their source changed.
+
+PluginReloader wraps a pluginbase PluginSource. get(name) returns the loaded module, reloading it only if the file's
+mtime/size changed AND its content hash differs from what was last loaded; touching a file without editing it costs
+a hash, not a recompile.
+
+With a PluginWatcher (FSEvents, macOS only) a module that was checked once isn't even stat()ed again until the
+watcher reports a change in its directory.
+"""
+import os
+import sys
+import hashlib
+import threading
+
+try:
+    reload
+except NameError:
+    from importlib import reload
+
+try:
+    import FSEvents
+    from CoreFoundation import CFRunLoopGetMain, kCFRunLoopDefaultMode
+except ImportError:
+    FSEvents = None
+
+
+def _source_file(module):
+    m_file = module.__file__
+    if m_file.endswith(('.pyc', '.pyo')):
+        m_file = m_file[:-1]
+    return m_file
+
+
+def _file_hash(path):
+    with open(path, 'rb') as src:
+        return hashlib.sha1(src.read()).hexdigest()
+
+
+class PluginWatcher(object):
+    """
+    Collects the directories FSEvents reports as changed. Events are delivered on the main run loop.
+    """
+
+    def __init__(self, paths, latency=0.5):
+        self.paths = [p for p in paths if os.path.isdir(p)]
+        self._lock = threading.Lock()
+        self._changed = set()
+        self._stream = None
+        if FSEvents is None or not self.paths:
+            return
+        self._stream = FSEvents.FSEventStreamCreate(None, self._events, None, self.paths,
+                                                    FSEvents.kFSEventStreamEventIdSinceNow, latency,
+                                                    FSEvents.kFSEventStreamCreateFlagNone)
+        FSEvents.FSEventStreamScheduleWithRunLoop(self._stream, CFRunLoopGetMain(), kCFRunLoopDefaultMode)
+        FSEvents.FSEventStreamStart(self._stream)
+
+    @classmethod
+    def available(cls):
+        return FSEvents is not None
+
+    @property
+    def active(self):
+        return self._stream is not None
+
+    def _events(self, stream, info, count, paths, flags, event_ids):
+        with self._lock:
+            for path in paths:
+                self._changed.add(os.path.realpath(path.rstrip('/')))
+
+    def consume_changes(self):
+        """
+        Set of directories that changed since the last call
+        """
+        with self._lock:
+            changed = self._changed
+            self._changed = set()
+        return changed
+
+    def stop(self):
+        if self._stream is not None:
+            FSEvents.FSEventStreamStop(self._stream)
+            FSEvents.FSEventStreamInvalidate(self._stream)
+            FSEvents.FSEventStreamRelease(self._stream)
+            self._stream = None
+
+
+class PluginReloader(object):
+
+    def __init__(self, plugin_source, watcher=None):
+        self.plugin_source = plugin_source
+        self.watcher = watcher
+        self._lock = threading.RLock()
+        self._state = {}
+        self._trusted = set()
+        self.loads = 0
+        self.reloads = 0
+        self.hits = 0
+        self.stat_checks = 0
+        self.hash_checks = 0
+
+    def _module_name(self, name):
+        return self.plugin_source.mod.__name__ + '.' + name
+
+    def _apply_watcher_changes(self):
+        if self.watcher is None or not self.watcher.active:
+            return
+        for changed_dir in self.watcher.consume_changes():
+            for name in list(self._trusted):
+                if os.path.dirname(os.path.realpath(self._state[name][0])) == changed_dir:
+                    self._trusted.discard(name)
+
+    def get(self, name):
+        """
+        Return the plugin module name, (re)loaded if its source changed since the last call
+        """
+        with self._lock:
+            self._apply_watcher_changes()
+            fresh_import = self._module_name(name) not in sys.modules
+            plugin = self.plugin_source.load_plugin(name)
+            if fresh_import:
+                self.loads += 1
+                self._remember(name, plugin)
+                return plugin
+
+            if name in self._trusted:
+                self.hits += 1
+                return plugin
+
+            state = self._state.get(name)
+            path = _source_file(plugin)
+            self.stat_checks += 1
+            f_stat = os.stat(path)
+            if state and state[0] == path and state[1] == f_stat.st_mtime and state[2] == f_stat.st_size:
+                self.hits += 1
+                self._trust(name)
+                return plugin
+
+            self.hash_checks += 1
+            content_hash = _file_hash(path)
+            if state and state[3] == content_hash:
+                self.hits += 1
+                self._state[name] = (path, f_stat.st_mtime, f_stat.st_size, content_hash)
+                self._trust(name)
+                return plugin
+
+            #plugins may import their siblings, which only resolves inside the source's with block
+            with self.plugin_source:
+                reload(plugin)
+            self.reloads += 1
+            self._remember(name, plugin)
+            return plugin
+
+    def _remember(self, name, plugin):
+        path = _source_file(plugin)
+        f_stat = os.stat(path)
+        self._state[name] = (path, f_stat.st_mtime, f_stat.st_size, _file_hash(path))
+        self._trust(name)
+
+    def _trust(self, name):
+        if self.watcher is not None and self.watcher.active:
+            self._trusted.add(name)
+
+    def content_hash(self, name):
+        """
+        Hash of the source the currently loaded version of name was built from, or None if it wasn't loaded through get()
+        """
+        state = self._state.get(name)
+        if state:
+            return state[3]
+        return None
+
+    def forget(self, name=None):
+        """
+        Forget what is known about name (or everything), forcing a check on the next get()
+        """
+        with self._lock:
+            if name is None:
+                self._state.clear()
+                self._trusted.clear()
+            else:
+                self._state.pop(name, None)
+                self._trusted.discard(name)
+
+    def stats(self):
+        ret = {'loads': self.loads, 'reloads': self.reloads, 'hits': self.hits, 'stat_checks': self.stat_checks,
+               'hash_checks': self.hash_checks, 'watching': bool(self.watcher is not None and self.watcher.active)}
+        bytecode_cache = getattr(self.plugin_source, 'bytecode_cache', None)
+        if bytecode_cache is not None:
+            ret['bytecode'] = bytecode_cache.stats()
+        return ret
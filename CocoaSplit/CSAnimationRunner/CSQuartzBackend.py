@@ -0,0 +1,95 @@
+"""
+Core Animation backend. This is what the app uses; it is installed automatically by CSAnimationBackend.get_backend()
+"""
+import objc
+from Foundation import NSObject, NSLog, NSPoint, NSSize, NSValue
+from Quartz import CACurrentMediaTime, CATransaction, CABasicAnimation, CAKeyframeAnimation, CAMediaTimingFunction, CGPathRef
+from CSAnimationBackend import AnimationBackend
+
+
+class CSAnimationDelegate(NSObject):
+
+    def initWithQueue_(self, queue):
+        self = super(CSAnimationDelegate, self).init()
+        if self is None:
+            return None
+        self.queue = queue
+        return self
+
+    @objc.signature('v@:@c')
+    def animationDidStop_finished_(self, animation, finished):
+        cs_anim = animation.valueForKeyPath_("__CS_COMPLETION__")
+        self.queue.enqueue(cs_anim)
+
+    def callFunction_(self, func):
+        func()
+
+
+class QuartzBackend(AnimationBackend):
+
+    def __init__(self):
+        self._delegate = CSAnimationDelegate.alloc().initWithQueue_(self.completion_queue())
+
+    def current_time(self):
+        return CACurrentMediaTime()
+
+    def begin_transaction(self):
+        CATransaction.begin()
+
+    def commit_transaction(self):
+        CATransaction.commit()
+
+    def set_disable_actions(self, yesno):
+        CATransaction.setDisableActions_(yesno)
+
+    def basic_animation(self, keyPath):
+        return CABasicAnimation.animationWithKeyPath_(keyPath)
+
+    def keyframe_animation(self, keyPath):
+        return CAKeyframeAnimation.animationWithKeyPath_(keyPath)
+
+    def timing_function(self, name):
+        return CAMediaTimingFunction.functionWithName_(name)
+
+    def timing_function_with_points(self, x1, y1, x2, y2):
+        return CAMediaTimingFunction.functionWithControlPoints____(x1, y1, x2, y2)
+
+    def animation_delegate(self):
+        return self._delegate
+
+    def call_soon(self, func):
+        self._delegate.performSelectorOnMainThread_withObject_waitUntilDone_('callFunction:', func, False)
+
+    def call_later(self, delay, func):
+        #only called on the main thread; the run loop timer fires there
+        self._delegate.performSelector_withObject_afterDelay_('callFunction:', func, delay)
+
+    def worker_context(self):
+        return objc.autorelease_pool()
+
+    def make_point(self, x, y):
+        return NSPoint(x, y)
+
+    def make_size(self, width, height):
+        return NSSize(width, height)
+
+    def point_value(self, point):
+        return NSValue.valueWithPoint_(point)
+
+    def size_value(self, size):
+        return NSValue.valueWithSize_(size)
+
+    def point_values(self, xs, ys):
+        #NSPoint arguments take plain tuples, no NSPoint per keyframe
+        with_point = NSValue.valueWithPoint_
+        return [with_point((x, y)) for x, y in zip(xs, ys)]
+
+    def size_values(self, widths, heights):
+        with_size = NSValue.valueWithSize_
+        return [with_size((width, height)) for width, height in zip(widths, heights)]
+
+    def is_path(self, value):
+        return type(value) is CGPathRef
+
+    def log(self, message):
+        NSLog("%@", message)
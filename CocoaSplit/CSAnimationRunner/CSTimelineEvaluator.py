@@ -0,0 +1,239 @@
+"""
+Offline evaluation of committed animation timelines.
+
+TimelineEvaluator computes the value of every (input, keypath) track at arbitrary times without Core Animation.
+All samples for a track are computed at once with NumPy, so sampling 60fps for 30 seconds is a handful of array
+operations per animation rather than a Python loop per frame.
+
+    evaluator = TimelineEvaluator.from_block(block, input_arg)
+    times, tracks = evaluator.sample(fps=60.0)
+    tracks[('source1', 'position')]   # (N, 2) array of x,y positions
+
+Keyframe animations are evaluated with paced timing (what CSAnimationInput creates) unless the entry carries its
+own keyTimes. Named timing functions and CAMediaTimingFunction control points are honored.
+
+The evaluator needs NumPy. Without it the module still imports, TimelineEvaluator.available() is False and creating
+one raises ImportError.
+"""
+import numbers
+from CSAnimationTimeline import Timeline
+from CSAnimationTiming import NAMED_CONTROL_POINTS, SIZE_KEYPATHS, cubic_bezier_ease
+
+try:
+    import numpy as np
+except ImportError:
+    #TimelineEvaluator.available() is False
+    np = None
+
+
+_DISCRETE_KEYPATHS = ('hidden',)
+
+
+def value_components(value, keyPath=None):
+    """
+    Flatten an animation value (number, bool, NSValue, point or size) into a tuple of floats
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return (1.0 if value else 0.0,)
+    if isinstance(value, numbers.Number):
+        return (float(value),)
+    if hasattr(value, 'pointValue') and hasattr(value, 'sizeValue'):
+        if keyPath in SIZE_KEYPATHS:
+            value = value.sizeValue()
+        else:
+            value = value.pointValue()
+    if hasattr(value, 'x') and hasattr(value, 'y'):
+        return (float(value.x), float(value.y))
+    if hasattr(value, 'width') and hasattr(value, 'height'):
+        return (float(value.width), float(value.height))
+    return tuple(float(v) for v in value)
+
+
+def timing_control_points(timing_function):
+    """
+    (x1, y1, x2, y2) cubic bezier control points for a timing function, or None for linear timing
+    """
+    if timing_function is None:
+        return None
+    if isinstance(timing_function, (type(''), type(u''))):
+        return NAMED_CONTROL_POINTS.get(timing_function)
+    try:
+        p1 = timing_function.getControlPointAtIndex_values_(1, None)
+        p2 = timing_function.getControlPointAtIndex_values_(2, None)
+    except (AttributeError, TypeError):
+        return None
+    if tuple(p1) == (0.0, 0.0) and tuple(p2) == (1.0, 1.0):
+        return None
+    return (p1[0], p1[1], p2[0], p2[1])
+
+
+class _CompiledEntry(object):
+
+    def __init__(self, entry, from_components):
+        self.begin = entry.begin
+        self.duration = max(entry.duration, 1e-9)
+        self.autoreverses = bool(entry.autoreverses)
+        if entry.repeat_duration:
+            self.active = entry.repeat_duration
+        else:
+            self.active = entry.duration * max(entry.repeat_count or 1.0, 1.0) * (2 if self.autoreverses else 1)
+        self.cycle = self.duration * (2 if self.autoreverses else 1)
+        self.control_points = timing_control_points(entry.timing_function)
+        self.discrete = entry.keyPath in _DISCRETE_KEYPATHS
+
+        if entry.values is not None:
+            self.values = np.array([value_components(v, entry.keyPath) for v in entry.values], dtype=float)
+            key_times = entry.key_times
+            if key_times is not None and len(key_times) == len(self.values):
+                self.key_times = np.array(key_times, dtype=float)
+            else:
+                self.key_times = self._paced_key_times(self.values)
+        else:
+            to_components = value_components(entry.toValue, entry.keyPath)
+            if entry.fromValue is not None:
+                from_components = value_components(entry.fromValue, entry.keyPath)
+            if from_components is None:
+                from_components = to_components
+            self.values = np.array([from_components, to_components], dtype=float)
+            self.key_times = np.array([0.0, 1.0])
+
+    @staticmethod
+    def _paced_key_times(values):
+        if len(values) < 2:
+            return np.zeros(len(values))
+        lengths = np.sqrt(np.sum(np.diff(values, axis=0) ** 2, axis=1))
+        total = lengths.sum()
+        if total <= 0:
+            return np.linspace(0.0, 1.0, len(values))
+        return np.concatenate(([0.0], np.cumsum(lengths) / total))
+
+    def progress(self, times):
+        elapsed = times - self.begin
+        finished = elapsed >= self.active
+        local = np.mod(np.minimum(elapsed, self.active), self.cycle)
+        if self.autoreverses:
+            local = np.where(local > self.duration, self.cycle - local, local)
+        fract = np.clip(local / self.duration, 0.0, 1.0)
+        fract = np.where(finished, 0.0 if self.autoreverses else 1.0, fract)
+        if self.control_points is not None:
+            fract = cubic_bezier_ease(fract, self.control_points)
+        return fract
+
+    def values_at(self, times):
+        fract = self.progress(times)
+        if len(self.values) == 1:
+            return np.repeat(self.values, len(times), axis=0)
+        if self.discrete:
+            idx = np.searchsorted(self.key_times, fract, side='right') - 1
+            return self.values[np.clip(idx, 0, len(self.values) - 1)]
+        return np.column_stack([np.interp(fract, self.key_times, self.values[:, c]) for c in range(self.values.shape[1])])
+
+
+class TimelineEvaluator(object):
+    """
+    Evaluates a Timeline. initial_values maps track keys to the value the property has before any animation
+    touches it; tracks without one start at the first animation's starting value.
+    """
+
+    def __init__(self, timeline, initial_values=None):
+        if not self.available():
+            raise ImportError("evaluating timelines needs numpy, which isn't installed")
+        self.timeline = timeline
+        self.initial = {}
+        self.tracks = {}
+        self.track_order = []
+        initial_values = initial_values or {}
+
+        for entry in timeline.entries:
+            key = self.track_key(entry)
+            if key not in self.tracks:
+                self.tracks[key] = []
+                self.track_order.append(key)
+                if key in initial_values:
+                    self.initial[key] = np.array(value_components(initial_values[key], entry.keyPath), dtype=float)
+            from_components = None
+            if entry.values is None and entry.fromValue is None:
+                from_components = self._value_before(key, entry.begin)
+            compiled = _CompiledEntry(entry, from_components)
+            self.tracks[key].append(compiled)
+            if key not in self.initial:
+                self.initial[key] = compiled.values[0]
+
+    @classmethod
+    def available(cls):
+        return np is not None
+
+    @staticmethod
+    def track_key(entry):
+        if entry.source_only:
+            return (entry.input_name, 'sourceLayer.' + entry.keyPath)
+        return (entry.input_name, entry.keyPath)
+
+    @classmethod
+    def from_block(cls, block, input_arg):
+        """
+        Build an evaluator for a block that was just committed. Starting values are read from the inputs' layers,
+        whose model values don't change until the animations complete.
+        """
+        timeline = Timeline.from_block(block, input_arg, replayable_only=False)
+        initial_values = {}
+        for entry in timeline.entries:
+            key = cls.track_key(entry)
+            if key in initial_values:
+                continue
+            target = input_arg[entry.input_name].layer
+            if entry.source_only:
+                target = target.sourceLayer()
+            initial_values[key] = target.valueForKeyPath_(entry.keyPath)
+        return cls(timeline, initial_values)
+
+    def _value_before(self, key, at_time):
+        for compiled in reversed(self.tracks.get(key, [])):
+            if compiled.begin <= at_time:
+                return tuple(compiled.values_at(np.array([at_time], dtype=float))[0])
+        initial = self.initial.get(key)
+        if initial is not None:
+            return tuple(initial)
+        return None
+
+    @property
+    def duration(self):
+        return self.timeline.duration
+
+    def evaluate(self, times, keys=None):
+        """
+        Evaluate tracks at every time in times (seconds from the start of the block). Returns a dict of
+        track key -> array with one row per time; single component tracks are returned as 1-d arrays.
+        """
+        times = np.asarray(times, dtype=float)
+        if keys is None:
+            keys = self.track_order
+        ret = {}
+        for key in keys:
+            initial = self.initial[key]
+            out = np.empty((len(times), len(initial)), dtype=float)
+            out[:] = initial
+            for compiled in self.tracks[key]:
+                mask = times >= compiled.begin
+                if not mask.any():
+                    continue
+                out[mask] = compiled.values_at(times[mask])
+            if out.shape[1] == 1:
+                out = out[:, 0]
+            ret[key] = out
+        return ret
+
+    def value_at(self, key, at_time):
+        return self.evaluate([at_time], [key])[key][0]
+
+    def sample(self, fps=60.0, duration=None, start=0.0, keys=None):
+        """
+        Sample tracks on a frame clock. Returns (times, values) where values is the dict from evaluate().
+        """
+        if duration is None:
+            duration = self.duration
+        frame_count = int(np.floor(duration * fps + 1e-9)) + 1
+        times = start + np.arange(frame_count, dtype=float) / fps
+        return times, self.evaluate(times, keys)
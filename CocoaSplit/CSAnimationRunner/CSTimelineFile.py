@@ -0,0 +1,225 @@
+"""
+Timeline files: a resolved animation saved so it can be replayed without running its script.
+
+A timeline file is compact JSON that refers to inputs by their UUID, so it stays valid for the layout it was exported
+from after the app restarts, and CSTimelinePlayer (Objective-C) can replay it in CocoaSplitCmd without starting Python.
+TimelineFile.apply() is the Python loader.
+
+    {"format": "cocoasplit-timeline", "version": 1, "animation": "slide", "duration": 1.5,
+     "inputs": {"<uuid>": "source1"},
+     "entries": [{"input": "<uuid>", "keyPath": "position", "type": "point", "begin": 0.0, "duration": 0.5,
+                  "totalDuration": 0.5, "values": [x0, y0, x1, y1, ...], "keyTimes": [...], "end": [x, y],
+                  "model": ["position"], "timing": "easeIn"}, ...]}
+
+type is "number", "bool", "point" or "size" and applies to every value in the entry. Single values (from, to, end)
+are a number or bool, or [x, y] / [width, height]; values is a flat list, two numbers per value for points and sizes.
+Optional keys, left out when they have their default: layer ("source" to animate the input's source layer), values
+and keyTimes (keyframe animations) or from and to (basic ones), end and model (the model value written and the
+keypaths it's written to), repeatCount, repeatDuration, autoreverses, ignoreWait (repeats forever) and timing (a
+kCAMediaTimingFunction name or [x1, y1, x2, y2] bezier control points).
+"""
+import json
+from CSAnimationBackend import get_backend
+from CSAnimationInput import CSAnimationInput
+from CSAnimationTimeline import Timeline, TimelineEntry, string_types
+from CSAnimationTiming import value_parts, make_value
+
+FORMAT = 'cocoasplit-timeline'
+VERSION = 1
+
+
+def _value_type(entry):
+    for value in [entry.end_value, entry.toValue, entry.fromValue] + list(entry.values or ()):
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            return 'bool'
+        try:
+            return value_parts(value, entry.keyPath)[0]
+        except ValueError:
+            raise ValueError("can't save %s animations with value %r" % (entry.keyPath, value))
+    return 'number'
+
+
+def _encode(value, value_type, keyPath):
+    if value_type == 'bool':
+        return bool(value)
+    parts = value_parts(value, keyPath)[1]
+    if value_type == 'number':
+        return parts[0]
+    return list(parts)
+
+
+def _decode(data, value_type, backend):
+    if data is None:
+        return None
+    if value_type == 'bool':
+        return bool(data)
+    if value_type == 'number':
+        return data
+    return make_value(value_type, data, backend)
+
+
+def _encode_timing(timing_function):
+    if timing_function is None or isinstance(timing_function, string_types):
+        return timing_function
+    if isinstance(timing_function, (list, tuple)):
+        return [float(coord) for coord in timing_function]
+    points = [timing_function.getControlPointAtIndex_values_(idx, None) for idx in (1, 2)]
+    return [float(points[0][0]), float(points[0][1]), float(points[1][0]), float(points[1][1])]
+
+
+def _decode_timing(data, backend):
+    if data is None:
+        return None
+    if isinstance(data, string_types):
+        return backend.timing_function(data)
+    return backend.timing_function_with_points(*data)
+
+
+def encode_entry(entry):
+    """
+    The file form of a TimelineEntry whose input_name is its input's UUID
+    """
+    keyPath = entry.keyPath
+    value_type = _value_type(entry)
+    data = {'input': entry.input_name, 'keyPath': keyPath, 'type': value_type, 'begin': entry.begin, 'duration': entry.duration,
+            'totalDuration': entry.total_duration}
+    if entry.source_only:
+        data['layer'] = 'source'
+    if entry.values is not None:
+        values = []
+        for value in entry.values:
+            value = _encode(value, value_type, keyPath)
+            if isinstance(value, list):
+                values.extend(value)
+            else:
+                values.append(value)
+        data['values'] = values
+        if entry.key_times is not None:
+            data['keyTimes'] = list(entry.key_times)
+    else:
+        if entry.fromValue is not None:
+            data['from'] = _encode(entry.fromValue, value_type, keyPath)
+        data['to'] = _encode(entry.toValue, value_type, keyPath)
+    if entry.end_value is not None:
+        data['end'] = _encode(entry.end_value, value_type, keyPath)
+    if entry.model_keypaths:
+        data['model'] = list(entry.model_keypaths)
+    if entry.repeat_count:
+        data['repeatCount'] = entry.repeat_count
+    if entry.repeat_duration:
+        data['repeatDuration'] = entry.repeat_duration
+    if entry.autoreverses:
+        data['autoreverses'] = True
+    if entry.ignore_wait:
+        data['ignoreWait'] = True
+    timing = _encode_timing(entry.timing_function)
+    if timing is not None:
+        data['timing'] = timing
+    return data
+
+
+def decode_entry(data, backend=None):
+    """
+    TimelineEntry for a saved entry; its input_name is the input's UUID
+    """
+    if backend is None:
+        backend = get_backend()
+    value_type = data['type']
+    values = data.get('values')
+    if values is not None:
+        if value_type in ('point', 'size'):
+            boxed = backend.point_values if value_type == 'point' else backend.size_values
+            values = boxed(values[0::2], values[1::2])
+        elif value_type == 'bool':
+            values = [bool(value) for value in values]
+    return TimelineEntry(data['input'], data['keyPath'], data['begin'], data['duration'],
+                         data.get('totalDuration', data['duration']), values=values,
+                         fromValue=_decode(data.get('from'), value_type, backend),
+                         toValue=_decode(data.get('to'), value_type, backend),
+                         source_only=data.get('layer') == 'source', repeat_count=data.get('repeatCount', 0),
+                         repeat_duration=data.get('repeatDuration', 0),
+                         autoreverses=data.get('autoreverses', False),
+                         timing_function=_decode_timing(data.get('timing'), backend),
+                         ignore_wait=data.get('ignoreWait', False), model_keypaths=data.get('model', ()),
+                         end_value=_decode(data.get('end'), value_type, backend), key_times=data.get('keyTimes'))
+
+
+class TimelineFile(object):
+    """
+    A timeline whose entries name their input by UUID. inputs maps each UUID to the name the script knew the input by,
+    animation is the name of the script it came from.
+    """
+
+    def __init__(self, timeline, inputs=None, animation=None):
+        self.timeline = timeline
+        self.inputs = inputs or {}
+        self.animation = animation
+
+    @classmethod
+    def from_timeline(cls, timeline, input_uuids, animation=None):
+        """
+        Convert a timeline whose entries name inputs by their key in the script's input dict. input_uuids maps those
+        names to UUIDs.
+        """
+        entries = []
+        for entry in timeline.entries:
+            uuid = input_uuids.get(entry.input_name)
+            if uuid is None:
+                raise ValueError("input %s has no UUID" % (entry.input_name,))
+            entries.append(entry.replace(input_name=uuid))
+        names = dict((uuid, name) for name, uuid in input_uuids.items())
+        return cls(Timeline(entries), names, animation)
+
+    def to_dict(self):
+        return {'format': FORMAT, 'version': VERSION, 'animation': self.animation, 'duration': self.timeline.duration,
+                'inputs': self.inputs,
+                'entries': [encode_entry(entry) for entry in self.timeline.entries]}
+
+    @classmethod
+    def from_dict(cls, data, backend=None):
+        if data.get('format') != FORMAT:
+            raise ValueError("not a timeline file")
+        if data.get('version', 0) > VERSION:
+            raise ValueError("timeline file version %s is newer than this loader" % data.get('version'))
+        entries = [decode_entry(entry, backend) for entry in data['entries']]
+        return cls(Timeline(entries), data.get('inputs'), data.get('animation'))
+
+    def dumps(self):
+        return json.dumps(self.to_dict(), separators=(',', ':'))
+
+    @classmethod
+    def loads(cls, text, backend=None):
+        return cls.from_dict(json.loads(text), backend)
+
+    def save(self, path):
+        with open(path, 'w') as out:
+            out.write(self.dumps())
+
+    @classmethod
+    def load(cls, path, backend=None):
+        with open(path) as source:
+            return cls.loads(source.read(), backend)
+
+    def apply(self, inputs, superlayer):
+        """
+        Replay on the inputs (InputSources or CSAnimationInputs, or a dict of them by UUID), starting now. Entries
+        for inputs that aren't there are skipped. Returns the list of CSAnimations created.
+        """
+        if not isinstance(inputs, dict):
+            inputs = dict((_input_uuid(cs_input), cs_input) for cs_input in inputs)
+        input_arg = {}
+        for uuid, cs_input in inputs.items():
+            if cs_input is not None and not isinstance(cs_input, CSAnimationInput):
+                cs_input = CSAnimationInput(cs_input)
+            input_arg[uuid] = cs_input
+        timeline = Timeline([entry for entry in self.timeline.entries if input_arg.get(entry.input_name)])
+        return timeline.apply(input_arg, superlayer)
+
+
+def _input_uuid(cs_input):
+    if isinstance(cs_input, CSAnimationInput):
+        cs_input = cs_input.input
+    return cs_input.uuid()
+
@@ -0,0 +1,106 @@
+"""
+Async runs against the headless layer model: they end where synchronous runs of the same script do, and they
+always finish.
+
+    python -m unittest discover -s Tests
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CSHeadlessRunner import HeadlessRunner
+
+
+RESIZE_THEN_MOVE = """
+animation_inputs = ['source1']
+
+def do_animation(inputs, duration):
+    source = inputs['source1']
+    source.size((200, 100), 1.0)
+    source.waitAnimation()
+    source.moveCenter(1.0)
+    source.waitAnimation()
+    source.moveTo((10, 20), 1.0)
+"""
+
+TRANSFORM_THEN_MOVE = """
+animation_inputs = ['source1']
+
+def do_animation(inputs, duration):
+    source = inputs['source1']
+    source.rotate(30, 0.5)
+    source.scaleLayer(1.5, 0.5)
+    source.waitAnimation()
+    source.moveCenter(0.5)
+    source.waitAnimation()
+    source.translateTo((40, 10), 0.5)
+    source.waitAnimation()
+    source.moveTo((0.1, 0.2), 0.5)
+"""
+
+EXITING = """
+import sys
+
+animation_inputs = ['source1']
+
+def do_animation(inputs, duration):
+    inputs['source1'].moveTo((10, 20), 1.0)
+    sys.exit(1)
+"""
+
+
+class AsyncRunTest(unittest.TestCase):
+
+    def setUp(self):
+        self.script_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.script_dir)
+
+    def load(self, source):
+        path = os.path.join(self.script_dir, 'script_%d.py' % len(os.listdir(self.script_dir)))
+        with open(path, 'w') as out:
+            out.write(source)
+        runner = HeadlessRunner(1280, 720)
+        runner.add_input('source1', 0, 0, 320, 180)
+        return runner, runner.load_script(path)
+
+    def final_geometry(self, source, use_async):
+        runner, animation = self.load(source)
+        if use_async:
+            run = runner.run_async(animation, timeout=10)
+            self.assertTrue(run.done())
+            self.assertIsNone(run.exception())
+            runner.backend.run_until_idle()
+        else:
+            runner.run(animation)
+        layer = runner.inputs['source1'].layer()
+        frame = layer.frame()
+        position = layer.position()
+        return (frame.origin.x, frame.origin.y, frame.size.width, frame.size.height, position.x, position.y)
+
+    def assertSameGeometry(self, source):
+        sync_geometry = self.final_geometry(source, False)
+        async_geometry = self.final_geometry(source, True)
+        for sync_value, async_value in zip(sync_geometry, async_geometry):
+            self.assertAlmostEqual(sync_value, async_value, places=6)
+
+    def test_resize_then_move(self):
+        self.assertSameGeometry(RESIZE_THEN_MOVE)
+
+    def test_rotate_and_scale_then_move(self):
+        self.assertSameGeometry(TRANSFORM_THEN_MOVE)
+
+    def test_script_exiting_finishes_the_run(self):
+        runner, animation = self.load(EXITING)
+        run = runner.run_async(animation, timeout=10)
+        self.assertTrue(run.done())
+        self.assertIsInstance(run.exception(), SystemExit)
+
+
+if __name__ == '__main__':
+    unittest.main()
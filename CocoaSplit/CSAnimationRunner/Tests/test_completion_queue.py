@@ -0,0 +1,53 @@
+"""
+Completions drained in one batch are isolated from each other: a raising on_complete handler is logged and the
+other handlers in the batch still run.
+
+    python -m unittest discover -s Tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import CSAnimationBlock
+from CSAnimationInput import CSAnimationInput
+from CSHeadlessRunner import HeadlessRunner
+
+
+class RaisingHandlerAnimation(object):
+
+    def __init__(self):
+        self.completed = []
+
+    def bad(self, cs_anim):
+        raise RuntimeError('bad handler')
+
+    def good(self, cs_anim):
+        self.completed.append(cs_anim)
+
+    def do_animation(self, inputs, duration):
+        inputs['a'].moveTo((100, 50), 0.5, on_complete=self.bad)
+        inputs['b'].moveTo((200, 80), 0.5, on_complete=self.good)
+
+
+class CompletionQueueTest(unittest.TestCase):
+
+    def test_raising_handler_does_not_block_others(self):
+        runner = HeadlessRunner()
+        a = runner.add_input('a', 0, 0, 320, 180)
+        b = runner.add_input('b', 400, 0, 320, 180)
+        animation = RaisingHandlerAnimation()
+        CSAnimationBlock.run_animation(animation, {'a': CSAnimationInput(a), 'b': CSAnimationInput(b)}, None,
+                                       runner.rootLayer)
+        runner.backend.run_until_idle()
+
+        self.assertEqual(1, len(animation.completed))
+        for h_input, origin in ((a, (100, 50)), (b, (200, 80))):
+            frame = h_input.layer().frame()
+            self.assertEqual(origin, (frame.origin.x, frame.origin.y))
+        self.assertTrue(any('bad handler' in line for line in runner.backend.messages))
+
+
+if __name__ == '__main__':
+    unittest.main()
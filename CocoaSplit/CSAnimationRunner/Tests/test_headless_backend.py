@@ -0,0 +1,48 @@
+"""
+The headless backend with a HeadlessClock and with a plain clock function.
+
+    python -m unittest discover -s Tests
+"""
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import CSAnimationBlock
+from CSAnimationInput import CSAnimationInput
+from CSHeadlessBackend import HeadlessBackend, HeadlessClock
+from CSHeadlessRunner import HeadlessRunner
+
+
+class MoveAnimation(object):
+
+    def do_animation(self, inputs, duration):
+        inputs['source1'].moveTo((100, 50), 0.05)
+
+
+class HeadlessClockTest(unittest.TestCase):
+
+    def run_move(self, clock):
+        runner = HeadlessRunner(backend=HeadlessBackend(clock))
+        h_input = runner.add_input('source1', 0, 0, 320, 180)
+        CSAnimationBlock.run_animation(MoveAnimation(), {'source1': CSAnimationInput(h_input)}, None,
+                                       runner.rootLayer)
+        self.assertEqual(1, runner.backend.run_until_idle())
+        frame = h_input.layer().frame()
+        self.assertEqual((100, 50), (frame.origin.x, frame.origin.y))
+        return runner
+
+    def test_headless_clock(self):
+        runner = self.run_move(HeadlessClock())
+        self.assertAlmostEqual(0.05, runner.backend.current_time())
+
+    def test_plain_clock_function(self):
+        start = time.time()
+        self.run_move(time.time)
+        self.assertTrue(time.time() - start >= 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+The plugin index reads metadata without importing plugins, and a plugin whose metadata can't be evaluated doesn't
+break the refresh for the others.
+
+    python -m unittest discover -s Tests
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CSPluginIndex import PluginIndex, parse_metadata
+
+
+GOOD = """
+animation_name = 'Good'
+animation_inputs = ['source1']
+"""
+
+UNHASHABLE_KEY = """
+animation_name = 'Bad'
+animation_params = {[]: 1}
+"""
+
+
+class PluginIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.plugin_dir)
+
+    def test_unbuildable_literal_is_non_literal(self):
+        self.assertEqual({'animation_name': 'Bad'}, parse_metadata(UNHASHABLE_KEY))
+
+    def test_refresh_with_bad_plugin(self):
+        for name, source in (('bad', UNHASHABLE_KEY), ('good', GOOD)):
+            with open(os.path.join(self.plugin_dir, name + '.py'), 'w') as out:
+                out.write(source)
+        metadata = PluginIndex([self.plugin_dir]).refresh()
+        self.assertEqual(['bad', 'good'], list(metadata.keys()))
+        self.assertEqual({'animation_name': 'Good', 'animation_inputs': ['source1']}, metadata['good'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Cancelling sandboxed runs while the worker is busy.
+
+    python -m unittest discover -s Tests
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CSHeadlessRunner import HeadlessRunner
+from CSAnimationSandbox import SandboxPool, SandboxWorker, SandboxError, make_job, run_animation_sandboxed
+
+
+LOOP = """
+animation_inputs = ['source1']
+
+def do_animation(inputs, duration):
+    while True:
+        pass
+"""
+
+MOVE = """
+animation_inputs = ['source1']
+
+def do_animation(inputs, duration):
+    inputs['source1'].moveTo((100, 50), 1.0)
+"""
+
+
+class SandboxCancelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.script_dir = tempfile.mkdtemp()
+        self.runner = HeadlessRunner()
+        self.runner.add_input('source1', 0, 0, 320, 180)
+
+    def tearDown(self):
+        shutil.rmtree(self.script_dir)
+
+    def job(self, name, source):
+        path = os.path.join(self.script_dir, name + '.py')
+        with open(path, 'w') as out:
+            out.write(source)
+        return path, make_job(path, self.runner.make_input_arg(None), None, self.runner.rootLayer)
+
+    def drive(self, run, timeout=10):
+        deadline = time.time() + timeout
+        while not run.done() and time.time() < deadline:
+            self.runner.backend.run_soon()
+            time.sleep(0.001)
+        self.assertTrue(run.done())
+
+    def test_cancel_during_request(self):
+        worker = SandboxWorker(sys.executable)
+        errors = []
+
+        def request():
+            try:
+                worker.request(self.job('loop', LOOP)[1], 10)
+            except Exception as e:
+                errors.append(e)
+        thread = threading.Thread(target=request)
+        thread.start()
+        time.sleep(0.3)
+        worker.cancel()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(1, len(errors))
+        self.assertIsInstance(errors[0], SandboxError)
+        self.assertFalse(worker.alive)
+        self.assertIsNone(worker.proc)
+
+    def test_cancelled_run_leaves_pool_usable(self):
+        pool = SandboxPool(python=sys.executable, size=1, budget=10)
+        try:
+            loop_path = self.job('loop', LOOP)[0]
+            run = run_animation_sandboxed(pool, loop_path, self.runner.make_input_arg(None), None,
+                                          self.runner.rootLayer)
+            time.sleep(0.3)
+            self.assertTrue(run.cancel())
+            self.drive(run)
+            self.assertTrue(run.cancelled())
+
+            move_path = self.job('move', MOVE)[0]
+            run = run_animation_sandboxed(pool, move_path, self.runner.make_input_arg(None), None,
+                                          self.runner.rootLayer)
+            self.drive(run)
+            self.assertIsNone(run.exception())
+            self.assertEqual(1, len(run.result().entries))
+        finally:
+            pool.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+The timeline cache only replays scripts that opted in with animation_cacheable = True.
+
+    python -m unittest discover -s Tests
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CSHeadlessRunner import HeadlessRunner
+from CSAnimationTimeline import TimelineCache
+
+
+SCRIPT = """
+animation_inputs = ['source1']
+%s
+
+def do_animation(inputs, duration):
+    inputs['source1'].moveTo((100, 50), 1.0)
+"""
+
+
+class TimelineCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.script_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.script_dir)
+
+    def run_twice(self, name, header):
+        path = os.path.join(self.script_dir, name + '.py')
+        with open(path, 'w') as out:
+            out.write(SCRIPT % header)
+        cache = TimelineCache()
+        for _ in range(2):
+            runner = HeadlessRunner(timeline_cache=cache)
+            runner.add_input('source1', 0, 0, 320, 180)
+            runner.run(runner.load_script(path))
+        return cache.stats()
+
+    def test_not_cached_by_default(self):
+        stats = self.run_twice('default', '')
+        self.assertEqual(0, stats['hits'])
+        self.assertEqual(0, stats['entries'])
+
+    def test_cached_when_opted_in(self):
+        stats = self.run_twice('opted_in', 'animation_cacheable = True')
+        self.assertEqual(1, stats['hits'])
+
+
+if __name__ == '__main__':
+    unittest.main()
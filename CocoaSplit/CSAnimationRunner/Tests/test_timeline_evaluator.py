@@ -0,0 +1,83 @@
+"""
+TimelineEvaluator against the headless layer model: sample() and value_at() match the headless presentation layer
+at the same times.
+
+    python -m unittest discover -s Tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import CSAnimationBlock
+from CSAnimationInput import CSAnimationInput
+from CSHeadlessRunner import HeadlessRunner
+from CSTimelineEvaluator import TimelineEvaluator, value_components
+
+
+class ScriptAnimation(object):
+
+    def __init__(self, script):
+        self.script = script
+
+    def do_animation(self, inputs, duration):
+        self.script(inputs['source1'])
+
+
+def basic_move(source):
+    source.moveTo((100, 50), 1.0)
+
+
+def paced_keyframes(source):
+    source.moveX([10, 20, 50], 1.0)
+
+
+def autoreverse_repeat(source):
+    source.opacity(0.2, 0.5, autoreverse=True, repeatcount=2)
+
+
+def overlapping_moves(source):
+    source.moveTo((100, 50), 1.0)
+    source.wait(0.5)
+    source.moveTo([(300, 200), (400, 100)], 1.0)
+
+
+@unittest.skipUnless(TimelineEvaluator.available(), 'the timeline evaluator needs numpy')
+class TimelineEvaluatorTest(unittest.TestCase):
+
+    def assertMatchesHeadless(self, script, keyPath):
+        runner = HeadlessRunner()
+        h_input = runner.add_input('source1', 0, 0, 320, 180)
+        input_arg = {'source1': CSAnimationInput(h_input)}
+        start = runner.backend.current_time()
+        block = CSAnimationBlock.run_animation(ScriptAnimation(script), input_arg, None, runner.rootLayer)
+        evaluator = TimelineEvaluator.from_block(block, input_arg)
+        key = ('source1', keyPath)
+
+        times, tracks = evaluator.sample(fps=30.0, duration=evaluator.duration + 0.25, keys=[key])
+        self.assertEqual(len(times), len(tracks[key]))
+        for at_time, sampled in zip(times, tracks[key]):
+            runner.backend.advance(start + at_time - runner.backend.current_time())
+            expected = value_components(h_input.layer().presentationLayer().valueForKeyPath_(keyPath), keyPath)
+            for name, actual in (('sample', sampled), ('value_at', evaluator.value_at(key, at_time))):
+                actual = [float(actual)] if len(expected) == 1 else list(actual)
+                for expected_c, actual_c in zip(expected, actual):
+                    self.assertAlmostEqual(expected_c, actual_c, places=6,
+                                           msg='%s %s at %.3f' % (name, keyPath, at_time))
+
+    def test_basic_move(self):
+        self.assertMatchesHeadless(basic_move, 'position')
+
+    def test_paced_keyframes(self):
+        self.assertMatchesHeadless(paced_keyframes, 'position.x')
+
+    def test_autoreverse_repeat(self):
+        self.assertMatchesHeadless(autoreverse_repeat, 'opacity')
+
+    def test_overlapping_animations(self):
+        self.assertMatchesHeadless(overlapping_moves, 'position')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Timeline files round trip: a script's block saved as a timeline file and replayed on a fresh headless layout ends
+with the same layer state as the script run.
+
+    python -m unittest discover -s Tests
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import CSAnimationBlock
+from CSHeadlessRunner import HeadlessRunner
+from CSAnimationTimeline import Timeline
+from CSTimelineFile import TimelineFile, encode_entry, decode_entry
+
+
+SCRIPT = """
+animation_inputs = ['source1', 'source2']
+
+def do_animation(inputs, duration):
+    source1 = inputs['source1']
+    source2 = inputs['source2']
+    source1.moveTo((500, 300), 1.0, timing='bounce')
+    source2.opacity(0.3, 0.5, timing='easeIn')
+    source1.waitAnimation()
+    source1.moveX([10, 20, 50], 1.0)
+    source2.rotate(45, 0.5, timing=(0.68, -0.55, 0.27, 1.55))
+    source2.waitAnimation()
+    source2.translate((40, 10), 0.5)
+    source2.simple_animation('hidden', True, 0.3)
+    source1.opacity(0.6, 0.4, source_only=True)
+"""
+
+
+def layout():
+    runner = HeadlessRunner(1280, 720)
+    runner.add_input('source1', 0, 0, 320, 180)
+    runner.add_input('source2', 600, 300, 320, 180)
+    return runner
+
+
+def layer_state(runner):
+    ret = []
+    for name, h_input in sorted(runner.inputs.items()):
+        layer = h_input.layer()
+        frame = layer.frame()
+        translation = layer.valueForKeyPath_('transform.translation').sizeValue()
+        ret.append((name, round(frame.origin.x, 6), round(frame.origin.y, 6), round(frame.size.width, 6),
+                    round(frame.size.height, 6), round(layer.opacity(), 6), layer.isHidden(),
+                    round(translation.width, 6), round(translation.height, 6),
+                    round(layer.valueForKeyPath_('transform.rotation.z'), 6),
+                    round(layer.sourceLayer().opacity(), 6)))
+    return ret
+
+
+class TimelineFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.script_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.script_dir, 'round_trip.py'), 'w') as out:
+            out.write(SCRIPT)
+
+    def tearDown(self):
+        shutil.rmtree(self.script_dir)
+
+    def test_round_trip(self):
+        runner = layout()
+        animation = runner.load_script(os.path.join(self.script_dir, 'round_trip.py'))
+        input_arg = runner.make_input_arg(animation)
+        block = CSAnimationBlock.run_animation(animation, input_arg, None, runner.rootLayer)
+        runner.backend.run_until_idle()
+        expected = layer_state(runner)
+
+        timeline = Timeline.from_block(block, input_arg)
+        self.assertIsNotNone(timeline)
+        input_uuids = dict((name, value.input.uuid()) for name, value in input_arg.items() if value is not None)
+        text = TimelineFile.from_timeline(timeline, input_uuids, 'round_trip').dumps()
+
+        entries = json.loads(text)['entries']
+        self.assertEqual(set(['point', 'size', 'bool', 'number']), set(entry['type'] for entry in entries))
+        self.assertTrue(any('keyTimes' in entry for entry in entries))
+        self.assertTrue(any(entry.get('timing') == 'easeIn' for entry in entries))
+        self.assertTrue(any(entry.get('layer') == 'source' for entry in entries))
+
+        loaded = TimelineFile.loads(text)
+        self.assertEqual(text, loaded.dumps())
+        replay = layout()
+        animations = loaded.apply(list(replay.inputs.values()), replay.rootLayer)
+        self.assertEqual(len(entries), len(animations))
+        replay.backend.run_until_idle()
+        self.assertEqual(expected, layer_state(replay))
+
+    def test_bezier_timing(self):
+        runner = layout()
+        data = {'input': 'source1', 'keyPath': 'position', 'type': 'point', 'begin': 0.5, 'duration': 1.0,
+                'totalDuration': 1.0, 'from': [0.0, 0.0], 'to': [100.0, 50.0], 'end': [100.0, 50.0],
+                'model': ['position'], 'timing': [0.68, -0.55, 0.27, 1.55]}
+        self.assertEqual(data, encode_entry(decode_entry(data, runner.backend)))
+
+
+if __name__ == '__main__':
+    unittest.main()
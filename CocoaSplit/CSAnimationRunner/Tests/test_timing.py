@@ -0,0 +1,47 @@
+"""
+Timing curves give the same progress with and without numpy.
+
+    python -m unittest discover -s Tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import CSAnimationTiming
+import CSTimelineEvaluator
+from CSAnimationTiming import cubic_bezier_ease
+
+
+FRACTS = [0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0]
+CONTROL_POINTS = (0.68, -0.55, 0.27, 1.55)
+
+
+class WithoutNumpyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.np = CSAnimationTiming.np
+        self.evaluator_np = CSTimelineEvaluator.np
+
+    def tearDown(self):
+        CSAnimationTiming.np = self.np
+        CSTimelineEvaluator.np = self.evaluator_np
+
+    def test_cubic_bezier_ease(self):
+        expected = [float(value) for value in cubic_bezier_ease(FRACTS, CONTROL_POINTS)]
+        CSAnimationTiming.np = None
+        progress = cubic_bezier_ease(FRACTS, CONTROL_POINTS)
+        self.assertIsInstance(progress, list)
+        for expected_value, value in zip(expected, progress):
+            self.assertAlmostEqual(expected_value, value, places=9)
+        self.assertAlmostEqual(expected[3], cubic_bezier_ease(0.5, CONTROL_POINTS), places=9)
+
+    def test_evaluator_needs_numpy(self):
+        CSTimelineEvaluator.np = None
+        self.assertFalse(CSTimelineEvaluator.TimelineEvaluator.available())
+        self.assertRaises(ImportError, CSTimelineEvaluator.TimelineEvaluator, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
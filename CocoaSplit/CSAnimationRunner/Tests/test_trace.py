@@ -0,0 +1,50 @@
+"""
+Trace tracks follow the underlying source: runs that wrap the same input under different names record onto one
+track named by the input's UUID, with the script's name for it as an event arg.
+
+    python -m unittest discover -s Tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import CSAnimationBlock
+from CSAnimationInput import CSAnimationInput
+from CSAnimationTrace import TraceRecorder
+from CSHeadlessRunner import HeadlessRunner
+
+
+class MoveAnimation(object):
+
+    def __init__(self, name):
+        self.name = name
+
+    def do_animation(self, inputs, duration):
+        inputs[self.name].moveTo((100, 50), 0.5)
+
+
+class TraceRecorderTest(unittest.TestCase):
+
+    def test_tracks_keyed_by_source(self):
+        runner = HeadlessRunner()
+        h_input = runner.add_input('source1', 0, 0, 320, 180)
+        tracer = TraceRecorder()
+        tracer.enabled = True
+        for name in ('first', 'second'):
+            input_arg = {name: CSAnimationInput(h_input)}
+            block = CSAnimationBlock.run_animation(MoveAnimation(name), input_arg, None, runner.rootLayer)
+            tracer.add_block(block, input_arg, 'run_' + name)
+            runner.backend.run_until_idle()
+
+        trace = tracer.trace()['traceEvents']
+        thread_names = [event['args']['name'] for event in trace if event['name'] == 'thread_name']
+        self.assertEqual(['source1'], thread_names)
+        moves = [event for event in trace if event.get('cat') == 'animation']
+        self.assertEqual(['first', 'second'], [event['args']['input'] for event in moves])
+        self.assertEqual(1, len(set(event['tid'] for event in moves)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,6 +14,7 @@ import sys
 import uuid
 import errno
 import pkgutil
+import marshal
 import hashlib
 import threading
 
@@ -113,6 +114,14 @@ class _IntentionallyEmptyModule(ModuleType):
         except AttributeError:
             if name[:2] == '__':
                 raise
+            # ``from <package> import <plugin>`` ends up here.  Hand out the
+            # plugin from the importing source without creating an alias.
+            space = _find_importing_space()
+            if space is not None:
+                actual_name = space._rewrite_module_path(
+                    self.__name__ + '.' + name)
+                __import__(actual_name)
+                return sys.modules[actual_name]
             raise RuntimeError(
                 'Attempted to import from a plugin base module (%s) without '
                 'having a plugin source activated.  To solve this error '
@@ -149,9 +158,11 @@ def _setup_base_package(module_name):
 
     if mod is None:
         mod = _IntentionallyEmptyModule(module_name)
+        mod.__path__ = []
         if parent_mod is not None:
             setattr(parent_mod, module_name.rsplit('.', 1)[-1], mod)
         sys.modules[module_name] = mod
+    import_hook.packages.add(module_name)
 
 
 class PluginBase(object):
@@ -209,16 +220,26 @@ class PluginSource(object):
     :param persist: optionally this can be set to `True` and the plugins
                     will not be cleaned up when the plugin source gets
                     garbage collected.
+    :param bytecode_cache: optionally a directory (or a
+                           :class:`BytecodeCache`) where compiled plugin
+                           modules are kept.  Plugins are then compiled
+                           only when their source changes, even when
+                           ``sys.dont_write_bytecode`` is set.
     """
     # Set these here to false by default so that a completely failing
     # constructor does not fuck up the destructor.
     persist = False
     mod = None
+    _aliases = ()
 
     def __init__(self, base, identifier=None, searchpath=None,
-                 persist=False):
+                 persist=False, bytecode_cache=None):
         #: indicates if this plugin source persists or not.
         self.persist = persist
+        if isinstance(bytecode_cache, string_types):
+            bytecode_cache = BytecodeCache(bytecode_cache)
+        #: the :class:`BytecodeCache` used for plugin modules, or `None`.
+        self.bytecode_cache = bytecode_cache
         if identifier is None:
             identifier = str(uuid.uuid4())
         #: the identifier for this source.
@@ -236,6 +257,9 @@ class PluginSource(object):
         #: a reference to the module on the internal
         #: :mod:`pluginsource._internalspace`.
         self.mod = _PluginSourceModule(self)
+        #: names in the plugin base package that currently alias plugins
+        #: of this source.
+        self._aliases = []
 
         if hasattr(_internalspace, self.spaceid):
             raise RuntimeError('This plugin source already exists.')
@@ -268,7 +292,7 @@ class PluginSource(object):
         if '.' in name:
             raise ImportError('Plugin names cannot contain dots.')
         with self:
-            return __import__(self.base.package + '.' + name,
+            return __import__(self.mod.__name__ + '.' + name,
                               globals(), {}, ['__name__'])
 
     def open_resource(self, plugin, filename):
@@ -308,6 +332,7 @@ class PluginSource(object):
         # that these functions and modules might be gone.
         if self.mod is None:
             return
+        self._drop_aliases(_sys)
         modname = self.mod.__name__
         self.mod.__pluginbase_state__ = None
         self.mod = None
@@ -339,6 +364,16 @@ class PluginSource(object):
             _local.space_stack.pop()
         except (AttributeError, IndexError):
             pass
+        self._drop_aliases()
+
+    def _drop_aliases(self, _sys=sys):
+        while self._aliases:
+            alias = self._aliases.pop()
+            _sys.modules.pop(alias, None)
+            package, _, attr = alias.rpartition('.')
+            parent = _sys.modules.get(package)
+            if parent is not None and attr in parent.__dict__:
+                delattr(parent, attr)
 
     def _rewrite_module_path(self, modname):
         self.__assert_not_cleaned_up()
@@ -367,12 +402,42 @@ class PluginBaseState(object):
         return rv
 
 
-class _ImportHook(ModuleType):
+def _find_importing_space(walk_frames=True):
+    try:
+        return _local.space_stack[-1]
+    except (AttributeError, IndexError):
+        pass
+    if not walk_frames:
+        return None
+    frm = sys._getframe(1)
+    while frm is not None:
+        space = _discover_space(None, frm.f_globals)
+        if space is not None:
+            return space
+        frm = frm.f_back
+    return None
+
+
+class _PluginFinder(ModuleType):
+    """Serves imports of ``<plugin base package>.<plugin>`` from the plugin
+    source that is currently active (or that the importing plugin belongs
+    to), and loads plugin modules of sources that have a bytecode cache.
+    It sits on :data:`sys.meta_path` and only looks at names below a
+    registered plugin base package or ``_internalspace``, so every other
+    import goes straight to the regular import system.
+
+    The plugin module itself lives under ``_internalspace``.  The name in the
+    plugin base package is only an alias; it is dropped again when the
+    plugin source's ``with`` block exits so sources can't see each other's
+    plugins.  Because of that ``import <package>.<plugin>`` only works inside
+    the ``with`` block; ``from <package> import <plugin>`` is resolved by the
+    package module itself and works anywhere in plugin code.
+    """
 
-    def __init__(self, name, system_import):
+    def __init__(self, name):
         ModuleType.__init__(self, name)
-        self._system_import = system_import
         self.enabled = True
+        self.packages = set()
 
     def enable(self):
         """Enables the import hook which drives the plugin base system.
@@ -387,28 +452,211 @@ class _ImportHook(ModuleType):
         """
         self.enabled = False
 
-    def plugin_import(self, name, globals=None, locals=None,
-                      fromlist=None, level=0):
-        import_name = name
-        if self.enabled:
-            ref_globals = globals
-            if ref_globals is None:
-                ref_globals = sys._getframe(1).f_globals
-            space = _discover_space(name, ref_globals)
-            if space is not None:
-                actual_name = space._rewrite_module_path(name)
-                if actual_name is not None:
-                    import_name = actual_name
+    def _resolve_cached(self, fullname):
+        # plain plugin modules of a source with a bytecode cache
+        if not self.enabled or not fullname.startswith(_internal_prefix):
+            return None
+        space_name, _, plugin_name = fullname.rpartition('.')
+        space_mod = sys.modules.get(space_name)
+        state = getattr(space_mod, '__pluginbase_state__', None)
+        if state is None:
+            return None
+        try:
+            source = state.source
+        except AttributeError:
+            return None
+        if source.bytecode_cache is None:
+            return None
+        for search_dir in space_mod.__path__:
+            base_path = os.path.join(search_dir, plugin_name)
+            if os.path.isdir(base_path):
+                # packages go through the regular import system
+                return None
+            if os.path.isfile(base_path + '.py'):
+                return _CachedPluginLoader(source.bytecode_cache, fullname,
+                                           base_path + '.py')
+        return None
+
+    def _resolve(self, fullname):
+        if not self.enabled or '.' not in fullname:
+            return None
+        if fullname.rsplit('.', 1)[0] not in self.packages:
+            return None
+        space = _find_importing_space(walk_frames=False)
+        if space is None:
+            return None
+        actual_name = space._rewrite_module_path(fullname)
+        if actual_name is None:
+            return None
+        return space, actual_name
+
+    def _import_actual(self, fullname, resolved):
+        space, actual_name = resolved
+        __import__(actual_name)
+        module = sys.modules[actual_name]
+        space._aliases.append(fullname)
+        return module
+
+    # PEP 302 protocol, used by Python 2
+
+    def find_module(self, fullname, path=None):
+        cached_loader = self._resolve_cached(fullname)
+        if cached_loader is not None:
+            return cached_loader
+        resolved = self._resolve(fullname)
+        if resolved is None:
+            return None
+        return _PluginAliasLoader(self, fullname, resolved)
+
+    # PEP 451 protocol, used by Python 3
+
+    def find_spec(self, fullname, path=None, target=None):
+        cached_loader = self._resolve_cached(fullname)
+        if cached_loader is not None:
+            from importlib.util import spec_from_file_location
+            return spec_from_file_location(fullname, cached_loader.path,
+                                           loader=cached_loader)
+        resolved = self._resolve(fullname)
+        if resolved is None:
+            return None
+        from importlib.machinery import ModuleSpec
+        return ModuleSpec(fullname, _PluginAliasLoader(self, fullname, resolved))
+
+
+class _PluginAliasLoader(object):
+
+    def __init__(self, finder, fullname, resolved):
+        self.finder = finder
+        self.fullname = fullname
+        self.resolved = resolved
+        self.module = None
+        self.module_spec = None
+
+    def load_module(self, fullname):
+        module = self.finder._import_actual(fullname, self.resolved)
+        sys.modules[fullname] = module
+        return module
+
+    def create_module(self, spec):
+        self.module = self.finder._import_actual(spec.name, self.resolved)
+        self.module_spec = getattr(self.module, '__spec__', None)
+        return self.module
+
+    def exec_module(self, module):
+        # the import system points __spec__ at the alias; keep the real one
+        # so reload() still works on the plugin module
+        module.__spec__ = self.module_spec
+
+
+class BytecodeCache(object):
+    """Directory of compiled plugin modules.  There is one file per source
+    path and Python version; it holds the SHA-1 of the source it was
+    compiled from, so an entry is only used if the source is byte for byte
+    the same, no matter what happened to its mtime.
+    """
+
+    tag = '%s-%d%d' % (getattr(getattr(sys, 'implementation', None), 'name',
+                               'cpython'), sys.version_info[0],
+                       sys.version_info[1])
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.write_errors = 0
+
+    def cache_path(self, path):
+        name = hashlib.sha1(_to_bytes(os.path.abspath(path))).hexdigest()
+        return os.path.join(self.directory, '%s.%s.pyc' % (name, self.tag))
+
+    def get_code(self, path, source=None):
+        """Returns the code object for the module at `path`, compiling
+        it only if the cache doesn't have it."""
+        if source is None:
+            with open(path, 'rb') as f:
+                source = f.read()
+        digest = hashlib.sha1(source).digest()
+        cache_path = self.cache_path(path)
+        try:
+            with open(cache_path, 'rb') as f:
+                data = f.read()
+            if data[:len(digest)] == digest:
+                code = marshal.loads(data[len(digest):])
+                self.hits += 1
+                return code
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            pass
+        self.misses += 1
+        code = compile(source, path, 'exec', 0, True)
+        self._write(cache_path, digest + marshal.dumps(code))
+        return code
+
+    def _write(self, cache_path, data):
+        tmp_path = '%s.%s.tmp' % (cache_path, uuid.uuid4().hex)
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.rename(tmp_path, cache_path)
+        except (IOError, OSError):
+            self.write_errors += 1
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'write_errors': self.write_errors}
+
+
+class _CachedPluginLoader(object):
+
+    def __init__(self, cache, fullname, path):
+        self.cache = cache
+        self.fullname = fullname
+        self.path = path
+
+    def get_filename(self, fullname=None):
+        return self.path
+
+    def is_package(self, fullname=None):
+        return False
+
+    def get_source(self, fullname=None):
+        with open(self.path, 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def get_code(self, fullname=None):
+        return self.cache.get_code(self.path)
+
+    def load_module(self, fullname):
+        module = sys.modules.get(fullname)
+        is_new = module is None
+        if is_new:
+            module = ModuleType(fullname)
+            sys.modules[fullname] = module
+        module.__file__ = self.path
+        module.__loader__ = self
+        module.__package__ = fullname.rpartition('.')[0]
+        try:
+            exec(self.get_code(fullname), module.__dict__)
+        except:
+            if is_new:
+                sys.modules.pop(fullname, None)
+            raise
+        return sys.modules[fullname]
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        exec(self.get_code(module.__name__), module.__dict__)
 
-        return self._system_import(import_name, globals, locals,
-                                   fromlist, level)
 
+_internal_prefix = _internalspace.__name__ + '.'
 
-try:
-    import __builtin__ as builtins
-except ImportError:
-    import builtins
-import_hook = _ImportHook(__name__ + '.import_hook', builtins.__import__)
-builtins.__import__ = import_hook.plugin_import
+import_hook = _PluginFinder(__name__ + '.import_hook')
+sys.meta_path.insert(0, import_hook)
 sys.modules[import_hook.__name__] = import_hook
-del builtins
@@ -18,7 +18,46 @@
 -(NSDictionary *)allAnimations;
 
 -(void)runAnimation:(NSString *)name forInput:(id)forInput withSuperlayer:(CALayer *)superLayer;
+//Runs the script on a worker thread and commits on the main thread. Returns a handle with cancel()/done()/result()
+-(id)runAnimationAsync:(NSString *)name forInput:(id)forInput withSuperlayer:(CALayer *)superLayer;
+//Runs the script in a separate Python process against a snapshot of the inputs, killing it if it runs too long
+-(id)runAnimationSandboxed:(NSString *)name forInput:(id)forInput withSuperlayer:(CALayer *)superLayer;
+//Runs the script in a sandbox worker without animating anything and saves the resulting timeline for CSTimelinePlayer.
+//API only for now: no GUI action calls this yet
+-(bool)exportTimeline:(NSString *)name forInput:(id)forInput withSuperlayer:(CALayer *)superLayer toPath:(NSString *)path;
+//Animates the inputs to their geometry in the target layout (InputSources or geometry dictionaries by UUID), skipping
+//inputs that don't change. Returns the number of inputs animated
+-(int)transitionInputs:(NSArray *)currentInputs toLayout:(id)target withSuperlayer:(CALayer *)superLayer duration:(double)duration stagger:(double)stagger;
+-(void)setSandboxPython:(NSString *)pythonPath;
+-(void)setSandboxBudget:(double)seconds;
+-(NSDictionary *)sandboxStats;
+//Hand each segment between global waits to the layers while the script is still running (sync and async runs)
+-(void)setStreamingEnabled:(bool)enabled;
+-(bool)streamingEnabled;
+//Spread adding large commits to their layers over display frames, seconds of work per frame (0 turns it off)
+-(void)setFrameBudget:(double)seconds;
+-(double)frameBudget;
+-(NSDictionary *)frameBudgetStats;
 -(NSString *)animationPath:(NSString *)name;
+//Opt-in per-run profiling: phase timings, counts and first frame latency with rolling per-animation histograms
+-(void)setProfilingEnabled:(bool)enabled;
+-(bool)profilingEnabled;
+-(NSDictionary *)profilingStats;
+-(NSDictionary *)profilingStatsForAnimation:(NSString *)name;
+-(NSDictionary *)lastRunProfile;
+-(NSString *)profilingJSON;
+-(void)dumpProfilingToPath:(NSString *)path;
+-(void)resetProfiling;
+//Opt-in Chrome trace-event export of committed schedules: a track per input, spans per animation, waits and completions
+-(void)setTracingEnabled:(bool)enabled;
+-(bool)tracingEnabled;
+-(NSString *)traceJSON;
+-(void)dumpTraceToPath:(NSString *)path;
+-(void)clearTrace;
+-(NSDictionary *)timelineCacheStats;
+-(void)clearTimelineCache;
+-(NSDictionary *)pluginIndexStats;
+-(NSDictionary *)pluginReloadStats;
 
 @end
 
@@ -0,0 +1,21 @@
+//
+//  CSTimelinePlayer.h
+//  CocoaSplit
+//
+
+#import <Foundation/Foundation.h>
+#import <QuartzCore/QuartzCore.h>
+
+@class SourceLayout;
+
+//Replays timeline files exported by the animation runner (CSTimelineFile.py) without running the animation script,
+//so it works without Python (CocoaSplitCmd)
+@interface CSTimelinePlayer : NSObject
+
++(NSDictionary *)loadTimelineAtPath:(NSString *)path error:(NSError **)error;
+//Adds the timeline's animations to the inputs of layout, matched by UUID, starting now. Entries for inputs that
+//aren't in the layout are skipped. Returns the number of animations added
++(NSUInteger)replayTimeline:(NSDictionary *)timeline onLayout:(SourceLayout *)layout;
++(bool)replayTimelineAtPath:(NSString *)path onLayout:(SourceLayout *)layout error:(NSError **)error;
+
+@end
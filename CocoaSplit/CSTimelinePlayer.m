@@ -0,0 +1,229 @@
+//
+//  CSTimelinePlayer.m
+//  CocoaSplit
+//
+
+#import "CSTimelinePlayer.h"
+#import "SourceLayout.h"
+#import "InputSource.h"
+#import "CSInputLayer.h"
+
+
+static NSString *const CSTimelineFormat = @"cocoasplit-timeline";
+static const NSInteger CSTimelineVersion = 1;
+
+
+@implementation CSTimelinePlayer
+
+
++(NSDictionary *)loadTimelineAtPath:(NSString *)path error:(NSError **)error
+{
+    NSData *data = [NSData dataWithContentsOfFile:path options:0 error:error];
+    if (!data)
+    {
+        return nil;
+    }
+
+    NSDictionary *timeline = [NSJSONSerialization JSONObjectWithData:data options:0 error:error];
+    if (!timeline)
+    {
+        return nil;
+    }
+
+    if (![timeline isKindOfClass:[NSDictionary class]] || ![timeline[@"format"] isEqual:CSTimelineFormat] || [timeline[@"version"] integerValue] > CSTimelineVersion)
+    {
+        if (error)
+        {
+            *error = [NSError errorWithDomain:@"CSTimelinePlayer" code:1 userInfo:@{NSLocalizedDescriptionKey: [NSString stringWithFormat:@"%@ is not a timeline file this version can replay", path]}];
+        }
+        return nil;
+    }
+    return timeline;
+}
+
+
++(id)valueOfType:(NSString *)type from:(id)data
+{
+    if (!data || [data isEqual:[NSNull null]])
+    {
+        return nil;
+    }
+
+    if ([type isEqualToString:@"point"])
+    {
+        return [NSValue valueWithPoint:NSMakePoint([data[0] doubleValue], [data[1] doubleValue])];
+    }
+
+    if ([type isEqualToString:@"size"])
+    {
+        return [NSValue valueWithSize:NSMakeSize([data[0] doubleValue], [data[1] doubleValue])];
+    }
+
+    //numbers and bools are already NSNumbers
+    return data;
+}
+
+
++(NSArray *)valuesOfType:(NSString *)type from:(NSArray *)data
+{
+    if (![type isEqualToString:@"point"] && ![type isEqualToString:@"size"])
+    {
+        return data;
+    }
+
+    //two numbers per value
+    NSMutableArray *ret = [NSMutableArray arrayWithCapacity:data.count / 2];
+    for (NSUInteger idx = 0; idx + 1 < data.count; idx += 2)
+    {
+        [ret addObject:[self valueOfType:type from:@[data[idx], data[idx+1]]]];
+    }
+    return ret;
+}
+
+
++(CAMediaTimingFunction *)timingFunction:(id)timing
+{
+    if ([timing isKindOfClass:[NSString class]])
+    {
+        return [CAMediaTimingFunction functionWithName:timing];
+    }
+
+    if ([timing isKindOfClass:[NSArray class]] && [timing count] == 4)
+    {
+        return [CAMediaTimingFunction functionWithControlPoints:[timing[0] floatValue] :[timing[1] floatValue] :[timing[2] floatValue] :[timing[3] floatValue]];
+    }
+    return nil;
+}
+
+
++(CAPropertyAnimation *)animationForEntry:(NSDictionary *)entry
+{
+    NSString *type = entry[@"type"];
+    NSString *keyPath = entry[@"keyPath"];
+    CAPropertyAnimation *anim;
+
+    if (entry[@"values"])
+    {
+        CAKeyframeAnimation *kanim = [CAKeyframeAnimation animationWithKeyPath:keyPath];
+        kanim.values = [self valuesOfType:type from:entry[@"values"]];
+        if (entry[@"keyTimes"])
+        {
+            kanim.keyTimes = entry[@"keyTimes"];
+            kanim.calculationMode = kCAAnimationLinear;
+        } else {
+            kanim.calculationMode = kCAAnimationPaced;
+        }
+        kanim.rotationMode = kCAAnimationRotateAutoReverse;
+        anim = kanim;
+    } else {
+        CABasicAnimation *banim = [CABasicAnimation animationWithKeyPath:keyPath];
+        banim.fromValue = [self valueOfType:type from:entry[@"from"]];
+        banim.toValue = [self valueOfType:type from:entry[@"to"]];
+        anim = banim;
+    }
+
+    anim.duration = [entry[@"duration"] doubleValue];
+    if (entry[@"repeatCount"])
+    {
+        anim.repeatCount = [entry[@"repeatCount"] floatValue];
+    }
+
+    if (entry[@"repeatDuration"])
+    {
+        anim.repeatDuration = [entry[@"repeatDuration"] doubleValue];
+    }
+
+    anim.autoreverses = [entry[@"autoreverses"] boolValue];
+    if (entry[@"timing"])
+    {
+        anim.timingFunction = [self timingFunction:entry[@"timing"]];
+    }
+
+    anim.removedOnCompletion = NO;
+    anim.fillMode = kCAFillModeForwards;
+    return anim;
+}
+
+
++(NSUInteger)replayTimeline:(NSDictionary *)timeline onLayout:(SourceLayout *)layout
+{
+    CSTimelinePlayer *player = [[CSTimelinePlayer alloc] init];
+    NSUInteger added = 0;
+
+    [CATransaction begin];
+    CFTimeInterval baseTime = [layout.rootLayer convertTime:CACurrentMediaTime() fromLayer:nil];
+
+    for (NSDictionary *entry in timeline[@"entries"])
+    {
+        InputSource *input = [layout inputForUUID:entry[@"input"]];
+        if (!input)
+        {
+            continue;
+        }
+
+        CALayer *target = input.layer;
+        if ([entry[@"layer"] isEqual:@"source"])
+        {
+            target = input.layer.sourceLayer;
+        }
+
+        CAPropertyAnimation *anim = [self animationForEntry:entry];
+        anim.beginTime = baseTime + [entry[@"begin"] doubleValue];
+
+        NSString *animKey = [NSString stringWithFormat:@"%@-timeline-%lu", entry[@"keyPath"], (unsigned long)added];
+        id endValue = [self valueOfType:entry[@"type"] from:entry[@"end"]];
+
+        //the model value is written when the animation is done, like the runner's completion handling does
+        if (endValue && ![entry[@"ignoreWait"] boolValue])
+        {
+            [anim setValue:target forKey:@"__CS_TIMELINE_TARGET__"];
+            [anim setValue:animKey forKey:@"__CS_TIMELINE_KEY__"];
+            [anim setValue:endValue forKey:@"__CS_TIMELINE_END__"];
+            [anim setValue:entry[@"model"] ? entry[@"model"] : @[] forKey:@"__CS_TIMELINE_MODEL__"];
+            anim.delegate = player;
+        }
+
+        [target addAnimation:anim forKey:animKey];
+        added++;
+    }
+
+    [CATransaction commit];
+    return added;
+}
+
+
++(bool)replayTimelineAtPath:(NSString *)path onLayout:(SourceLayout *)layout error:(NSError **)error
+{
+    NSDictionary *timeline = [self loadTimelineAtPath:path error:error];
+    if (!timeline)
+    {
+        return NO;
+    }
+
+    [self replayTimeline:timeline onLayout:layout];
+    return YES;
+}
+
+
+- (void)animationDidStop:(CAAnimation *)anim finished:(BOOL)flag
+{
+    CALayer *target = [anim valueForKey:@"__CS_TIMELINE_TARGET__"];
+    if (!target)
+    {
+        return;
+    }
+
+    id endValue = [anim valueForKey:@"__CS_TIMELINE_END__"];
+
+    [CATransaction begin];
+    [CATransaction setDisableActions:YES];
+    for (NSString *modelPath in [anim valueForKey:@"__CS_TIMELINE_MODEL__"])
+    {
+        [target setValue:endValue forKeyPath:modelPath];
+    }
+    [target removeAnimationForKey:[anim valueForKey:@"__CS_TIMELINE_KEY__"]];
+    [CATransaction commit];
+}
+
+
+@end
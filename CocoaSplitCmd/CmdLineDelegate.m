@@ -7,6 +7,7 @@
 //
 
 #import "CmdLineDelegate.h"
+#import "CSTimelinePlayer.h"
 
 @implementation CmdLineDelegate
 
@@ -34,6 +35,15 @@
 
     [self.captureController startStream];
     
+    NSString *timelinePath = [cmdargs stringForKey:@"replayTimeline"];
+    if (timelinePath)
+    {
+        NSError *error = nil;
+        if (![CSTimelinePlayer replayTimelineAtPath:timelinePath onLayout:self.captureController.selectedLayout error:&error])
+        {
+            NSLog(@"Couldn't replay timeline %@: %@", timelinePath, error);
+        }
+    }
     
     
 }